@@ -0,0 +1,465 @@
+import argparse, contextlib, gc, json, math, os, platform, shutil, sys, tempfile, time, tracemalloc
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# Run as `python -m benchmarks.BenchmarkSuite` from the repo root, or as a script
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+from schema import schema_registry
+from utils.RandomMachine import RandomMachine
+from utils.SQLWriter import SQLWriter
+from utils.CSVDataRowsSanitizer import CSVDataRowsSanitizer
+from utils.SpotifyPublicScrapper import SpotifyPublicScrapper
+from utils.CatalogStore import CatalogStore
+from benchmarks.FakeSpotifyClient import FakeSpotifyClient
+
+class BenchmarkSuite:
+
+    # 10⁷ rows is opt-in (`--scales 1e7`): it runs 100 times longer than 10⁵ and needs several GiB of memory,
+    # so the stored baseline only covers these; record it with `--scales 1e7 --update-baseline`
+    SCALES = (1000, 100000)
+    DEFAULT_BASELINE = str(Path(__file__).parent.resolve() / 'baseline.json')
+    # Cases whose cost grows quadratically (a scan of the whole frame per duplicate) or that run Python
+    # code per row are skipped above these sizes, where a single run would take hours
+    QUADRATIC_MAX_ROWS = 10000
+    ROW_WISE_MAX_ROWS = 100000
+    # Runs shorter than this swing by more than the default tolerance from scheduler and cache noise
+    # alone, so their throughput is compared with at least SHORT_CASE_TOLERANCE
+    SHORT_CASE_SECONDS = 0.01
+    SHORT_CASE_TOLERANCE = 0.6
+    # tracemalloc peaks of a few KB vary by more than any relative tolerance with allocator state and
+    # warm caches, so peak memory only regresses once it also grew by this many bytes
+    MEMORY_FLOOR_BYTES = 1024 * 1024
+    # Reference cases time the code a component replaced (e.g. the full DataFrame scan behind
+    # CatalogStore's index) to put its numbers in context. They are printed but neither stored in the
+    # baseline nor compared: their throughput is pandas', and swings by more than any tolerance
+    REFERENCE_CASES = ('catalog.lookup.scan',)
+
+    def __init__(self, scales=None, cases=None, work_dir=None, seed=0, measure_memory=True, max_runs=50, min_seconds=1.0):
+        """
+        Offline benchmarks of the hot paths: SpotifyPublicScrapper.scrap (against FakeSpotifyClient),
+        every CSVDataRowsSanitizer operation, RandomMachine sampling, SQLWriter.write_sql and the
+        CatalogStore behind the read API of self.py.
+
+        Every case is timed on freshly generated fixture data, with the garbage collector off; setup
+        is not timed. Throughput is the best of up to max_runs runs (stopping once min_seconds have
+        been spent), peak memory comes from one extra run under tracemalloc, which would otherwise
+        slow the timed runs down.
+
+        Lookup cases also report the p50 and p99 latency of a single lookup, from their fastest run.
+
+        Args:
+            scales (list, optional): Row counts to run every case at (defaults to SCALES).
+            cases (list, optional): Case names or prefixes ('sanitizer', 'sql_writer.write_sql', ...) to run.
+            work_dir (str, optional): Directory for fixture and output files (a temporary one by default).
+            seed (int): Seed of the fixture data.
+            measure_memory (bool): Also measure the peak traced memory of every case.
+            max_runs (int): Timed runs per case at most.
+            min_seconds (float): Stop repeating a case once this much time has been spent on it.
+        """
+        self.scales = [int(scale) for scale in scales] if scales is not None else list(BenchmarkSuite.SCALES)
+        self.case_filter = cases
+        self.work_dir = work_dir
+        self.seed = seed
+        self.measure_memory = measure_memory
+        self.max_runs = max_runs
+        self.min_seconds = min_seconds
+
+    def cases(self):
+        """Return {name: (setup, run, max_rows)}; setup(n) builds the state run(state) works on."""
+        sanitizer_operations = {
+            'load_csv': (lambda s: s.load_csv(), None),
+            'save_csv': (lambda s: s.save_csv(), None),
+            'process_duplicates.remove': (lambda s: s.process_duplicates(['user_id', 'follower_id'], action='remove'), None),
+            'process_duplicates.modify': (lambda s: s.process_duplicates(['user_id', 'follower_id'], action='modify', modify_column='name'), BenchmarkSuite.QUADRATIC_MAX_ROWS),
+            'remove_equal_columns_rows': (lambda s: s.remove_equal_columns_rows('user_id', 'follower_id'), None),
+            'trim_columns_to_limits': (lambda s: s.trim_columns_to_limits({'name': 12, 'info': 40}), None),
+            'trim_column_values': (lambda s: s.trim_column_values('info', 40, max_bytes=40), None),
+            'add_random_column': (lambda s: s.add_random_column('monthly_plays', 300, 1000000000), None),
+            'remove_column': (lambda s: s.remove_column('info'), None),
+            'apply_row_transformation': (lambda s: s.apply_row_transformation(BenchmarkSuite._order_rows, ['user_id']), BenchmarkSuite.ROW_WISE_MAX_ROWS),
+            'add_empty_column': (lambda s: s.add_empty_column('empty', extra_rows=len(s.df) // 10), None),
+        }
+        cases = {
+            'scraper.scrap': (self._setup_scraper, self._run_scraper, None),
+        }
+        for name, (operation, max_rows) in sanitizer_operations.items():
+            cases[f"sanitizer.{name}"] = (self._setup_sanitizer, operation, max_rows)
+        cases.update({
+            'random_machine.get_random_nums': (self._setup_random_machine, lambda state: state["rm"].get_random_nums(pool_size=1000, len=state["n"], sorted=True), None),
+            'random_machine.random_emails': (self._setup_random_machine, lambda state: state["rm"].random_emails(state["names"], unique=True), None),
+            'random_machine.random_times': (self._setup_random_machine, lambda state: state["rm"].random_times(state["n"]), None),
+            'random_machine.synthesize_users': (self._setup_random_machine, lambda state: state["rm"].synthesize_users(state["names"], state["genders"], size=state["n"], unique_emails=True), None),
+            'random_machine.extract_csv_rows_indexed': (self._setup_random_machine, lambda state: state["rm"].extract_csv_rows_indexed(state["csv_file"], state["indices"]), None),
+            'sql_writer.write_sql.relation': (self._setup_sql_writer_relation, lambda writer: writer.write_sql(), None),
+            'sql_writer.write_sql.text': (self._setup_sql_writer_text, lambda writer: writer.write_sql(), None),
+            'catalog.build': (self._setup_catalog_build, lambda sources: CatalogStore(registry=schema_registry, sources=sources), None),
+            'catalog.lookup.index': (self._setup_catalog, self._run_catalog_lookup, None),
+            # The DataFrame filter the index replaces scans the whole table per lookup
+            'catalog.lookup.scan': (self._setup_catalog, self._run_catalog_scan, BenchmarkSuite.QUADRATIC_MAX_ROWS),
+        })
+        if self.case_filter:
+            cases = {name: case for name, case in cases.items() if any(name == prefix or name.startswith(f"{prefix}.") for prefix in self.case_filter)}
+        return cases
+
+    # Fixtures
+
+    def _path(self, name):
+        return os.path.join(self.work_dir, name)
+
+    def _frame(self, n):
+        """Follower-like rows with two id columns (a few equal, ~1% duplicate pairs) and two text columns."""
+        rng = np.random.default_rng(self.seed)
+        user_ids = rng.integers(1, max(2, n // 4), size=n)
+        follower_ids = rng.integers(1, max(2, n // 4), size=n)
+        duplicates = rng.random(n) < 0.01
+        follower_ids[duplicates] = user_ids[duplicates]
+        duplicate_of = rng.integers(0, n, size=n)
+        user_ids[duplicates] = user_ids[duplicate_of[duplicates]]
+        follower_ids[duplicates] = follower_ids[duplicate_of[duplicates]]
+        numbers = pd.Series(np.arange(n)).astype(str)
+        return pd.DataFrame({
+            'user_id': user_ids,
+            'follower_id': follower_ids,
+            'name': 'Benchmark name ' + numbers,
+            'info': 'A generated description of the playlist used by the benchmarks, row ' + numbers
+        })
+
+    def _fixture_csv(self, name, n, build):
+        """Write (once per size) and return the path of a fixture CSV."""
+        path = self._path(f"{name}_{n}.csv")
+        if not os.path.exists(path):
+            build(n).to_csv(path, index=False)
+        return path
+
+    @staticmethod
+    def _order_rows(row, process_column_counter):
+        report = process_column_counter(row)
+        row['order_number'] = report['user_id'][str(row['user_id'])]
+        return row
+
+    def _setup_scraper(self, n):
+        def transform(self, items, count_report=None):
+            user_ids = self.random_machine.get_random_nums(pool_size=50, len=len(items), offset=1, sorted=False)
+            return [{
+                "user_id": user_ids[index],
+                "name": item['name'],
+                "info": item['description'],
+                "cover_pic": item["images"][0]["url"]
+            } for index, item in enumerate(items)]
+        scrapper = SpotifyPublicScrapper(
+            client_id=None,
+            client_secret=None,
+            default_max_each=50,
+            write_to=self._path('scraped.csv'),
+            random_machine=RandomMachine(seed=self.seed),
+            client=FakeSpotifyClient()
+        )
+        return {"scrapper": scrapper, "n": n, "transform": transform}
+
+    def _run_scraper(self, state):
+        scrapper = state["scrapper"]
+        scrapper.scrap(query='benchmark', query_type='playlist', limit=state["n"], data_transformer=state["transform"])
+        # scrap() reports failures by printing them, which would pass for a very fast run
+        if scrapper._sp.calls != math.ceil(state["n"] / scrapper.default_max_each):
+            raise RuntimeError("SpotifyPublicScrapper.scrap did not fetch every page.")
+
+    def _setup_sanitizer(self, n):
+        # Every run works on its own copy, as save_csv overwrites the file it loaded
+        working_copy = self._path('sanitized.csv')
+        shutil.copyfile(self._fixture_csv('sanitizer', n, self._frame), working_copy)
+        sanitizer = CSVDataRowsSanitizer(working_copy, rng=np.random.default_rng(self.seed))
+        sanitizer.load_csv()
+        return sanitizer
+
+    def _setup_random_machine(self, n):
+        rng = np.random.default_rng(self.seed)
+        frame = self._frame(n)
+        return {
+            "rm": RandomMachine(seed=self.seed),
+            "n": n,
+            "names": frame['name'],
+            "genders": np.where(rng.random(n) < 0.5, 'Female', 'Male'),
+            "csv_file": self._fixture_csv('sanitizer', n, self._frame),
+            "indices": rng.integers(1, n + 1, size=max(1, n // 100))
+        }
+
+    def _relation_frame(self, n):
+        rng = np.random.default_rng(self.seed)
+        return pd.DataFrame({'song_id': rng.integers(1, 527, size=n), 'user_id': rng.integers(1, 51, size=n)})
+
+    def _text_frame(self, n):
+        frame = self._frame(n)
+        rng = np.random.default_rng(self.seed)
+        return pd.DataFrame({
+            'user_id': rng.integers(1, 51, size=n),
+            'name': frame['name'],
+            'info': frame['info'].where(rng.random(n) < 0.9, None),
+            'cover_pic': 'https://i.scdn.co/image/' + frame.index.astype(str)
+        })
+
+    def _setup_sql_writer_relation(self, n):
+        return SQLWriter(
+            schema=schema_registry['user_liked_song'],
+            input_csv_file=self._fixture_csv('relation', n, self._relation_frame),
+            output_sql_file=self._path('relation.sql'),
+            extended_insert=True,
+            chunksize=500000
+        )
+
+    def _setup_sql_writer_text(self, n):
+        return SQLWriter(
+            schema=schema_registry['playlist'],
+            input_csv_file=self._fixture_csv('text', n, self._text_frame),
+            output_sql_file=self._path('text.sql'),
+            chunksize=500000
+        )
+
+    def _catalog_frame(self, n):
+        # About ten liked songs per user, so a lookup returns one page
+        rng = np.random.default_rng(self.seed)
+        return pd.DataFrame({'song_id': rng.integers(1, 527, size=n), 'user_id': rng.integers(1, max(2, n // 10), size=n)})
+
+    def _setup_catalog_build(self, n):
+        return {'user_liked_song': self._fixture_csv('catalog', n, self._catalog_frame)}
+
+    def _setup_catalog(self, n):
+        catalog = CatalogStore(registry=schema_registry, sources=self._setup_catalog_build(n))
+        frame = pd.read_csv(self._fixture_csv('catalog', n, self._catalog_frame))
+        return {"catalog": catalog, "frame": frame, "user_ids": np.unique(frame['user_id']).tolist()}
+
+    @staticmethod
+    def _latencies(lookup, keys):
+        """Call lookup(key) for every key (every row is returned once) and return the p50/p99 latency."""
+        latencies = np.empty(len(keys), dtype='int64')
+        for position, key in enumerate(keys):
+            started_at = time.perf_counter_ns()
+            lookup(key)
+            latencies[position] = time.perf_counter_ns() - started_at
+        return {"p50_us": round(float(np.percentile(latencies, 50)) / 1000, 2), "p99_us": round(float(np.percentile(latencies, 99)) / 1000, 2)}
+
+    def _run_catalog_lookup(self, state):
+        catalog = state["catalog"]
+        return BenchmarkSuite._latencies(lambda user_id: catalog.lookup('user_liked_song', 'user_id', user_id, limit=CatalogStore.MAX_PAGE_SIZE), state["user_ids"])
+
+    def _run_catalog_scan(self, state):
+        frame = state["frame"]
+        return BenchmarkSuite._latencies(lambda user_id: frame[frame['user_id'] == user_id].head(CatalogStore.MAX_PAGE_SIZE).to_dict('records'), state["user_ids"])
+
+    # Measurement
+
+    def _quietly(self):
+        # The components print per batch; millions of lines would cost more than the work measured
+        return contextlib.redirect_stdout(open(os.devnull, 'w'))
+
+    def measure(self, name, n):
+        setup, run, max_rows = self.cases()[name]
+        if max_rows is not None and n > max_rows:
+            return {"case": name, "rows": n, "skipped": f"limited to {max_rows} rows"}
+        timings = []
+        metrics = None
+        spent = 0.0
+        while len(timings) < self.max_runs and (not timings or spent < self.min_seconds):
+            with self._quietly():
+                state = setup(n)
+                # As timeit does: garbage left by earlier cases would otherwise be collected during this one
+                gc.disable()
+                try:
+                    started_at = time.perf_counter()
+                    reported = run(state)
+                    elapsed = time.perf_counter() - started_at
+                finally:
+                    gc.enable()
+            # Cases may return extra metrics (e.g. lookup latencies); the fastest run's are kept
+            if isinstance(reported, dict) and (not timings or elapsed < min(timings)):
+                metrics = reported
+            timings.append(elapsed)
+            spent += elapsed
+        seconds = min(timings)
+        result = {"case": name, "rows": n, "seconds": round(seconds, 6), "rows_per_second": round(n / seconds, 1) if seconds > 0 else None, "runs": len(timings)}
+        if metrics is not None:
+            result.update(metrics)
+        if name in BenchmarkSuite.REFERENCE_CASES:
+            result["reference"] = True
+        if self.measure_memory:
+            with self._quietly():
+                state = setup(n)
+                tracemalloc.start()
+                try:
+                    run(state)
+                    result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+        return result
+
+    def run(self, selection=None):
+        """
+        Run every selected case at every scale and return the results.
+
+        Args:
+            selection (list, optional): Only measure these (case name, rows) pairs.
+        """
+        temporary = self.work_dir is None
+        self.work_dir = tempfile.mkdtemp(prefix='spotify_benchmarks_') if temporary else self.work_dir
+        os.makedirs(self.work_dir, exist_ok=True)
+        selection = selection if selection is not None else [(name, n) for n in self.scales for name in self.cases()]
+        results = []
+        try:
+            for name, n in selection:
+                result = self.measure(name, n)
+                results.append(result)
+                BenchmarkSuite.print_result(result)
+        finally:
+            if temporary:
+                shutil.rmtree(self.work_dir, ignore_errors=True)
+                self.work_dir = None
+        return results
+
+    def recheck(self, results, baseline, tolerance=0.3, attempts=2):
+        """
+        Measure the cases that regressed against the baseline again, keeping the best throughput and
+        the lowest peak memory of every case, so a burst of load on a shared machine is not reported
+        as a regression. Stops early once no case regresses.
+
+        Returns:
+            list: The results with the rechecked cases replaced.
+        """
+        results = list(results)
+        for _ in range(attempts):
+            regressed = [position for position, result in enumerate(results) if BenchmarkSuite._regressions(result, baseline, tolerance)]
+            if not regressed:
+                break
+            print(f"Measuring {len(regressed)} case(s) that regressed again.")
+            again = self.run([(results[position]["case"], results[position]["rows"]) for position in regressed])
+            for position, result in zip(regressed, again):
+                best = dict(results[position]) if results[position]["seconds"] <= result["seconds"] else dict(result)
+                memory = [r["peak_memory_bytes"] for r in (results[position], result) if r.get("peak_memory_bytes") is not None]
+                if memory:
+                    best["peak_memory_bytes"] = min(memory)
+                results[position] = best
+        return results
+
+    @staticmethod
+    def print_result(result, comparison=None):
+        if "skipped" in result:
+            print(f"{result['case']:<45} {result['rows']:>10}  skipped ({result['skipped']})")
+            return
+        memory = f"{result['peak_memory_bytes'] / 1024 / 1024:10.1f} MiB" if result.get("peak_memory_bytes") is not None else ''
+        latency = f" p50 {result['p50_us']:.1f}us p99 {result['p99_us']:.1f}us" if "p50_us" in result else ''
+        reference = ' (reference, not compared)' if result.get("reference") else ''
+        print(f"{result['case']:<45} {result['rows']:>10} {result['seconds']:10.4f}s {result['rows_per_second']:>14.0f} rows/s {memory}{latency}{reference}{' ' + comparison if comparison else ''}")
+
+    # Baseline
+
+    @staticmethod
+    def _key(result):
+        return f"{result['case']}@{result['rows']}"
+
+    @staticmethod
+    def environment():
+        return {"python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__, "machine": platform.machine(), "cpus": os.cpu_count()}
+
+    @staticmethod
+    def load_baseline(path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def save_baseline(results, path, previous=None):
+        """Store the results as the baseline, keeping the entries of cases and scales not run this time."""
+        cases = dict(previous["cases"]) if previous is not None else {}
+        cases = {key: case for key, case in cases.items() if key.split('@')[0] not in BenchmarkSuite.REFERENCE_CASES}
+        for result in results:
+            if "skipped" not in result and not result.get("reference"):
+                cases[BenchmarkSuite._key(result)] = {key: result[key] for key in ('rows_per_second', 'peak_memory_bytes') if result.get(key) is not None}
+        with open(path, 'w', encoding="utf-8") as f:
+            json.dump({"environment": BenchmarkSuite.environment(), "cases": dict(sorted(cases.items()))}, f, indent=2)
+            f.write('\n')
+        print(f"Baseline of {len(cases)} case(s) written to '{path}'.")
+
+    @staticmethod
+    def _regressions(result, baseline, tolerance):
+        expected = baseline["cases"].get(BenchmarkSuite._key(result)) if "skipped" not in result and not result.get("reference") else None
+        if expected is None:
+            return []
+        regressions = []
+        # Judged by the baseline's duration, so a short case that became slow is still compared strictly
+        is_short = expected.get("rows_per_second") and result["rows"] / expected["rows_per_second"] < BenchmarkSuite.SHORT_CASE_SECONDS
+        throughput_tolerance = max(tolerance, BenchmarkSuite.SHORT_CASE_TOLERANCE) if is_short else tolerance
+        if expected.get("rows_per_second") and result["rows_per_second"] < expected["rows_per_second"] * (1 - throughput_tolerance):
+            regressions.append(f"{BenchmarkSuite._key(result)}: {result['rows_per_second']:.0f} rows/s, baseline {expected['rows_per_second']:.0f} rows/s")
+        if (
+            expected.get("peak_memory_bytes") and result.get("peak_memory_bytes") is not None
+            and result["peak_memory_bytes"] > expected["peak_memory_bytes"] * (1 + tolerance)
+            and result["peak_memory_bytes"] - expected["peak_memory_bytes"] > BenchmarkSuite.MEMORY_FLOOR_BYTES
+        ):
+            regressions.append(f"{BenchmarkSuite._key(result)}: peak memory {result['peak_memory_bytes']} bytes, baseline {expected['peak_memory_bytes']} bytes")
+        return regressions
+
+    @staticmethod
+    def compare(results, baseline, tolerance=0.3):
+        """
+        Compare results with a baseline.
+
+        Args:
+            tolerance (float): Allowed relative loss of throughput and growth of peak memory; the
+                throughput of cases faster than SHORT_CASE_SECONDS may drop by SHORT_CASE_TOLERANCE,
+                and peak memory growth below MEMORY_FLOOR_BYTES is ignored. REFERENCE_CASES are not
+                compared.
+
+        Returns:
+            list: Regressions, and measured cases missing from the baseline, as human readable
+                strings; empty if every case is within tolerance.
+        """
+        regressions = []
+        for result in results:
+            if "skipped" not in result and not result.get("reference") and BenchmarkSuite._key(result) not in baseline["cases"]:
+                regressions.append(f"{BenchmarkSuite._key(result)}: no baseline; record one with --update-baseline")
+                continue
+            regressions += BenchmarkSuite._regressions(result, baseline, tolerance)
+        return regressions
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scraper, sanitizer, random machine, SQL writer and catalog offline.")
+    parser.add_argument('--scales', nargs='+', type=float, default=list(BenchmarkSuite.SCALES), help="Row counts, e.g. 1e3 1e5 (1e7 is opt-in).")
+    parser.add_argument('--cases', nargs='+', default=None, help="Case names or prefixes (scraper, sanitizer, random_machine, sql_writer, catalog, ...).")
+    parser.add_argument('--baseline', default=BenchmarkSuite.DEFAULT_BASELINE, help="Baseline JSON to compare against.")
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.3, help="Allowed relative throughput loss / memory growth before a case counts as a regression.")
+    parser.add_argument('--output', default=None, help="Also write the raw results to this JSON file.")
+    parser.add_argument('--work-dir', default=None, help="Keep fixtures and outputs in this directory.")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the tracemalloc run of every case.")
+    parser.add_argument('--list', action='store_true', help="List the cases and exit.")
+    options = parser.parse_args(args)
+
+    suite = BenchmarkSuite(scales=options.scales, cases=options.cases, work_dir=options.work_dir, measure_memory=not options.no_memory)
+    if options.list:
+        for name, (_, _, max_rows) in suite.cases().items():
+            print(f"{name}{f' (up to {max_rows} rows)' if max_rows is not None else ''}")
+        return 0
+    results = suite.run()
+    if options.output is not None:
+        with open(options.output, 'w', encoding="utf-8") as f:
+            json.dump({"environment": BenchmarkSuite.environment(), "results": results}, f, indent=2)
+
+    baseline = BenchmarkSuite.load_baseline(options.baseline)
+    if options.update_baseline:
+        BenchmarkSuite.save_baseline(results, options.baseline, previous=baseline)
+        return 0
+    if baseline is None:
+        print(f"No baseline at '{options.baseline}'; run with --update-baseline to create one.")
+        return 0
+    results = suite.recheck(results, baseline, options.tolerance)
+    regressions = BenchmarkSuite.compare(results, baseline, options.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regression(s) against '{options.baseline}' (tolerance {options.tolerance:.0%}).")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,42 @@
+import time
+
+class FakeSpotifyClient:
+
+    __query_type_res_key_lib = {'artist':'artists', 'album':'albums', 'track':'tracks', 'playlist':'playlists', 'show':'shows', 'episode':'episodes', 'audiobook':'audiobooks'}
+
+    def __init__(self, total=None, latency=0.0):
+        """
+        Offline stand-in for spotipy.Spotify: search() returns deterministic items shaped like the
+        Web API's, so SpotifyPublicScrapper can run without credentials or network.
+
+        Args:
+            total (int, optional): Items available per query; pages past it come back short or empty.
+            latency (float): Seconds to sleep per call, to simulate the network round trip.
+        """
+        self.total = total
+        self.latency = latency
+        self.calls = 0
+
+    def _item(self, query_type, index):
+        spotify_id = f"{index:022d}"
+        return {
+            "id": spotify_id,
+            "name": f"{query_type.capitalize()} {index}",
+            "description": f"Generated {query_type} number {index} for benchmarking.",
+            "images": [{"url": f"https://i.scdn.co/image/{spotify_id}", "height": 640, "width": 640}],
+            "external_urls": {"spotify": f"https://open.spotify.com/{query_type}/{spotify_id}"},
+            "uri": f"spotify:{query_type}:{spotify_id}",
+            "release_date": f"{2000 + index % 25}-{index % 12 + 1:02d}-{index % 28 + 1:02d}",
+            "album_type": 'album',
+            "track_number": index % 12 + 1,
+        }
+
+    def search(self, q, limit=10, offset=0, type='track', market=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        end = offset + limit if self.total is None else min(offset + limit, self.total)
+        items = [self._item(type, index) for index in range(offset, max(offset, end))]
+        return {FakeSpotifyClient.__query_type_res_key_lib[type]: {
+            "href": None, "limit": limit, "offset": offset, "total": self.total, "items": items
+        }}
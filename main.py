@@ -1,13 +1,16 @@
-import spotipy, os, csv, math
-import pandas as pd
-from spotipy.oauth2 import SpotifyClientCredentials
+import os, sys, csv, json, math, argparse, subprocess, threading
+from functools import partial
 from dotenv import load_dotenv
 from pathlib import Path
-from utils.RandomMachine import RandomMachine
-from utils.SQLWriter import SQLWriter
+from utils.DatabaseSink import DatabaseSink
+from utils.SQLDumpOrchestrator import SQLDumpOrchestrator
+from utils.PipelineRunner import PipelineRunner, Stage
+from utils.PerformanceMonitor import PerformanceMonitor
 from utils.CSVWriter import CSVWriter
-from utils.SpotifyPublicScrapper import SpotifyPublicScrapper
-from utils.CSVDataRowsSanitizer import CSVDataRowsSanitizer
+from schema import schema_registry, source_schemas
+# pandas, numpy, spotipy and pymysql are imported by the code paths that need them (through
+# RandomMachine, SQLWriter, CSVDataRowsSanitizer, IntegrityChecker and SpotifyPublicScrapper), so
+# importing main stays cheap; `python main.py importtime` checks it
 
 # Environment variables setup
 environment = os.environ.get("ENVIRONMENT")
@@ -40,19 +43,35 @@ ph_email_domains = [
   "infinitepossibilities.biz"
 ]
 
-# Create a random manchine to provide more data variation
-randomer = RandomMachine(ph_email_domains=ph_email_domains)
+# Set RANDOM_SEED to reproduce a previous run; every stage draws from its own sub-stream of this seed
+random_seed = int(os.environ["RANDOM_SEED"]) if os.environ.get("RANDOM_SEED") else None
+randomer = None
+sp = None
+# Pipeline stages run on threads and may ask for the shared objects at the same time
+_lazy_lock = threading.Lock()
 
-# Load environment variables
-# sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-#     client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-#     client_secret=os.getenv("SPOTIFY_CLIENT_SECRET")
-# ))
-sp = SpotifyPublicScrapper(
-    client_id=os.getenv("SPOTIFY_CLIENT_ID"),
-    client_secret=os.getenv("SPOTIFY_CLIENT_SECRET"),
-    random_machine=randomer
-)
+def get_random_machine():
+    # Create a random manchine to provide more data variation, on first use
+    global randomer
+    with _lazy_lock:
+        if randomer is None:
+            from utils.RandomMachine import RandomMachine
+            randomer = RandomMachine(ph_email_domains=ph_email_domains, seed=random_seed)
+            print(f"Random seed: {randomer.seed}")
+    return randomer
+
+def get_scrapper():
+    # The Spotify client (and its credentials exchange) is only set up once a scrap function needs it.
+    # It has no random machine of its own: every scrape stage passes its spawned one to scrap()
+    global sp
+    with _lazy_lock:
+        if sp is None:
+            from utils.SpotifyPublicScrapper import SpotifyPublicScrapper
+            sp = SpotifyPublicScrapper(
+                client_id=os.getenv("SPOTIFY_CLIENT_ID"),
+                client_secret=os.getenv("SPOTIFY_CLIENT_SECRET")
+            )
+    return sp
 
 # playlists = sp.user_playlists('spotify')
 # print(playlists)
@@ -73,16 +92,24 @@ def write_to_csv(file_path=None, data_set=None):
     
     return True
 
+def csv_table_schema(csv_file):
+    # Schema of the table generated from csv_file (see table_csv_files), or None for other CSVs
+    normalized = os.path.normpath(csv_file)
+    table = next((name for name, path in table_csv_files.items() if os.path.normpath(path) == normalized), None)
+    return schema_registry[table] if table is not None else None
+
 def csv_data_rows_sanitizer(
     input_csv=None,
     columns_to_check=None, action='modify', modify_column=None,
     trim_column=None, max_length=None,
     random_column=None, min_value=None, max_value=None, random_is_integer=True,
     remove_column_name=None, transform_function=None, columns_to_count_on_transform=None,
-    empty_column_name=None, empty_extra_rows=0, equal_columns=None
+    empty_column_name=None, empty_extra_rows=0, equal_columns=None, rng=None,
+    column_limits=None, byte_limits=None, store=None
 ):
     if input_csv is not None:
-        handler = CSVDataRowsSanitizer(input_csv)
+        from utils.CSVDataRowsSanitizer import CSVDataRowsSanitizer
+        handler = CSVDataRowsSanitizer(input_csv, rng=rng, store=store, schema=csv_table_schema(input_csv))
         if columns_to_check is not None and action in ['modify','remove']:
             modify_column = None if action == 'remove' else columns_to_check[0] if modify_column is None else modify_column
             handler.process(
@@ -99,6 +126,11 @@ def csv_data_rows_sanitizer(
                 trim_column=trim_column,
                 max_length=max_length
             )
+        if column_limits is not None:
+            handler.process(
+                column_limits=column_limits,
+                byte_limits=byte_limits
+            )
         if random_column is not None and min_value is not None and max_value is not None:
             handler.process(
                 random_column=random_column,
@@ -125,7 +157,7 @@ def csv_data_rows_sanitizer(
 
 def scrap_spotify_top_artist(limit=20):
 
-    results = sp.search(q="top artists", limit=limit, type="artist")
+    results = get_scrapper().search(q="top artists", limit=limit, type="artist")
     items = results['artists']['items']
     artists = [{
         "name": item['name'],
@@ -143,58 +175,50 @@ def scrap_spotify_top_artist(limit=20):
     if result is True:
         print(f"Successfully scrapped {limit} Spotify Top Artists!")
     else:
-        print(f"Spotify {limit} Top Artists scrapping failed...")
+        raise RuntimeError(f"Spotify {limit} Top Artists scrapping failed...")
 
-def extract_data_set_users(pool_size=10000, limit=50):
-    random_indices = randomer.get_random_nums(offset=0, pool_size=pool_size, len=limit, sorted=True)
+def extract_data_set_users(pool_size=10000, limit=50, unique_emails=False):
+    stage_randomer = get_random_machine().spawn('users')
+    random_indices = stage_randomer.get_random_nums(offset=0, pool_size=pool_size, len=limit, sorted=True)
     # print('random_indices', random_indices)
     try:
-        extracted_df = randomer.extract_csv_rows_pandas(f'{repo_path}/data/SocialMediaUsersDataset.csv', random_indices)
-        extracted_df["Profie Pic"] = None
-
-        count_female = extracted_df[extracted_df["Gender"] == "Female"]["Gender"].count()
-        random_nums_set_female = randomer.get_random_nums(pool_size=150, len=count_female, sorted=False)
-        
-        count_male = extracted_df[extracted_df["Gender"] == "Male"]["Gender"].count()
-        random_nums_set_male = randomer.get_random_nums(pool_size=150, len=count_male, sorted=False)
-
-        counter = 0
-        for _, row in extracted_df[extracted_df["Gender"] == "Female"].iterrows():
-            extracted_df.loc[_, "Profie Pic"] = f"https://randomuser.me/api/portraits/women/{random_nums_set_female[counter]}.jpg"
-            extracted_df.loc[_, "Email"] = randomer.create_random_email_addr(name=row['Name'])
-            counter +=1
-
-        counter = 0
-        for _, row in extracted_df[extracted_df["Gender"] == "Male"].iterrows():
-            extracted_df.loc[_, "Profie Pic"] = f"https://randomuser.me/api/portraits/men/{random_nums_set_male[counter]}.jpg"
-            extracted_df.loc[_, "Email"] = randomer.create_random_email_addr(name=row['Name'])
-            counter +=1
-
-        extracted_dicts = extracted_df.to_dict('records')
-        
-        users = [{
-            "index": index,
-            "name": user['Name'],
-            "email": user['Email'],
-            "profile_pic": user['Profie Pic']
-        } for index, user in enumerate(extracted_dicts)]
-
-        result = write_to_csv(
-            file_path="data/dataset_users.csv",
-            data_set=users
+        extracted_df = stage_randomer.extract_csv_rows_indexed(f'{repo_path}/data/SocialMediaUsersDataset.csv', random_indices, schema=source_schemas['social_media_users'])
+        users = stage_randomer.synthesize_users(
+            names=extracted_df['Name'],
+            genders=extracted_df['Gender'],
+            unique_emails=unique_emails
         )
-        if result is True:
-            print(f"Successfully scrapped {limit} users from Kaggle dataset!")
-        else:
-            print(f"Kaggle {limit} users dataset extraction failed...")
+        users.insert(0, 'index', range(len(users)))
+        users.to_csv("data/dataset_users.csv", index=False)
+        print(f"Successfully scrapped {limit} users from Kaggle dataset!")
 
         # print("Array dict:\n", users)
-        # Save to a new CSV if needed
-        # extracted_df.to_csv('extracted_rows.csv', index=False)
     except Exception as e:
+        # Raised again, so the pipeline runner marks the stage failed instead of recording it as up to date
         print(e)
+        raise
 
-def scrap_spotify_top_albums(query='', limit=100, write_mode=None):
+def synthesize_data_set_users(size=1000000, pool_size=10000, unique_emails=True, output_csv="data/dataset_users.csv"):
+    # Draws `size` users with replacement from the first `pool_size` rows of the Kaggle dataset
+    stage_randomer = get_random_machine().spawn('users')
+    try:
+        pool_df = stage_randomer.extract_csv_rows_indexed(f'{repo_path}/data/SocialMediaUsersDataset.csv', range(1, pool_size + 1), schema=source_schemas['social_media_users'])
+        users = stage_randomer.synthesize_users(
+            names=pool_df['Name'],
+            genders=pool_df['Gender'],
+            size=size,
+            unique_emails=unique_emails
+        )
+        users.insert(0, 'index', range(len(users)))
+        users.to_csv(output_csv, index=False)
+        print(f"Successfully synthesized {size} users from Kaggle dataset!")
+    except Exception as e:
+        print(e)
+        raise
+
+def scrap_spotify_top_albums(query='', limit=100, write_mode=None, random_machine=None):
+    sp = get_scrapper()
+    randomer = random_machine if random_machine is not None else get_random_machine().spawn('scrape_albums')
     try:
         csv_writer = CSVWriter(file_path="data/spotify_albums.csv")
         def_max_each = 10
@@ -233,8 +257,9 @@ def scrap_spotify_top_albums(query='', limit=100, write_mode=None):
     
     except Exception as e:
         print(f"Spotify {limit} Top Albums scrapping failed... {e}")
+        raise
 
-def scrap_spotify_songs(query='', limit=100, write_mode=None):
+def scrap_spotify_songs(query='', limit=100, write_mode=None, random_machine=None):
 
     def data_transfomer(self, items, count_report=None):
         albums_id_set = self.random_machine.get_random_nums(pool_size=102, len=len(items), offset=1, sorted=False, no_repeat=True)
@@ -246,6 +271,7 @@ def scrap_spotify_songs(query='', limit=100, write_mode=None):
         } for index, item in enumerate(items)]
         return results
 
+    sp = get_scrapper()
     sp.switch_collect_mode(write_to="data/spotify_songs.csv")
     # sp.switch_collect_mode(write_to=None)
     collection = sp.scrap(
@@ -255,11 +281,13 @@ def scrap_spotify_songs(query='', limit=100, write_mode=None):
         limit=limit,
         data_transformer=data_transfomer,
         enforce_write_mode_to=write_mode,
-        to_count_on_transform=['album_id']
+        to_count_on_transform=['album_id'],
+        raise_errors=True,
+        random_machine=random_machine if random_machine is not None else get_random_machine().spawn('scrape_songs')
     )
     # print('collection =>\n', collection)
 
-def scrap_spotify_playlists(query='', limit=100, offset=0, write_mode=None):
+def scrap_spotify_playlists(query='', limit=100, offset=0, write_mode=None, random_machine=None):
     
     def data_transfomer(self, items, count_report=None):
         users_id_set = self.random_machine.get_random_nums(pool_size=50, len=len(items), offset=1, sorted=False)
@@ -271,6 +299,7 @@ def scrap_spotify_playlists(query='', limit=100, offset=0, write_mode=None):
         } for index, item in enumerate(items)]
         return results
 
+    sp = get_scrapper()
     # sp.switch_collect_mode(write_to=None)
     sp.switch_collect_mode(write_to="data/spotify_playlists.csv")
     collection = sp.scrap(
@@ -280,21 +309,43 @@ def scrap_spotify_playlists(query='', limit=100, offset=0, write_mode=None):
         # query_market='HK,TW,US',
         limit=limit,
         data_transformer=data_transfomer,
-        enforce_write_mode_to=write_mode
+        enforce_write_mode_to=write_mode,
+        raise_errors=True,
+        random_machine=random_machine if random_machine is not None else get_random_machine().spawn('scrape_playlists')
     )
     # print('collection =>\n', collection)
 
-def create_playlist_entries():
+def is_randomized_relation(table_name, store=None):
+    # The relation CSVs start as a single `dummy` column, one row per relation to generate, which the
+    # randomizers drop. Running them again on their own output would append empty rows and keep the
+    # previous ids, so a table without the column is left as it is
+    path = table_csv_files[table_name]
+    if store is not None and path in store:
+        columns = store.get(path, copy=False).columns
+    else:
+        with open(path, newline='', encoding='utf-8') as f:
+            columns = next(csv.reader(f), [])
+    if 'dummy' in columns:
+        return False
+    print(f"Skipping '{path}': it has no 'dummy' column, so it was already randomized. Restore the raw file to generate it again.")
+    return True
+
+def create_playlist_entries(store=None):
+    if is_randomized_relation('playlist_entry', store):
+        return
+    stage_rng = get_random_machine().spawn('playlist_entries').rng
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_playlist_entries.csv',
-        random_column='play_list_id', min_value=1, max_value=148, random_is_integer=True
+        input_csv='data/dataset_playlist_entries.csv', store=store,
+        random_column='playlist_id', min_value=1, max_value=148, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_playlist_entries.csv',
-        random_column='song_id', min_value=1, max_value=526, random_is_integer=True
+        input_csv='data/dataset_playlist_entries.csv', store=store,
+        random_column='song_id', min_value=1, max_value=526, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_playlist_entries.csv',
+        input_csv='data/dataset_playlist_entries.csv', store=store,
         remove_column_name='dummy'
     )
     def custom_transform(row, process_column_counter):
@@ -305,230 +356,233 @@ def create_playlist_entries():
         return row
     
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_playlist_entries.csv',
+        input_csv='data/dataset_playlist_entries.csv', store=store,
         transform_function=custom_transform,
         columns_to_count_on_transform=['playlist_id']
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_playlist_entries.csv',
-        columns_to_check=["playlist_id","song_id","order"],
+        input_csv='data/dataset_playlist_entries.csv', store=store,
+        columns_to_check=["playlist_id","song_id","order_number"],
         action="remove"
     )
     
-def create_user_followers():
+def create_user_followers(store=None):
+    if is_randomized_relation('user_follower', store):
+        return
+    stage_rng = get_random_machine().spawn('user_followers').rng
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_followers.csv',
+        input_csv='data/dataset_user_followers.csv', store=store,
         empty_column_name='empty', empty_extra_rows=1820
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_followers.csv',
-        random_column='user_id', min_value=1, max_value=50, random_is_integer=True
+        input_csv='data/dataset_user_followers.csv', store=store,
+        random_column='user_id', min_value=1, max_value=50, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_followers.csv',
-        random_column='follower_id', min_value=1, max_value=50, random_is_integer=True
+        input_csv='data/dataset_user_followers.csv', store=store,
+        random_column='follower_id', min_value=1, max_value=50, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_followers.csv',
+        input_csv='data/dataset_user_followers.csv', store=store,
         remove_column_name='dummy'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_followers.csv',
+        input_csv='data/dataset_user_followers.csv', store=store,
         remove_column_name='empty'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_followers.csv',
+        input_csv='data/dataset_user_followers.csv', store=store,
         equal_columns=('user_id', 'follower_id')
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_followers.csv',
+        input_csv='data/dataset_user_followers.csv', store=store,
         columns_to_check=["user_id", "follower_id"],
         action="remove"
     )
 
-def create_artist_followers():
+def create_artist_followers(store=None):
+    if is_randomized_relation('artist_follower', store):
+        return
+    stage_rng = get_random_machine().spawn('artist_followers').rng
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_artist_followers.csv',
+        input_csv='data/dataset_artist_followers.csv', store=store,
         empty_column_name='empty', empty_extra_rows=856
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_artist_followers.csv',
-        random_column='artist_id', min_value=1, max_value=20, random_is_integer=True
+        input_csv='data/dataset_artist_followers.csv', store=store,
+        random_column='artist_id', min_value=1, max_value=20, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_artist_followers.csv',
-        random_column='follower_id', min_value=1, max_value=50, random_is_integer=True
+        input_csv='data/dataset_artist_followers.csv', store=store,
+        random_column='follower_id', min_value=1, max_value=50, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_artist_followers.csv',
+        input_csv='data/dataset_artist_followers.csv', store=store,
         remove_column_name='dummy'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_artist_followers.csv',
+        input_csv='data/dataset_artist_followers.csv', store=store,
         remove_column_name='empty'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_artist_followers.csv',
+        input_csv='data/dataset_artist_followers.csv', store=store,
         columns_to_check=["artist_id", "follower_id"],
         action="remove"
     )
 
-def create_user_added_playlists():
+def create_user_added_playlists(store=None):
+    if is_randomized_relation('user_added_playlist', store):
+        return
+    stage_rng = get_random_machine().spawn('user_added_playlists').rng
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_playlists.csv',
+        input_csv='data/dataset_user_added_playlists.csv', store=store,
         empty_column_name='empty', empty_extra_rows=3920
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_playlists.csv',
-        random_column='playlist_id', min_value=1, max_value=148, random_is_integer=True
+        input_csv='data/dataset_user_added_playlists.csv', store=store,
+        random_column='playlist_id', min_value=1, max_value=148, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_playlists.csv',
-        random_column='user_id', min_value=1, max_value=50, random_is_integer=True
+        input_csv='data/dataset_user_added_playlists.csv', store=store,
+        random_column='user_id', min_value=1, max_value=50, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_playlists.csv',
+        input_csv='data/dataset_user_added_playlists.csv', store=store,
         remove_column_name='dummy'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_playlists.csv',
+        input_csv='data/dataset_user_added_playlists.csv', store=store,
         remove_column_name='empty'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_playlists.csv',
+        input_csv='data/dataset_user_added_playlists.csv', store=store,
         columns_to_check=["playlist_id", "user_id"],
         action="remove"
     )
     
 
-def create_user_added_albums():
+def create_user_added_albums(store=None):
+    if is_randomized_relation('user_added_album', store):
+        return
+    stage_rng = get_random_machine().spawn('user_added_albums').rng
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_albums.csv',
+        input_csv='data/dataset_user_added_albums.csv', store=store,
         empty_column_name='empty', empty_extra_rows=3130
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_albums.csv',
-        random_column='album_id', min_value=1, max_value=102, random_is_integer=True
+        input_csv='data/dataset_user_added_albums.csv', store=store,
+        random_column='album_id', min_value=1, max_value=102, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_albums.csv',
-        random_column='user_id', min_value=1, max_value=50, random_is_integer=True
+        input_csv='data/dataset_user_added_albums.csv', store=store,
+        random_column='user_id', min_value=1, max_value=50, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_albums.csv',
+        input_csv='data/dataset_user_added_albums.csv', store=store,
         remove_column_name='dummy'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_albums.csv',
+        input_csv='data/dataset_user_added_albums.csv', store=store,
         remove_column_name='empty'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_added_albums.csv',
+        input_csv='data/dataset_user_added_albums.csv', store=store,
         columns_to_check=["album_id", "user_id"],
         action="remove"
     )
 
-def create_user_liked_songs():
+def create_user_liked_songs(store=None):
+    if is_randomized_relation('user_liked_song', store):
+        return
+    stage_rng = get_random_machine().spawn('user_liked_songs').rng
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_liked_songs.csv',
+        input_csv='data/dataset_user_liked_songs.csv', store=store,
         empty_column_name='empty', empty_extra_rows=18900
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_liked_songs.csv',
-        random_column='song_id', min_value=1, max_value=526, random_is_integer=True
+        input_csv='data/dataset_user_liked_songs.csv', store=store,
+        random_column='song_id', min_value=1, max_value=526, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_liked_songs.csv',
-        random_column='user_id', min_value=1, max_value=50, random_is_integer=True
+        input_csv='data/dataset_user_liked_songs.csv', store=store,
+        random_column='user_id', min_value=1, max_value=50, random_is_integer=True,
+        rng=stage_rng
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_liked_songs.csv',
+        input_csv='data/dataset_user_liked_songs.csv', store=store,
         remove_column_name='dummy'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_liked_songs.csv',
+        input_csv='data/dataset_user_liked_songs.csv', store=store,
         remove_column_name='empty'
     )
     csv_data_rows_sanitizer(
-        input_csv='data/dataset_user_liked_songs.csv',
+        input_csv='data/dataset_user_liked_songs.csv', store=store,
         columns_to_check=["song_id", "user_id"],
         action="remove"
     )
 
-def write_artists_sql():
-    table_name = 'artist'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    name VARCHAR(32) NOT NULL,
-    bio VARCHAR(500),
-    email VARCHAR(255) NOT NULL,
-    profile_pic VARCHAR(255),
-    created_at DATETIME DEFAULT NOW(),
-    updated_at DATETIME DEFAULT NOW() ON UPDATE CURRENT_TIMESTAMP
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    def data_transformer(df):
-        df["bio"] = df["bio"].apply(lambda x: x[:500] if isinstance(x, str) and len(x) > 500 else x)
-        return df
-    
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+def create_sql_writer(**kwargs):
+    # SQLWriter pulls in pandas, so it is imported by the writers rather than with main.
+    # Every table is parsed with pyarrow when it is installed (the C parser otherwise); the SQL is the same
+    from utils.SQLWriter import SQLWriter
+    kwargs.setdefault('csv_engine', 'auto')
+    return SQLWriter(**kwargs)
+
+def run_sql_writer(sql_writer, sink=None):
+    # Write the .sql file, or load straight into the database when a DatabaseSink is given
+    if sink is not None:
+        return sql_writer.write_to_database(sink)
+    return sql_writer.write_sql()
+
+def write_artists_sql(sink=None, deferred_indexes=False, store=None):
+    sql_writer = create_sql_writer(
+        schema=schema_registry['artist'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/spotify_artists_complete.csv',
         output_sql_file='sql/artists.sql',
         drop_columns=['spty_url', 'spty_uri'],
-        data_transformer=data_transformer
-    )
-    sql_writer.write_sql()
-
-def write_users_sql():
-    table_name = 'user'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    name VARCHAR(32) NOT NULL,
-    email VARCHAR(255) NOT NULL,
-    profile_pic VARCHAR(255),
-    created_at DATETIME DEFAULT NOW(),
-    updated_at DATETIME DEFAULT NOW() ON UPDATE CURRENT_TIMESTAMP
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+        trim_to_schema=True
+    )
+    run_sql_writer(sql_writer, sink)
+
+def write_users_sql(sink=None, deferred_indexes=False, store=None):
+    sql_writer = create_sql_writer(
+        schema=schema_registry['user'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/dataset_users.csv',
         output_sql_file='sql/users.sql',
-        drop_columns=['index']
-    )
-    sql_writer.write_sql()
-
-def write_albums_sql():
-    table_name = 'album'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    artist_id INT NOT NULL,
-    title VARCHAR(100) NOT NULL,
-    cover_pic VARCHAR(255),
-    created_at DATETIME DEFAULT NOW(),
-    updated_at DATETIME DEFAULT NOW() ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY(artist_id)
-        REFERENCES artist(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+        drop_columns=['index'],
+        # synthesize_data_set_users draws up to millions of users from a pool of 10000 names and a few
+        # hundred portraits, so those columns repeat; in the other tables nearly every text value is
+        # distinct and categoricals would only add overhead
+        categorical_ratio=0.5
+    )
+    run_sql_writer(sql_writer, sink)
+
+def write_albums_sql(sink=None, deferred_indexes=False, store=None):
+    sql_writer = create_sql_writer(
+        schema=schema_registry['album'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/spotify_albums_rename.csv',
         output_sql_file='sql/albums.sql',
         drop_columns=['spty_url', 'spty_uri', 'type']
     )
-    sql_writer.write_sql()
+    run_sql_writer(sql_writer, sink)
 
-def write_songs_sql():
+def write_songs_sql(sink=None, deferred_indexes=False, store=None):
 
     # csv_data_rows_sanitizer(
     #     input_csv='data/spotify_songs.csv',
@@ -538,270 +592,485 @@ def write_songs_sql():
     #     random_is_integer=True
     # )
 
-    table_name = 'song'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    album_id INT NOT NULL,
-    name VARCHAR(100) NOT NULL,
-    track_number INT NOT NULL,
-    monthly_plays INT DEFAULT 0,
-    created_at DATETIME DEFAULT NOW(),
-    updated_at DATETIME DEFAULT NOW() ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY(album_id)
-        REFERENCES album(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT unq_song_name_in_album UNIQUE(album_id, name),
-    CONSTRAINT unq_song_order_in_album UNIQUE(album_id, track_number)
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    sql_writer = create_sql_writer(
+        schema=schema_registry['song'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/spotify_songs.csv',
         output_sql_file='sql/songs.sql'
         # drop_columns=['spty_url', 'spty_uri', 'type']
     )
-    sql_writer.write_sql()
-
-def write_playlists_sql():
-
-    # csv_data_rows_sanitizer(input_csv='data/spotify_playlists.csv', trim_column='name', max_length=100)
-    # csv_data_rows_sanitizer(input_csv='data/spotify_playlists.csv', trim_column='info', max_length=500)
-
-    table_name = 'playlist'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    user_id INT NOT NULL,
-    name VARCHAR(100) NOT NULL,
-    info VARCHAR(500),
-    cover_pic VARCHAR(255),
-    created_at DATETIME DEFAULT NOW(),
-    updated_at DATETIME DEFAULT NOW() ON UPDATE CURRENT_TIMESTAMP,
-    FOREIGN KEY(user_id)
-        REFERENCES user(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    run_sql_writer(sql_writer, sink)
+
+def write_playlists_sql(sink=None, deferred_indexes=False, delta=False, store=None):
+
+    # csv_data_rows_sanitizer(input_csv='data/spotify_playlists.csv', column_limits={'name': 100, 'info': 500})
+
+    sql_writer = create_sql_writer(
+        schema=schema_registry['playlist'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/spotify_playlists_reprocess.csv',
-        output_sql_file='sql/playlists.sql'
+        output_sql_file='sql/playlists.sql',
         # drop_columns=['spty_url', 'spty_uri', 'type']
+        trim_to_schema=True,
+        # delta=True writes only the rows changed since the last run to sql/playlists.delta.sql
+        hash_manifest='sql/playlists.hashes.npz',
+        delta=delta
     )
-    sql_writer.write_sql()
-
-def write_playlist_entries_sql():
-
-    table_name = 'playlist_entry'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    playlist_id INT NOT NULL,
-    song_id INT NOT NULL,
-    order_number INT NOT NULL,
-    FOREIGN KEY(playlist_id)
-        REFERENCES playlist(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    FOREIGN KEY(song_id)
-        REFERENCES song(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT unq_song_order_in_playlist UNIQUE(playlist_id, song_id, order_number)
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    run_sql_writer(sql_writer, sink)
+
+def write_playlist_entries_sql(sink=None, deferred_indexes=False, store=None):
+
+    sql_writer = create_sql_writer(
+        schema=schema_registry['playlist_entry'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/dataset_playlist_entries.csv',
-        output_sql_file='sql/playlist_entries.sql'
+        output_sql_file='sql/playlist_entries.sql',
         # drop_columns=['spty_url', 'spty_uri', 'type']
+        extended_insert=True
     )
-    sql_writer.write_sql()
+    run_sql_writer(sql_writer, sink)
 
-def write_user_followers_sql():
+def write_user_followers_sql(sink=None, deferred_indexes=False, store=None):
     
-    table_name = 'user_follower'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    user_id INT NOT NULL,
-    follower_id INT NOT NULL,
-    FOREIGN KEY(user_id)
-        REFERENCES user(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    FOREIGN KEY(follower_id)
-        REFERENCES user(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT unq_user_follower_pair UNIQUE(user_id, follower_id)
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    sql_writer = create_sql_writer(
+        schema=schema_registry['user_follower'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/dataset_user_followers.csv',
-        output_sql_file='sql/user_followers.sql'
+        output_sql_file='sql/user_followers.sql',
         # drop_columns=['spty_url', 'spty_uri', 'type']
+        extended_insert=True
     )
-    sql_writer.write_sql()
+    run_sql_writer(sql_writer, sink)
 
-def write_artist_followers_sql():
+def write_artist_followers_sql(sink=None, deferred_indexes=False, store=None):
     
-    table_name = 'artist_follower'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    artist_id INT NOT NULL,
-    follower_id INT NOT NULL,
-    FOREIGN KEY(artist_id)
-        REFERENCES artist(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    FOREIGN KEY(follower_id)
-        REFERENCES user(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT unq_artist_follower_pair UNIQUE(artist_id, follower_id)
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    sql_writer = create_sql_writer(
+        schema=schema_registry['artist_follower'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/dataset_artist_followers.csv',
-        output_sql_file='sql/artist_followers.sql'
+        output_sql_file='sql/artist_followers.sql',
         # drop_columns=['spty_url', 'spty_uri', 'type']
+        extended_insert=True
     )
-    sql_writer.write_sql()
+    run_sql_writer(sql_writer, sink)
 
-def write_user_added_playlists_sql():
+def write_user_added_playlists_sql(sink=None, deferred_indexes=False, store=None):
     
-    table_name = 'user_added_playlist'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    playlist_id INT NOT NULL,
-    user_id INT NOT NULL,
-    FOREIGN KEY(playlist_id)
-        REFERENCES playlist(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    FOREIGN KEY(user_id)
-        REFERENCES user(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT unq_playlist_user_pair UNIQUE(playlist_id, user_id)
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    sql_writer = create_sql_writer(
+        schema=schema_registry['user_added_playlist'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/dataset_user_added_playlists.csv',
-        output_sql_file='sql/user_added_playlists.sql'
+        output_sql_file='sql/user_added_playlists.sql',
         # drop_columns=['spty_url', 'spty_uri', 'type']
+        extended_insert=True
     )
-    sql_writer.write_sql()
+    run_sql_writer(sql_writer, sink)
 
-def write_user_added_albums_sql():
+def write_user_added_albums_sql(sink=None, deferred_indexes=False, store=None):
     
-    table_name = 'user_added_album'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    album_id INT NOT NULL,
-    user_id INT NOT NULL,
-    FOREIGN KEY(album_id)
-        REFERENCES album(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    FOREIGN KEY(user_id)
-        REFERENCES user(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT unq_album_user_pair UNIQUE(album_id, user_id)
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    sql_writer = create_sql_writer(
+        schema=schema_registry['user_added_album'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/dataset_user_added_albums.csv',
-        output_sql_file='sql/user_added_albums.sql'
+        output_sql_file='sql/user_added_albums.sql',
         # drop_columns=['spty_url', 'spty_uri', 'type']
+        extended_insert=True
     )
-    sql_writer.write_sql()
+    run_sql_writer(sql_writer, sink)
 
-def write_user_liked_songs_sql():
+def write_user_liked_songs_sql(sink=None, deferred_indexes=False, store=None):
     
-    table_name = 'user_liked_song'
-    create_sql = f'''
-CREATE TABLE IF NOT EXISTS {table_name} (
-    id INT PRIMARY KEY AUTO_INCREMENT,
-    song_id INT NOT NULL,
-    user_id INT NOT NULL,
-    FOREIGN KEY(song_id)
-        REFERENCES song(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    FOREIGN KEY(user_id)
-        REFERENCES user(id)
-        ON DELETE CASCADE
-        ON UPDATE CASCADE,
-    CONSTRAINT unq_song_user_pair UNIQUE(song_id, user_id)
-) CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci;
-    '''
-    sql_writer = SQLWriter(
-        create_table_statement=create_sql,
-        table_name=table_name,
+    sql_writer = create_sql_writer(
+        schema=schema_registry['user_liked_song'],
+        deferred_indexes=deferred_indexes,
+        store=store,
         input_csv_file='data/dataset_user_liked_songs.csv',
-        output_sql_file='sql/user_liked_songs.sql'
+        output_sql_file='sql/user_liked_songs.sql',
         # drop_columns=['spty_url', 'spty_uri', 'type']
+        extended_insert=True
     )
-    sql_writer.write_sql()
+    run_sql_writer(sql_writer, sink)
 
+# Writer and output of every table of the SQL dump; foreign key dependencies come from the schema registry
+sql_dump_writers = {
+    'artist': (write_artists_sql, 'sql/artists.sql'),
+    'user': (write_users_sql, 'sql/users.sql'),
+    'album': (write_albums_sql, 'sql/albums.sql'),
+    'song': (write_songs_sql, 'sql/songs.sql'),
+    'playlist': (write_playlists_sql, 'sql/playlists.sql'),
+    'playlist_entry': (write_playlist_entries_sql, 'sql/playlist_entries.sql'),
+    'user_follower': (write_user_followers_sql, 'sql/user_followers.sql'),
+    'artist_follower': (write_artist_followers_sql, 'sql/artist_followers.sql'),
+    'user_added_playlist': (write_user_added_playlists_sql, 'sql/user_added_playlists.sql'),
+    'user_added_album': (write_user_added_albums_sql, 'sql/user_added_albums.sql'),
+    'user_liked_song': (write_user_liked_songs_sql, 'sql/user_liked_songs.sql'),
+}
 
-if __name__ == "__main__":
-    # scrap_spotify_top_artist(limit=20)
-    # write_artists_sql()
-    # extract_data_set_users(pool_size=10000, limit=50)
-    # write_users_sql()
-    # scrap_spotify_top_albums(query='Glow', limit=4, write_mode='a')
-    # scrap_spotify_top_albums(query='Sorry', limit=4, write_mode='a')
-    # scrap_spotify_top_albums(query='Files', limit=4, write_mode='a')
-    # scrap_spotify_top_albums(query='Separated', limit=4, write_mode='a')
-    # scrap_spotify_top_albums(query='Drink', limit=4, write_mode='a')
-    # scrap_spotify_top_albums(query='Memories', limit=4, write_mode='a')
-    # scrap_spotify_top_albums(query='Kind', limit=4, write_mode='a')
-    # write_albums_sql()
-    # scrap_spotify_songs(query='genere:"pop,rock,jazz,r&b"', limit=422)
-    # scrap_spotify_songs(query='genere:"pop,rock,jazz,r&b"', limit=526)
-    # write_songs_sql()
-    # scrap_spotify_playlists(query='B', limit=6)
-    # scrap_spotify_playlists(query='P', limit=4, offset=12, write_mode='a')
-    # scrap_spotify_playlists(query='Q', limit=6, offset=12, write_mode='a')
-    # scrap_spotify_playlists(query='V', limit=7, offset=12, write_mode='a')
-    # scrap_spotify_playlists(query='D', limit=3, offset=12, write_mode='a')
-    # scrap_spotify_playlists(query='C', limit=4, offset=12, write_mode='a')
-    # scrap_spotify_playlists(query='F', limit=6, offset=12, write_mode='a')
-    # scrap_spotify_playlists(query='K', limit=7, offset=12, write_mode='a')
-    # scrap_spotify_playlists(query='S', limit=3, offset=12, write_mode='a')
-    # write_playlists_sql()
-    # create_playlist_entries()
-    # write_playlist_entries_sql()
-    # create_user_followers()
-    # write_user_followers_sql()
-    # create_artist_followers()
-    # write_artist_followers_sql()
-    # create_user_added_playlists()
-    # create_user_added_albums()
-    # create_user_liked_songs()
-    # write_user_added_playlists_sql()
-    # write_user_added_albums_sql()
-    # write_user_liked_songs_sql()
-    pass
+# CSV file every table is generated from
+table_csv_files = {
+    'artist': 'data/spotify_artists_complete.csv',
+    'user': 'data/dataset_users.csv',
+    'album': 'data/spotify_albums_rename.csv',
+    'song': 'data/spotify_songs.csv',
+    'playlist': 'data/spotify_playlists_reprocess.csv',
+    'playlist_entry': 'data/dataset_playlist_entries.csv',
+    'user_follower': 'data/dataset_user_followers.csv',
+    'artist_follower': 'data/dataset_artist_followers.csv',
+    'user_added_playlist': 'data/dataset_user_added_playlists.csv',
+    'user_added_album': 'data/dataset_user_added_albums.csv',
+    'user_liked_song': 'data/dataset_user_liked_songs.csv',
+}
 
+# Stages randomizing the relation tables in place: (stage name, function, table)
+relation_creators = [
+    ('create_playlist_entries', create_playlist_entries, 'playlist_entry'),
+    ('create_user_followers', create_user_followers, 'user_follower'),
+    ('create_artist_followers', create_artist_followers, 'artist_follower'),
+    ('create_user_added_playlists', create_user_added_playlists, 'user_added_playlist'),
+    ('create_user_added_albums', create_user_added_albums, 'user_added_album'),
+    ('create_user_liked_songs', create_user_liked_songs, 'user_liked_song'),
+]
+
+def _run_sanitizer_pipeline(action, table_name, seed, frame=None, in_memory=False):
+    # Process pool worker: rebuilds the parent's random machine, so the stage draws the same sub-stream
+    # (keyed by stage name) as it would in the parent, then runs the stage on its own table.
+    # Returns the changed table (or None) and the stage's counters, which the parent adds to its own stage
+    global randomer
+    from utils.RandomMachine import RandomMachine
+    with _lazy_lock:
+        randomer = RandomMachine(ph_email_domains=ph_email_domains, seed=seed)
+    with PerformanceMonitor().stage(table_name) as record:
+        if not in_memory:
+            action()
+            return None, PerformanceMonitor.counters(record)
+        from utils.DatasetStore import DatasetStore
+        store = DatasetStore(paths={table_name: table_csv_files[table_name]}, registry=schema_registry)
+        if frame is not None:
+            store.put(table_name, frame)
+        action(store=store)
+    # None when the stage left the table alone (e.g. it was already randomized)
+    return store.get(table_name, copy=False) if table_name in store.dirty() else None, PerformanceMonitor.counters(record)
+
+def run_sanitizer_pipelines(pipelines=None, max_workers=None, store=None):
+    # Runs independent sanitizer pipelines, (stage name, function, table) triples that each only touch their
+    # own table (the relation randomizers by default), in a process pool. Every worker gets the random
+    # seed of this run, so the output is the same as running them one after another, on any number of cores.
+    # With a DatasetStore the tables travel to and from the workers as DataFrames and are put back into
+    # the store; otherwise every worker rewrites its CSV file.
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    pipelines = pipelines if pipelines is not None else relation_creators
+    seed = get_random_machine().seed
+    failed = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for stage_name, action, table_name in pipelines:
+            # A table the store already holds may have unsaved changes, so the worker starts from it
+            frame = store.get(table_name, copy=False) if store is not None and store.is_loaded(table_name) else None
+            futures[executor.submit(_run_sanitizer_pipeline, action, table_name, seed, frame, store is not None)] = (stage_name, table_name)
+        for future in as_completed(futures):
+            stage_name, table_name = futures[future]
+            try:
+                df, counters = future.result()
+            except (Exception, SystemExit) as e:
+                failed.append(stage_name)
+                print(f"Sanitizer pipeline '{stage_name}' failed: {e!r}")
+                continue
+            PerformanceMonitor.count(**counters)
+            if store is not None and df is not None:
+                store.put(table_name, df)
+            print(f"Sanitizer pipeline '{stage_name}' finished.")
+    if failed:
+        raise RuntimeError(f"Sanitizer pipeline(s) {failed} failed.")
+
+def check_integrity(store=None):
+    # Checks every FOREIGN KEY and UNIQUE constraint of the schema against the CSV files (or the datasets
+    # held by `store`), before any SQL is written
+    from utils.IntegrityChecker import IntegrityChecker
+    checker = IntegrityChecker(registry=schema_registry, sources=table_csv_files, store=store)
+    violations = checker.check()
+    checker.report(violations)
+    return violations
+
+# Written by the check_integrity stage once the CSVs pass, so every sql_* stage depends on a passing check
+integrity_stamp_file = '.integrity_check.json'
+
+def check_integrity_stage(stamp_file=integrity_stamp_file):
+    # The stamp only names the checked tables, so rerunning a passing check does not change it
+    if os.path.exists(stamp_file):
+        os.remove(stamp_file)
+    if check_integrity():
+        raise RuntimeError("The CSV files violate the schema's constraints, no SQL was written.")
+    with open(stamp_file, 'w', encoding="utf-8") as f:
+        json.dump({"tables": sorted(table_csv_files), "violations": 0}, f, indent=2)
+
+def get_sql_dump_tables(deferred_indexes=False):
+    return {
+        table_name: {
+            "writer": partial(writer, deferred_indexes=deferred_indexes) if deferred_indexes else writer,
+            "output": output,
+            "depends_on": schema_registry[table_name].depends_on()
+        }
+        for table_name, (writer, output) in sql_dump_writers.items()
+    }
+
+sql_dump_tables = get_sql_dump_tables()
+
+def write_sql_dump(dump_file='sql/dump.sql', manifest_file=None, max_workers=None, deferred_indexes=False, check_integrity_first=True):
+    # Generates every table's .sql file in a process pool, then one FK-ordered dump and/or a loader manifest.
+    # With deferred_indexes each table adds its UNIQUE/FOREIGN KEY constraints after its rows are loaded
+    if check_integrity_first and check_integrity():
+        raise RuntimeError("The CSV files violate the schema's constraints, no SQL was written.")
+    orchestrator = SQLDumpOrchestrator(tables=get_sql_dump_tables(deferred_indexes), max_workers=max_workers)
+    orchestrator.build(dump_file=dump_file, manifest_file=manifest_file)
+
+def load_database(backend='mysql', pool_size=4, batch_size=1000, commit_every=10000, deferred_indexes=False, check_integrity_first=True, **connect_kwargs):
+    # Loads every table in foreign key order without going through the .sql files
+    if check_integrity_first and check_integrity():
+        raise RuntimeError("The CSV files violate the schema's constraints, nothing was loaded.")
+    sink = DatabaseSink(
+        backend=backend,
+        pool_size=pool_size,
+        batch_size=batch_size,
+        commit_every=commit_every,
+        **connect_kwargs
+    )
+    try:
+        for table_name in SQLDumpOrchestrator(tables=sql_dump_tables).load_order():
+            sql_dump_tables[table_name]["writer"](sink=sink, deferred_indexes=deferred_indexes)
+    finally:
+        sink.close()
+
+def build_in_memory(sanitize=True, checkpoints=None, deferred_indexes=False, dump_file='sql/dump.sql', check_integrity_first=True, max_workers=None, monitor=None):
+    # Runs the relation randomizers and every SQL writer against one DatasetStore: each CSV is parsed once,
+    # stages hand their DataFrames over in memory and the changed CSVs are written once, at the end.
+    # `checkpoints` names extra points to persist at ('sanitize' saves the CSVs before any SQL is written).
+    # Nothing is written back when a step fails, so a failed run leaves the CSVs as they were
+    from utils.DatasetStore import DatasetStore
+    checkpoints = set(checkpoints or [])
+    monitor = monitor if monitor is not None else PerformanceMonitor()
+    store = DatasetStore(paths=table_csv_files, registry=schema_registry)
+    if sanitize:
+        # The relation randomizers are independent of each other and run in a process pool
+        with monitor.stage('sanitize', group='sanitize'):
+            run_sanitizer_pipelines(max_workers=max_workers, store=store)
+        if 'sanitize' in checkpoints:
+            with monitor.stage('checkpoint_sanitize', group='checkpoint'):
+                store.checkpoint()
+    with monitor.stage('check_integrity', group='check'):
+        violations = check_integrity(store=store) if check_integrity_first else []
+    if violations:
+        raise RuntimeError("The datasets violate the schema's constraints, no SQL was written.")
+    for table_name in SQLDumpOrchestrator(tables=sql_dump_tables).load_order():
+        with monitor.stage(f"sql_{table_name}", group='sql'):
+            sql_dump_tables[table_name]["writer"](deferred_indexes=deferred_indexes, store=store)
+    if dump_file is not None:
+        with monitor.stage('sql_dump', group='dump'):
+            assemble_sql_dump(dump_file)
+    with monitor.stage('checkpoint', group='checkpoint'):
+        store.checkpoint()
+    return store
+
+def scrap_spotify_album_queries(queries=None, limit=4):
+    # Scrapes a few albums per query into one CSV, starting a fresh file with the first query
+    # One stream for the whole stage, so the queries do not repeat each other's ids
+    queries = queries if queries is not None else []
+    stage_randomer = get_random_machine().spawn('scrape_albums')
+    for index, query in enumerate(queries):
+        scrap_spotify_top_albums(query=query, limit=limit, write_mode='w' if index == 0 else 'a', random_machine=stage_randomer)
+
+def scrap_spotify_playlist_queries(queries=None):
+    # `queries` holds [query, limit, offset] triples, scraped into one CSV in order
+    queries = queries if queries is not None else []
+    stage_randomer = get_random_machine().spawn('scrape_playlists')
+    for index, (query, limit, offset) in enumerate(queries):
+        scrap_spotify_playlists(query=query, limit=limit, offset=offset, write_mode=None if index == 0 else 'a', random_machine=stage_randomer)
+
+def assemble_sql_dump(dump_file='sql/dump.sql'):
+    # Concatenates the existing per-table .sql files in foreign key order, without regenerating them
+    SQLDumpOrchestrator(tables=sql_dump_tables).write_dump(dump_file)
+
+# Code the stage outputs depend on besides their data inputs: a change to any of these files (including the
+# writer and sanitizer options set in main.py) makes the stages rebuild
+sanitizer_sources = ['main.py', 'utils/CSVDataRowsSanitizer.py', 'utils/RandomMachine.py']
+sql_writer_sources = ['main.py', 'schema.py', 'utils/SQLWriter.py', 'utils/SchemaRegistry.py', 'utils/CSVDataRowsSanitizer.py']
+
+# Table CSVs curated by hand from a scraped file (bios written, titles renamed, playlists reprocessed), to
+# the scraped file they started from. No stage writes them: they are source inputs of the sql_* stages,
+# so a new scrape does not rebuild that SQL until its changes are carried over into the curated file
+curated_csv_files = {
+    'data/spotify_artists_complete.csv': 'data/spotify_artists.csv',
+    'data/spotify_albums_rename.csv': 'data/spotify_albums.csv',
+    'data/spotify_playlists_reprocess.csv': 'data/spotify_playlists.csv',
+}
+
+def stale_curated_csv_files():
+    # Curated CSVs older than the scraped file they were made from
+    return [
+        curated for curated, scraped in curated_csv_files.items()
+        if os.path.exists(curated) and os.path.exists(scraped) and os.path.getmtime(scraped) > os.path.getmtime(curated)
+    ]
+
+def get_pipeline_stages():
+    # scrape -> sanitize/csv -> sql -> dump; dependencies follow from the files each stage reads and writes.
+    # The artist, album and playlist SQL is built from the hand-curated CSVs (see curated_csv_files), so
+    # those sql_* stages do not depend on the scrape stages
+    stages = [
+        Stage('scrape_artists', scrap_spotify_top_artist, outputs=['data/spotify_artists.csv'],
+              params={'limit': 20}, group='scrape', exclusive='spotify'),
+        Stage('scrape_albums', scrap_spotify_album_queries, outputs=['data/spotify_albums.csv'],
+              params={'queries': ['Glow', 'Sorry', 'Files', 'Separated', 'Drink', 'Memories', 'Kind'], 'limit': 4},
+              group='scrape', exclusive='spotify'),
+        Stage('scrape_songs', scrap_spotify_songs, outputs=['data/spotify_songs.csv'],
+              params={'query': 'genere:"pop,rock,jazz,r&b"', 'limit': 526}, group='scrape', exclusive='spotify'),
+        Stage('scrape_playlists', scrap_spotify_playlist_queries, outputs=['data/spotify_playlists.csv'],
+              params={'queries': [
+                  ['B', 6, 0], ['P', 4, 12], ['Q', 6, 12], ['V', 7, 12], ['D', 3, 12],
+                  ['C', 4, 12], ['F', 6, 12], ['K', 7, 12], ['S', 3, 12]
+              ]}, group='scrape', exclusive='spotify'),
+        Stage('extract_users', extract_data_set_users, inputs=['data/SocialMediaUsersDataset.csv', 'main.py', 'utils/RandomMachine.py'], outputs=['data/dataset_users.csv'],
+              params={'pool_size': 10000, 'limit': 50}, group='csv'),
+    ]
+    # The relation tables are randomized in place. A rerun (forced, or after the file changed) only does
+    # work on a raw file with its `dummy` column; on its own output the stage leaves the file untouched
+    # (see is_randomized_relation), so the runner can rerun it safely
+    for stage_name, action, table_name in relation_creators:
+        stages.append(Stage(stage_name, action, inputs=[table_csv_files[table_name]] + sanitizer_sources, outputs=[table_csv_files[table_name]], group='sanitize'))
+    stages.append(Stage('check_integrity', check_integrity_stage, inputs=list(table_csv_files.values()) + ['schema.py', 'utils/IntegrityChecker.py', 'utils/SchemaRegistry.py'], outputs=[integrity_stamp_file],
+                        params={'stamp_file': integrity_stamp_file}, group='check'))
+    for table_name, (writer, output) in sql_dump_writers.items():
+        stages.append(Stage(f"sql_{table_name}", writer, inputs=[table_csv_files[table_name], integrity_stamp_file] + sql_writer_sources, outputs=[output], group='sql'))
+    stages.append(Stage('sql_dump', assemble_sql_dump, inputs=[output for _, output in sql_dump_writers.values()] + ['utils/SQLDumpOrchestrator.py'], outputs=['sql/dump.sql'],
+                        params={'dump_file': 'sql/dump.sql'}, group='dump'))
+    return stages
+
+# Modules a plain `import main` must not load; SQL-only and sanitize-only runs pay for them when they need them
+import_time_forbidden_modules = ['pandas', 'numpy', 'spotipy', 'requests', 'pymysql']
+
+def measure_import_time(module='main', max_ms=None, forbidden=None, top=10):
+    # Imports `module` in a fresh interpreter under -X importtime and returns a list of problems:
+    # forbidden modules that got imported and a cumulative import time above max_ms
+    forbidden = forbidden if forbidden is not None else import_time_forbidden_modules
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=repo_path, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return [f"Importing '{module}' failed:\n{result.stderr[-2000:]}"]
+    # Lines look like "import time: <self us> | <cumulative us> | <indented module name>"
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace('import time:', '|', 1).split('|')]
+        timings.append((name, int(self_us), int(cumulative_us)))
+    total_ms = sum(self_us for _, self_us, _ in timings) / 1000
+    top_level_ms = next((cumulative_us for name, _, cumulative_us in reversed(timings) if name == module), 0) / 1000
+    print(f"Importing '{module}' took {top_level_ms:.1f}ms ({total_ms:.1f}ms including the interpreter's own imports, {len(timings)} modules).")
+    for name, _, cumulative_us in sorted(timings, key=lambda timing: timing[2], reverse=True)[:top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+
+    problems = []
+    imported = {name.split('.')[0] for name, _, _ in timings}
+    loaded = [name for name in forbidden if name in imported]
+    if loaded:
+        problems.append(f"Importing '{module}' loads {loaded}; import them where they are used.")
+    if max_ms is not None and top_level_ms > max_ms:
+        problems.append(f"Importing '{module}' took {top_level_ms:.1f}ms, over the {max_ms}ms limit.")
+    for problem in problems:
+        print(problem)
+    return problems
+
+def run_cli(args=None):
+    parser = argparse.ArgumentParser(description="Spotify dataset pipeline.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help="Bring stages up to date, skipping the ones whose inputs and parameters are unchanged.")
+    run_parser.add_argument('targets', nargs='*', default=['sql'], help="Stage or group names (scrape, csv, sanitize, sql, dump); default: sql.")
+    run_parser.add_argument('--force', nargs='+', default=[], help="Stages or groups to run even if up to date.")
+    run_parser.add_argument('--dry-run', action='store_true', help="Only show what would run.")
+    run_parser.add_argument('--workers', type=int, default=4, help="Stages to run at the same time.")
+    run_parser.add_argument('--state-file', default='.pipeline_state.json')
+    run_parser.add_argument('--metrics-file', default='.pipeline_metrics.jsonl', help="Append per-stage metrics as JSON lines (Prometheus text if it ends in .prom).")
+
+    commands.add_parser('list', help="List the stages with their dependencies.")
+    check_parser = commands.add_parser('check', help="Check foreign keys and unique keys of the CSV files, and that `import main` loads no heavy modules.")
+    check_parser.add_argument('--max-import-ms', type=float, default=None, help="Also fail if `import main` takes longer than this.")
+    generate_parser = commands.add_parser('generate', help="Generate a synthetic database at a scale factor (see utils/ScaleFactorGenerator.py).")
+    generate_parser.add_argument('options', nargs=argparse.REMAINDER)
+    benchmark_parser = commands.add_parser('benchmark', help="Run the offline benchmarks and compare them with benchmarks/baseline.json (see benchmarks/BenchmarkSuite.py).")
+    benchmark_parser.add_argument('options', nargs=argparse.REMAINDER)
+    memory_parser = commands.add_parser('memory', help="Randomize the relation tables and write all SQL in one process, keeping the datasets in memory.")
+    memory_parser.add_argument('--no-sanitize', action='store_true', help="Skip the relation randomizers.")
+    memory_parser.add_argument('--checkpoint', nargs='+', default=[], choices=['sanitize'], help="Also persist the CSVs after these steps.")
+    memory_parser.add_argument('--deferred-indexes', action='store_true')
+    memory_parser.add_argument('--workers', type=int, default=None, help="Processes for the relation randomizers (default: CPU count).")
+    memory_parser.add_argument('--metrics-file', default='.pipeline_metrics.jsonl', help="Append per-stage metrics as JSON lines (Prometheus text if it ends in .prom).")
+    sanitize_parser = commands.add_parser('sanitize', help="Run the relation randomizers in a process pool, rewriting their CSV files.")
+    sanitize_parser.add_argument('--workers', type=int, default=None, help="Processes to use (default: CPU count).")
+    importtime_parser = commands.add_parser('importtime', help="Measure `import main` with -X importtime; fails if it loads heavy modules or exceeds --max-ms.")
+    importtime_parser.add_argument('--module', default='main')
+    importtime_parser.add_argument('--max-ms', type=float, default=None, help="Fail above this cumulative import time.")
+    importtime_parser.add_argument('--top', type=int, default=10, help="Slowest imports to show.")
+
+    args = sys.argv[1:] if args is None else list(args)
+    if args[:1] == ['generate']:
+        # REMAINDER does not capture options starting with '-', so the generator parses its own arguments
+        from utils.ScaleFactorGenerator import main as scale_factor_generator_cli
+        scale_factor_generator_cli(args[1:])
+        return 0
+    if args[:1] == ['benchmark']:
+        from benchmarks.BenchmarkSuite import main as benchmark_cli
+        return benchmark_cli(args[1:])
+    options = parser.parse_args(args)
+    if options.command == 'importtime':
+        return 1 if measure_import_time(module=options.module, max_ms=options.max_ms, top=options.top) else 0
+    if options.command == 'check':
+        violations = check_integrity()
+        import_problems = measure_import_time(max_ms=options.max_import_ms)
+        return 1 if violations or import_problems else 0
+    monitor = PerformanceMonitor()
+    if options.command == 'memory':
+        try:
+            build_in_memory(sanitize=not options.no_sanitize, checkpoints=options.checkpoint, deferred_indexes=options.deferred_indexes, max_workers=options.workers, monitor=monitor)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        finally:
+            monitor.summary()
+            monitor.export(options.metrics_file)
+        return 0
+    if options.command == 'sanitize':
+        try:
+            run_sanitizer_pipelines(max_workers=options.workers)
+        except RuntimeError as e:
+            print(e)
+            return 1
+        return 0
+
+    runner = PipelineRunner(get_pipeline_stages(), state_file=getattr(options, 'state_file', '.pipeline_state.json'), max_workers=getattr(options, 'workers', 4), monitor=monitor)
+    if options.command == 'list':
+        for name in runner.order():
+            stage = runner.stages[name]
+            dependencies = runner.dependencies(name)
+            print(f"{name:<30} [{stage.group}] {'<- ' + ', '.join(dependencies) if dependencies else ''}")
+        return 0
+    for curated in stale_curated_csv_files():
+        print(f"Note: '{curated}' is older than '{curated_csv_files[curated]}'; carry the new scrape over by hand to rebuild its SQL.")
+    results = runner.run(options.targets, force=options.force, dry_run=options.dry_run)
+    if monitor.records:
+        monitor.summary()
+        monitor.export(options.metrics_file)
+    return 1 if 'failed' in results.values() else 0
+
+if __name__ == "__main__":
+    # python main.py run [targets] | list | check | sanitize | memory | generate --scale-factor N | benchmark [--scales 1e3 1e5] | importtime [--max-ms N]
+    # Other entry points: write_sql_dump(dump_file='sql/dump.sql', manifest_file='sql/dump.manifest.json'),
+    # load_database(backend='sqlite', database='spotify.db') or load_database(host='localhost', user='root', password='', database='spotify')
+    exit(run_cli())
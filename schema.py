@@ -0,0 +1,132 @@
+from utils.SchemaRegistry import SchemaRegistry, TableSchema, Column, ForeignKey, UniqueKey
+
+def _id():
+    return Column('id', 'INT', primary_key=True, auto_increment=True, nullable=False)
+
+def _timestamps():
+    return [
+        Column('created_at', 'DATETIME', default='NOW()'),
+        Column('updated_at', 'DATETIME', default='NOW()', on_update='CURRENT_TIMESTAMP')
+    ]
+
+# Tables are registered in foreign key order
+schema_registry = SchemaRegistry([
+    TableSchema('artist', [
+        _id(),
+        Column('name', 'VARCHAR', 32, nullable=False),
+        Column('bio', 'VARCHAR', 500),
+        Column('email', 'VARCHAR', 255, nullable=False),
+        Column('profile_pic', 'VARCHAR', 255),
+        *_timestamps()
+    ]),
+    TableSchema('user', [
+        _id(),
+        Column('name', 'VARCHAR', 32, nullable=False),
+        Column('email', 'VARCHAR', 255, nullable=False),
+        Column('profile_pic', 'VARCHAR', 255),
+        *_timestamps()
+    ]),
+    TableSchema('album', [
+        _id(),
+        Column('artist_id', 'INT', nullable=False),
+        Column('title', 'VARCHAR', 100, nullable=False),
+        Column('cover_pic', 'VARCHAR', 255),
+        *_timestamps()
+    ], foreign_keys=[
+        ForeignKey('artist_id', 'artist')
+    ]),
+    TableSchema('song', [
+        _id(),
+        Column('album_id', 'INT', nullable=False),
+        Column('name', 'VARCHAR', 100, nullable=False),
+        Column('track_number', 'INT', nullable=False),
+        Column('monthly_plays', 'INT', default='0'),
+        *_timestamps()
+    ], foreign_keys=[
+        ForeignKey('album_id', 'album')
+    ], unique_keys=[
+        UniqueKey('unq_song_name_in_album', ['album_id', 'name']),
+        UniqueKey('unq_song_order_in_album', ['album_id', 'track_number'])
+    ]),
+    TableSchema('playlist', [
+        _id(),
+        Column('user_id', 'INT', nullable=False),
+        Column('name', 'VARCHAR', 100, nullable=False),
+        Column('info', 'VARCHAR', 500),
+        Column('cover_pic', 'VARCHAR', 255),
+        *_timestamps()
+    ], foreign_keys=[
+        ForeignKey('user_id', 'user')
+    ]),
+    TableSchema('playlist_entry', [
+        _id(),
+        Column('playlist_id', 'INT', nullable=False),
+        Column('song_id', 'INT', nullable=False),
+        Column('order_number', 'INT', nullable=False)
+    ], foreign_keys=[
+        ForeignKey('playlist_id', 'playlist'),
+        ForeignKey('song_id', 'song')
+    ], unique_keys=[
+        UniqueKey('unq_song_order_in_playlist', ['playlist_id', 'song_id', 'order_number'])
+    ]),
+    TableSchema('user_follower', [
+        _id(),
+        Column('user_id', 'INT', nullable=False),
+        Column('follower_id', 'INT', nullable=False)
+    ], foreign_keys=[
+        ForeignKey('user_id', 'user'),
+        ForeignKey('follower_id', 'user')
+    ], unique_keys=[
+        UniqueKey('unq_user_follower_pair', ['user_id', 'follower_id'])
+    ]),
+    TableSchema('artist_follower', [
+        _id(),
+        Column('artist_id', 'INT', nullable=False),
+        Column('follower_id', 'INT', nullable=False)
+    ], foreign_keys=[
+        ForeignKey('artist_id', 'artist'),
+        ForeignKey('follower_id', 'user')
+    ], unique_keys=[
+        UniqueKey('unq_artist_follower_pair', ['artist_id', 'follower_id'])
+    ]),
+    TableSchema('user_added_playlist', [
+        _id(),
+        Column('playlist_id', 'INT', nullable=False),
+        Column('user_id', 'INT', nullable=False)
+    ], foreign_keys=[
+        ForeignKey('playlist_id', 'playlist'),
+        ForeignKey('user_id', 'user')
+    ], unique_keys=[
+        UniqueKey('unq_playlist_user_pair', ['playlist_id', 'user_id'])
+    ]),
+    TableSchema('user_added_album', [
+        _id(),
+        Column('album_id', 'INT', nullable=False),
+        Column('user_id', 'INT', nullable=False)
+    ], foreign_keys=[
+        ForeignKey('album_id', 'album'),
+        ForeignKey('user_id', 'user')
+    ], unique_keys=[
+        UniqueKey('unq_album_user_pair', ['album_id', 'user_id'])
+    ]),
+    TableSchema('user_liked_song', [
+        _id(),
+        Column('song_id', 'INT', nullable=False),
+        Column('user_id', 'INT', nullable=False)
+    ], foreign_keys=[
+        ForeignKey('song_id', 'song'),
+        ForeignKey('user_id', 'user')
+    ], unique_keys=[
+        UniqueKey('unq_song_user_pair', ['song_id', 'user_id'])
+    ]),
+])
+
+# Source datasets the generators sample from, rather than tables of the database: only the columns they
+# use are declared, and only those are read
+source_schemas = {
+    # Kaggle's Social Media Users dataset (data/SocialMediaUsersDataset.csv)
+    'social_media_users': TableSchema('social_media_users', [
+        Column('Name', 'VARCHAR', nullable=False),
+        Column('Gender', 'VARCHAR', nullable=False)
+    ])
+}
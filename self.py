@@ -3,6 +3,10 @@ from spotipy.oauth2 import SpotifyOAuth
 from dotenv import load_dotenv
 import os
 from flask import Flask, request, redirect, jsonify
+from utils.TTLCache import TTLCache
+from utils.CatalogStore import CatalogStore
+from schema import schema_registry
+from main import table_csv_files
 
 # Environment variables setup
 environment = os.environ.get("ENVIRONMENT")
@@ -21,6 +25,22 @@ sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
     scope="user-read-private user-read-email user-follow-read"  # Scopes for user profile data
 ))
 
+# Spotify responses are cached in process: each key costs at most one upstream call per TTL, concurrent
+# identical requests share that call, and clients polling with If-None-Match get an empty 304.
+# Entries hold the same bytes jsonify() would send.
+response_cache = TTLCache(serializer=lambda value: app.json.response(value).get_data())
+user_cache_ttl = float(os.getenv("USER_CACHE_TTL", 30))
+genre_cache_ttl = float(os.getenv("GENRE_CACHE_TTL", 3600))
+
+def cached_json_response(key, loader, ttl=None):
+    entry = response_cache.get(key, loader, ttl=ttl)
+    response = app.response_class(entry["body"], mimetype=app.json.mimetype)
+    response.set_etag(entry["etag"])
+    # The data belongs to the signed-in account, so only the client may keep it, until the entry expires
+    response.cache_control.private = True
+    response.cache_control.max_age = int(response_cache.remaining(entry))
+    return response.make_conditional(request)
+
 # Main function to get user data
 def get_user():
     cur_user = sp.me()
@@ -32,22 +52,70 @@ def get_user():
 def callback():
     code = request.args.get("code")
     sp.auth_manager.get_access_token(code)
+    # Another account may have signed in
+    response_cache.invalidate()
     return "Authentication successful! You can close this window."
 
 @app.route("/user/follower")
 def list_follower():
-    cur_user = get_user()
-    followers_count = cur_user["followers"]["total"]
-    return jsonify({
-        "user_followers": cur_user["followers"]
-    })
+    def load():
+        cur_user = get_user()
+        return {
+            "user_followers": cur_user["followers"]
+        }
+    return cached_json_response("user/follower", load, ttl=user_cache_ttl)
 
 @app.route("/recomm/genre")
 def recomm_genres():
-    results = sp.recommendation_genre_seeds()
-    return jsonify({
-        "genres": results
-    })
+    def load():
+        return {
+            "genres": sp.recommendation_genre_seeds()
+        }
+    return cached_json_response("recomm/genre", load, ttl=genre_cache_ttl)
+
+# The generated dataset (data/) is served read-only from memory, built once at startup; set CATALOG=0 to skip it
+catalog = None
+if os.getenv("CATALOG", "1").lower() not in ("0", "false", "no", "off"):
+    try:
+        catalog = CatalogStore(registry=schema_registry, sources=table_csv_files)
+    except (OSError, ValueError) as e:
+        print(f"The catalog endpoints are disabled, the dataset could not be loaded: {str(e)}")
+
+def catalog_page(table, column, value, parent_table):
+    # One page of `table` rows whose `column` is `value`; ?cursor=<next_cursor>&limit=<n> pages through them
+    if catalog is None:
+        return jsonify({"error": "The catalog is not loaded."}), 503
+    if not catalog.exists(parent_table, value):
+        return jsonify({"error": f"No {parent_table} with id {value}."}), 404
+    try:
+        cursor = request.args.get("cursor")
+        limit = request.args.get("limit")
+        page = catalog.lookup(
+            table,
+            column,
+            value,
+            cursor=int(cursor) if cursor is not None else None,
+            limit=int(limit) if limit is not None else None
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid cursor or limit: {str(e)}"}), 400
+    return jsonify(page)
+
+@app.route("/catalog/albums/<int:album_id>/songs")
+def album_songs(album_id):
+    return catalog_page("song", "album_id", album_id, "album")
+
+@app.route("/catalog/playlists/<int:playlist_id>/entries")
+def playlist_entries(playlist_id):
+    return catalog_page("playlist_entry", "playlist_id", playlist_id, "playlist")
+
+@app.route("/catalog/users/<int:user_id>/liked-songs")
+def user_liked_songs(user_id):
+    return catalog_page("user_liked_song", "user_id", user_id, "user")
+
+@app.route("/catalog/users/<int:user_id>/followers")
+def user_followers(user_id):
+    return catalog_page("user_follower", "user_id", user_id, "user")
 
 if __name__ == "__main__":
     # get_user()
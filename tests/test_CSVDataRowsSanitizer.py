@@ -0,0 +1,36 @@
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from utils.CSVDataRowsSanitizer import CSVDataRowsSanitizer
+from utils.SchemaRegistry import TableSchema, Column
+
+
+def test_byte_limits_cut_multibyte_values_without_splitting_a_character():
+    # 3 bytes per CJK character and 4 per emoji in UTF-8
+    df = pd.DataFrame({"name": ["歌曲名稱", "🎵🎵🎵", "abc", None]}, dtype="string")
+    trimmed = CSVDataRowsSanitizer.trim_frame_to_limits(df, {"name": 100}, byte_limits={"name": 7})
+
+    assert trimmed == ["name"]
+    assert df["name"].tolist()[:3] == ["歌曲", "🎵", "abc"]
+    assert pd.isna(df["name"].iloc[3])
+    assert all(len(value.encode("utf-8")) <= 7 for value in df["name"].dropna())
+
+
+def test_character_limit_counts_characters_not_bytes():
+    df = pd.DataFrame({"name": ["歌曲名稱", "🎵🎵🎵"]}, dtype="string")
+    CSVDataRowsSanitizer.trim_frame_to_limits(df, {"name": 2})
+    assert df["name"].tolist() == ["歌曲", "🎵🎵"]
+
+
+def test_utf8mb3_tables_replace_four_byte_characters():
+    utf8mb3 = TableSchema("song", [Column("name", "VARCHAR", 4)], charset="utf8mb3", collate="utf8mb3_general_ci")
+    utf8mb4 = TableSchema("song", [Column("name", "VARCHAR", 4)])
+    assert utf8mb3.max_char_bytes() == 3
+    assert utf8mb4.max_char_bytes() is None
+
+    df = pd.DataFrame({"name": ["a🎵歌b🎵", "歌曲"]}, dtype="string")
+    trimmed = CSVDataRowsSanitizer.trim_frame_to_limits(df, utf8mb3.varchar_limits(), max_char_bytes=utf8mb3.max_char_bytes())
+
+    assert trimmed == ["name"]
+    assert df["name"].tolist() == ["a\ufffd歌b", "歌曲"]
@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from schema import schema_registry
+from utils.IntegrityChecker import IntegrityChecker
+
+
+def _checker(tmp_path, users, followers):
+    user_csv, follower_csv = tmp_path / "user.csv", tmp_path / "user_follower.csv"
+    user_csv.write_text("name,email,profile_pic\n" + "".join(f"{row}\n" for row in users))
+    follower_csv.write_text("user_id,follower_id\n" + "".join(f"{user_id},{follower_id}\n" for user_id, follower_id in followers))
+    return IntegrityChecker(schema_registry, {'user': str(user_csv), 'user_follower': str(follower_csv)})
+
+
+USERS = ["Ann,ann@example.com,", "Bob,bob@example.com,", "Cid,cid@example.com,"]
+
+
+def test_consistent_tables_pass(tmp_path):
+    assert _checker(tmp_path, USERS, [(1, 2), (2, 3), (3, 1)]).check() == []
+
+
+def test_a_dangling_foreign_key_is_reported(tmp_path):
+    violations = _checker(tmp_path, USERS, [(1, 2), (3, 4)]).check()
+
+    assert len(violations) == 1
+    assert violations[0]['table'] == 'user_follower'
+    assert violations[0]['constraint'] == 'FOREIGN KEY(follower_id)'
+    assert violations[0]['rows'] == 1
+    assert violations[0]['sample'] == [4]
+
+
+def test_an_all_null_parent_row_shifts_the_auto_increment_ids(tmp_path):
+    # The writer skips the empty row, so Bob is loaded as id 2 and there is no user 3
+    violations = _checker(tmp_path, [USERS[0], ",,", USERS[1]], [(1, 2), (2, 3)]).check()
+
+    assert [(violation['constraint'], violation['sample']) for violation in violations] == [('FOREIGN KEY(follower_id)', [3])]
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from utils.ParsedCSVCache import ParsedCSVCache
+
+FORMATS = ['numpy'] + (['feather'] if ParsedCSVCache().format == 'feather' else [])
+
+
+def _cache_files(source):
+    with open(f"{source}.parsed.json", encoding="utf-8") as f:
+        return [os.path.join(os.path.dirname(source), entry["file"]) for entry in json.load(f)["entries"].values()]
+
+
+@pytest.fixture(params=FORMATS)
+def cache(request):
+    return ParsedCSVCache(format=request.param)
+
+
+def test_an_unchanged_csv_is_read_from_the_cache(tmp_path, cache):
+    source = tmp_path / "songs.csv"
+    source.write_text("name,plays\nIntro,3\nOutro,\n")
+
+    first = cache.read_csv(str(source))
+    second = cache.read_csv(str(source))
+    assert (cache.misses, cache.hits) == (1, 1)
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_a_csv_rewritten_with_another_size_is_parsed_again(tmp_path, cache):
+    source = tmp_path / "songs.csv"
+    source.write_text("name,plays\nIntro,3\n")
+    cache.read_csv(str(source))
+
+    source.write_text("name,plays\nIntro,3\nOutro,5\n")
+    df = cache.read_csv(str(source))
+    assert df["name"].tolist() == ["Intro", "Outro"]
+    assert (cache.misses, cache.hits) == (2, 0)
+
+
+def test_a_csv_rewritten_with_the_same_size_and_a_new_mtime_is_parsed_again(tmp_path, cache):
+    source = tmp_path / "songs.csv"
+    source.write_text("name,plays\nIntro,3\n")
+    cache.read_csv(str(source))
+    mtime_ns = os.stat(source).st_mtime_ns
+
+    source.write_text("name,plays\nOutro,7\n")
+    os.utime(source, ns=(mtime_ns + 1_000_000_000, mtime_ns + 1_000_000_000))
+    df = cache.read_csv(str(source))
+    assert df.to_dict("records") == [{"name": "Outro", "plays": 7}]
+    assert (cache.misses, cache.hits) == (2, 0)
+
+    # Rewriting the same content under yet another mtime keeps the entry, as its hash still matches
+    os.utime(source, ns=(mtime_ns + 2_000_000_000, mtime_ns + 2_000_000_000))
+    assert cache.read_csv(str(source)).to_dict("records") == [{"name": "Outro", "plays": 7}]
+    assert cache.hits == 1
+
+
+def test_a_corrupt_cache_file_falls_back_to_the_csv(tmp_path, cache, capsys):
+    source = tmp_path / "songs.csv"
+    source.write_text("name,plays\nIntro,3\nOutro,\n")
+    expected = cache.read_csv(str(source))
+    for cache_file in _cache_files(source):
+        with open(cache_file, 'wb') as f:
+            f.write(b"not a cache file")
+
+    pd.testing.assert_frame_equal(cache.read_csv(str(source)), expected)
+    assert "Ignoring unreadable CSV cache entry" in capsys.readouterr().out
+    assert (cache.misses, cache.hits) == (2, 0)
+
+    # The fallback parse replaced the corrupt entry
+    pd.testing.assert_frame_equal(cache.read_csv(str(source)), expected)
+    assert cache.hits == 1
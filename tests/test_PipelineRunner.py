@@ -0,0 +1,30 @@
+from utils.PipelineRunner import PipelineRunner, Stage
+
+
+def test_a_failing_stage_is_not_recorded_as_up_to_date(tmp_path):
+    source, output = tmp_path / "in.csv", tmp_path / "out.csv"
+    source.write_text("a\n")
+
+    def fail():
+        # e.g. a stage that wrote its output and then hit an error
+        output.write_text("partial\n")
+        raise FileNotFoundError("source missing")
+
+    runner = PipelineRunner([Stage('extract', fail, inputs=[str(source)], outputs=[str(output)])], state_file=str(tmp_path / "state.json"))
+    assert runner.run(['extract']) == {'extract': 'failed'}
+
+    runner = PipelineRunner([Stage('extract', fail, inputs=[str(source)], outputs=[str(output)])], state_file=str(tmp_path / "state.json"))
+    assert runner.plan(['extract']) == [('extract', True, "never run")]
+
+
+def test_a_stage_runs_again_once_its_input_changes(tmp_path):
+    source, output = tmp_path / "in.csv", tmp_path / "out.csv"
+    source.write_text("a\n")
+    stages = [Stage('copy', lambda: output.write_text(source.read_text()), inputs=[str(source)], outputs=[str(output)])]
+    state_file = str(tmp_path / "state.json")
+
+    assert PipelineRunner(stages, state_file=state_file).run(['copy']) == {'copy': 'ran'}
+    assert PipelineRunner(stages, state_file=state_file).run(['copy']) == {'copy': 'skipped'}
+    source.write_text("b\n")
+    assert PipelineRunner(stages, state_file=state_file).run(['copy']) == {'copy': 'ran'}
+    assert output.read_text() == "b\n"
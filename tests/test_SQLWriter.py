@@ -0,0 +1,143 @@
+import json
+import re
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pymysql")
+
+from schema import schema_registry
+from utils.SQLWriter import SQLWriter
+
+
+def _write_follower_csv(path, pairs):
+    path.write_text("user_id,follower_id\n" + "".join(f"{user_id},{follower_id}\n" for user_id, follower_id in pairs))
+
+
+def _transactions(sql):
+    """Return the statements of every START TRANSACTION ... COMMIT block of sql, in order."""
+    blocks = re.findall(r'START TRANSACTION;\n(.*?)COMMIT;\n', sql, flags=re.DOTALL)
+    return [[line for line in block.splitlines() if line] for block in blocks]
+
+
+def test_sharded_output_commits_every_n_rows_and_lists_the_shards(tmp_path):
+    source = tmp_path / "follower.csv"
+    _write_follower_csv(source, [(n, n + 1) for n in range(1, 26)])
+
+    # chunksize deliberately does not line up with commit_every or shard_rows
+    SQLWriter(
+        schema=schema_registry['user_follower'],
+        input_csv_file=str(source),
+        output_sql_file=str(tmp_path / "follower.sql"),
+        commit_every=4,
+        shard_rows=10,
+        chunksize=7
+    ).write_sql()
+
+    manifest = json.loads((tmp_path / "follower.manifest.json").read_text())
+    assert manifest['table'] == 'user_follower'
+    assert manifest['rows'] == 25
+    assert manifest['commit_every'] == 4
+    assert manifest['shards'] == [
+        {'file': 'follower.0001.sql', 'rows': 10},
+        {'file': 'follower.0002.sql', 'rows': 10},
+        {'file': 'follower.0003.sql', 'rows': 5}
+    ]
+    assert 'CREATE TABLE IF NOT EXISTS user_follower' in (tmp_path / manifest['schema']).read_text()
+
+    expected_transaction_sizes = [[4, 4, 2], [4, 4, 2], [4, 1]]
+    inserted = []
+    for shard, sizes in zip(manifest['shards'], expected_transaction_sizes):
+        sql = (tmp_path / shard['file']).read_text()
+        assert 'CREATE TABLE' not in sql
+        assert sql.count('START TRANSACTION;') == sql.count('COMMIT;') == len(sizes)
+        transactions = _transactions(sql)
+        assert [len(statements) for statements in transactions] == sizes
+        assert all(statement.startswith('INSERT INTO user_follower ') for statements in transactions for statement in statements)
+        inserted += [statement for statements in transactions for statement in statements]
+
+    # Every row is written once, in CSV order, across the shards
+    assert inserted == [f"INSERT INTO user_follower (user_id, follower_id) VALUES ({n}, {n + 1});" for n in range(1, 26)]
+
+
+def _write_follower_delta(tmp_path, pairs):
+    """Write pairs to the CSV and run a delta write over it; return the delta's INSERT statements, or None without one."""
+    source, delta_file = tmp_path / "follower.csv", tmp_path / "follower.delta.sql"
+    _write_follower_csv(source, pairs)
+    if delta_file.exists():
+        delta_file.unlink()
+    SQLWriter(
+        schema=schema_registry['user_follower'],
+        input_csv_file=str(source),
+        output_sql_file=str(tmp_path / "follower.sql"),
+        hash_manifest=str(tmp_path / "follower.npz"),
+        delta=True
+    ).write_sql()
+    if not delta_file.exists():
+        return None
+    return [line for line in delta_file.read_text().splitlines() if line.startswith('INSERT INTO')]
+
+
+UPSERT = " ON DUPLICATE KEY UPDATE user_id = VALUES(user_id), follower_id = VALUES(follower_id);"
+
+
+def test_delta_updates_a_changed_row_under_its_id(tmp_path):
+    assert _write_follower_delta(tmp_path, [(1, 2), (2, 3), (3, 4)]) is None
+    assert (tmp_path / "follower.sql").exists()
+
+    assert _write_follower_delta(tmp_path, [(1, 2), (2, 30), (3, 4)]) == [
+        "INSERT INTO user_follower (id, user_id, follower_id) VALUES (2, 2, 30)" + UPSERT
+    ]
+    # The manifest now records the edited row, so the same input has nothing left to write
+    assert _write_follower_delta(tmp_path, [(1, 2), (2, 30), (3, 4)]) == []
+
+
+def test_delta_inserts_an_appended_row_under_the_next_id(tmp_path):
+    _write_follower_delta(tmp_path, [(1, 2), (2, 3), (3, 4)])
+
+    assert _write_follower_delta(tmp_path, [(1, 2), (2, 3), (3, 4), (4, 5)]) == [
+        "INSERT INTO user_follower (id, user_id, follower_id) VALUES (4, 4, 5)" + UPSERT
+    ]
+
+
+@pytest.mark.parametrize("pairs", [
+    [(1, 2), (3, 4)],           # a middle row removed, shifting the later ids
+    [(1, 2), (2, 3)],           # the last row removed
+    [(2, 3), (1, 2), (3, 4)]    # rows reordered
+], ids=["removed", "removed-last", "reordered"])
+def test_delta_refuses_positional_changes_and_asks_for_a_full_dump(tmp_path, capsys, pairs):
+    _write_follower_delta(tmp_path, [(1, 2), (2, 3), (3, 4)])
+    manifest = (tmp_path / "follower.npz").read_bytes()
+
+    with pytest.raises(SystemExit):
+        _write_follower_delta(tmp_path, pairs)
+    assert "Write the full table or set key_column" in capsys.readouterr().out
+    assert not (tmp_path / "follower.delta.sql").exists()
+    assert (tmp_path / "follower.npz").read_bytes() == manifest
+
+
+def test_extended_insert_statements_stay_within_max_batch_bytes(tmp_path):
+    source, output = tmp_path / "artist.csv", tmp_path / "artist.sql"
+    # Multi-byte names, so a budget counted in characters would overshoot; the fifth row alone is larger than the budget
+    rows = [(f"歌手{n}", f"bio {n}", f"artist{n}@example.com") for n in range(1, 13)]
+    rows[4] = ("Oversized", "x" * 400, "oversized@example.com")
+    source.write_text("name,bio,email\n" + "".join(f"{name},{bio},{email}\n" for name, bio, email in rows), encoding="utf-8")
+
+    max_batch_bytes = 200
+    SQLWriter(
+        schema=schema_registry['artist'],
+        input_csv_file=str(source),
+        output_sql_file=str(output),
+        extended_insert=True,
+        max_batch_bytes=max_batch_bytes
+    ).write_sql()
+
+    statements = [line for line in output.read_text(encoding="utf-8").splitlines() if line.startswith('INSERT INTO')]
+    oversized = [statement for statement in statements if 'Oversized' in statement]
+    assert len(oversized) == 1
+    assert oversized[0].count('),(') == 0
+    assert all(len(statement.encode('utf-8')) + 1 <= max_batch_bytes for statement in statements if statement not in oversized)
+    # Rows are still batched, and every row is written once and in order
+    assert len(statements) < len(rows)
+    written = re.findall(r"\('([^']*)', '", ''.join(statements))
+    assert written == [name for name, _, _ in rows]
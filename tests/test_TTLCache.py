@@ -0,0 +1,51 @@
+import threading
+from utils.TTLCache import TTLCache
+
+
+def test_get_after_invalidate_does_not_join_an_earlier_load():
+    cache = TTLCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    results = {}
+
+    def slow_load():
+        started.set()
+        release.wait(5)
+        return "account-A"
+
+    earlier = threading.Thread(target=lambda: results.setdefault("earlier", cache.get("k", slow_load)["value"]))
+    earlier.start()
+    assert started.wait(5)
+    # e.g. /callback after another account signed in
+    cache.invalidate()
+    later = cache.get("k", lambda: "account-B")
+    release.set()
+    earlier.join(5)
+
+    assert later["value"] == "account-B"
+    assert results["earlier"] == "account-A"
+    assert cache.get("k", lambda: "account-C")["value"] == "account-B"
+    assert cache.stats()["coalesced"] == 0
+
+
+def test_concurrent_gets_share_one_load():
+    cache = TTLCache(ttl=60)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "value"
+
+    threads = [threading.Thread(target=cache.get, args=("k", slow_load)) for _ in range(4)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()["coalesced"] < 3:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
@@ -0,0 +1,12 @@
+from main import import_time_forbidden_modules, measure_import_time
+
+
+def test_importing_main_loads_no_heavy_modules():
+    assert measure_import_time('main', forbidden=import_time_forbidden_modules) == []
+
+
+def test_a_module_importing_a_forbidden_one_is_reported():
+    # SQLWriter needs pandas at import time, so the check has something to find
+    problems = measure_import_time('utils.SQLWriter', forbidden=['pandas'])
+    assert len(problems) == 1
+    assert "loads ['pandas']" in problems[0]
@@ -1,22 +1,39 @@
 import pandas as pd
 import numpy as np
+from utils.PerformanceMonitor import PerformanceMonitor
+from utils.ParsedCSVCache import ParsedCSVCache
 
 class CSVDataRowsSanitizer:
-    def __init__(self, file_path):
+    def __init__(self, file_path, rng=None, store=None, schema=None):
         """
         Initialize with the path to the CSV file.
         
         Args:
             file_path (str): Path to the CSV file.
+            rng (numpy.random.Generator, optional): Generator used for random columns.
+                Pass a seeded Generator (e.g. RandomMachine.spawn(stage).rng) for reproducible runs.
+            store (DatasetStore, optional): Read the data from and save it back to this in-memory store
+                instead of the CSV file; the store persists it at its next checkpoint.
+            schema (TableSchema, optional): Schema of the table the CSV holds; its INT columns are
+                loaded in the smallest fitting integer dtype (see TableSchema.compact_integers).
         """
         self.file_path = file_path
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.store = store if store is not None and file_path in store else None
+        self.schema = schema
         self.df = None
         self.count_report = None
 
     def load_csv(self):
         """Load the CSV file into a Pandas DataFrame."""
         try:
-            self.df = pd.read_csv(self.file_path)
+            if self.store is not None:
+                self.df = self.store.get(self.file_path)
+                return
+            self.df = ParsedCSVCache.shared().read_csv(self.file_path)
+            if self.schema is not None:
+                self.df = self.schema.cast_frame(self.df, compact=True)
+            PerformanceMonitor.count(rows_in=len(self.df), bytes_read=PerformanceMonitor.file_bytes(self.file_path))
         except FileNotFoundError:
             raise FileNotFoundError(f"CSV file not found at: {self.file_path}")
         except Exception as e:
@@ -110,13 +127,97 @@ class CSVDataRowsSanitizer:
         print(f"Removed {num_rows_removed} rows where '{column1}' equals '{column2}'.")
         return True
     
-    def trim_column_values(self, column_to_trim, max_length):
+    @staticmethod
+    def trim_frame_to_limits(df, column_limits, byte_limits=None, max_char_bytes=None):
+        """
+        Trim string columns of a DataFrame to their VARCHAR limits in vectorized passes.
+        
+        Null values are left untouched. Character limits follow MySQL VARCHAR(n) semantics
+        (n characters); optional byte limits cut the UTF-8 (utf8mb4) encoding without splitting a character.
+        
+        Args:
+            df (pd.DataFrame): DataFrame to trim in place.
+            column_limits (dict): Column name to maximum character length, e.g. {'name': 100, 'info': 500}.
+            byte_limits (dict, optional): Column name to maximum encoded byte length, e.g. for an index
+                prefix; a VARCHAR(n) length alone never needs one.
+            max_char_bytes (int, optional): Widest character the table's charset stores (3 for utf8mb3,
+                see TableSchema.max_char_bytes); wider characters are replaced with U+FFFD.
+        
+        Returns:
+            list: Names of the columns in which at least one value was trimmed.
+        """
+        byte_limits = byte_limits if byte_limits is not None else {}
+        trimmed_columns = []
+        for column, max_length in column_limits.items():
+            if column not in df.columns:
+                continue
+            
+            values = df[column]
+            text = values[values.notna()].astype(str)
+            if max_char_bytes is not None and max_char_bytes < 4:
+                # utf8mb3 rejects the whole value when it holds a 4-byte character
+                text_to_trim = text.str.replace('[\U00010000-\U0010FFFF]', '\ufffd', regex=True)
+            else:
+                text_to_trim = text
+            trimmed = text_to_trim.str.slice(0, max_length)
+            
+            max_bytes = byte_limits.get(column)
+            if max_bytes is not None:
+                over_bytes = trimmed.str.encode('utf-8').str.len() > max_bytes
+                if over_bytes.any():
+                    # Only the offending values are cut byte-wise; 'ignore' drops a trailing partial character
+                    trimmed[over_bytes] = [
+                        value.encode('utf-8')[:max_bytes].decode('utf-8', errors='ignore')
+                        for value in trimmed[over_bytes]
+                    ]
+            
+            changed = trimmed != text
+            if changed.any():
+                df.loc[changed[changed].index, column] = trimmed[changed]
+                trimmed_columns.append(column)
+        
+        return trimmed_columns
+    
+    def trim_columns_to_limits(self, column_limits, byte_limits=None):
+        """
+        Trim every constrained column of the loaded CSV to its VARCHAR limit.
+        
+        Args:
+            column_limits (dict): Column name to maximum character length.
+            byte_limits (dict, optional): Column name to maximum encoded byte length.
+        
+        Returns:
+            bool: True if any values were trimmed, False otherwise.
+        """
+        if self.df is None:
+            raise ValueError("CSV not loaded. Call load_csv() first.")
+        
+        missing_columns = [column for column in column_limits if column not in self.df.columns]
+        if missing_columns:
+            raise ValueError(f"Column(s) {missing_columns} not found in CSV.")
+        
+        for max_length in column_limits.values():
+            if not isinstance(max_length, int) or max_length <= 0:
+                raise ValueError("Column limits must be positive integers.")
+        
+        max_char_bytes = self.schema.max_char_bytes() if self.schema is not None else None
+        trimmed_columns = CSVDataRowsSanitizer.trim_frame_to_limits(self.df, column_limits, byte_limits, max_char_bytes)
+        
+        if trimmed_columns:
+            print(f"Values in column(s) {trimmed_columns} trimmed to their max length.")
+        else:
+            print(f"No values in column(s) {list(column_limits.keys())} needed trimming.")
+        
+        return len(trimmed_columns) > 0
+    
+    def trim_column_values(self, column_to_trim, max_length, max_bytes=None):
         """
         Trim values in the specified column to a maximum character length.
         
         Args:
             column_to_trim (str): Column whose values need to be trimmed.
             max_length (int): Maximum allowed character length for values.
+            max_bytes (int, optional): Maximum allowed UTF-8 byte length for values.
         
         Returns:
             bool: True if any values were trimmed, False otherwise.
@@ -130,16 +231,8 @@ class CSVDataRowsSanitizer:
         if not isinstance(max_length, int) or max_length <= 0:
             raise ValueError("max_length must be a positive integer.")
         
-        # Track if any values were trimmed
-        trimmed = False
-        
-        # Convert values to string and trim if necessary
-        self.df[column_to_trim] = self.df[column_to_trim].astype(str).apply(
-            lambda x: x[:max_length] if len(x) > max_length else x
-        )
-        
-        # Check if any values were actually trimmed
-        trimmed = any(self.df[column_to_trim].str.len() < self.df[column_to_trim].str.len().max())
+        byte_limits = {column_to_trim: max_bytes} if max_bytes is not None else None
+        trimmed = len(CSVDataRowsSanitizer.trim_frame_to_limits(self.df, {column_to_trim: max_length}, byte_limits)) > 0
         
         if trimmed:
             print(f"Values in column '{column_to_trim}' trimmed to max length {max_length}.")
@@ -177,10 +270,10 @@ class CSVDataRowsSanitizer:
         # Generate random numbers
         if is_integer:
             # For integers, max_value is inclusive
-            random_values = np.random.randint(low=min_value, high=max_value + 1, size=len(self.df))
+            random_values = self.rng.integers(low=min_value, high=max_value + 1, size=len(self.df))
         else:
             # For floats, max_value is exclusive
-            random_values = np.random.uniform(low=min_value, high=max_value, size=len(self.df))
+            random_values = self.rng.uniform(low=min_value, high=max_value, size=len(self.df))
         
         # Add the new column to the DataFrame
         self.df[column_name] = random_values
@@ -270,6 +363,13 @@ class CSVDataRowsSanitizer:
         except Exception as e:
             raise Exception(f"Error applying transformation function: {str(e)}")
 
+    @staticmethod
+    def nullable_integer_dtype(dtype):
+        """Return the nullable counterpart of an integer dtype (uint16 -> UInt16, int64 -> Int64)."""
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            return dtype
+        return dtype.name.replace('uint', 'UInt') if dtype.name.startswith('uint') else dtype.name.capitalize()
+
     def add_empty_column(self, column_name, extra_rows=0):
         """
         Add a new column with the specified name and fill it with empty values (NaN).
@@ -299,6 +399,10 @@ class CSVDataRowsSanitizer:
         if extra_rows > 0:
             # Create a new DataFrame with extra_rows rows and same columns, filled with NaN
             new_rows = pd.DataFrame(np.nan, index=range(extra_rows), columns=self.df.columns)
+            # Integer columns are padded with nullable NA, so they stay integers ("12", not "12.0")
+            for column in self.df.columns:
+                if pd.api.types.is_integer_dtype(self.df[column].dtype):
+                    new_rows[column] = pd.array([pd.NA] * extra_rows, dtype=CSVDataRowsSanitizer.nullable_integer_dtype(self.df[column].dtype))
             # Append the new rows to the DataFrame
             self.df = pd.concat([self.df, new_rows], ignore_index=True)
             print(f"Appended {extra_rows} new rows with NaN values.")
@@ -307,11 +411,16 @@ class CSVDataRowsSanitizer:
         return True
 
     def save_csv(self):
-        """Overwrite the CSV file with the updated DataFrame."""
+        """Overwrite the CSV file (or the store's dataset) with the updated DataFrame."""
         if self.df is None:
             raise ValueError("CSV not loaded. Call load_csv() first.")
         try:
+            if self.store is not None:
+                self.store.put(self.file_path, self.df)
+                print(f"Dataset '{self.file_path}' updated in memory.")
+                return
             self.df.to_csv(self.file_path, index=False)
+            PerformanceMonitor.count(rows_out=len(self.df), bytes_written=PerformanceMonitor.file_bytes(self.file_path))
             print(f"CSV file overwritten at: {self.file_path}")
         except Exception as e:
             raise Exception(f"Error saving CSV: {str(e)}")
@@ -320,7 +429,8 @@ class CSVDataRowsSanitizer:
                 trim_column=None, max_length=None,
                 random_column=None, min_value=None, max_value=None, random_is_integer=True,
                 remove_column_name=None, transform_function=None, columns_to_count_on_transform=None,
-                empty_column_name=None, empty_extra_rows=0, equal_columns=None):
+                empty_column_name=None, empty_extra_rows=0, equal_columns=None,
+                column_limits=None, byte_limits=None):
         """
         Process the CSV: handle duplicates, remove rows with equal column values, trim column values, 
         add random column, remove column, apply row transformation, add empty column with optional extra rows, then save.
@@ -341,6 +451,8 @@ class CSVDataRowsSanitizer:
             empty_column_name (str): Name of new column to add with empty values (optional).
             empty_extra_rows (int): Number of additional rows to append with NaN values深的 (default: 0).
             equal_columns (tuple): Tuple of two column names to check for equal values and remove rows (optional).
+            column_limits (dict): Column name to VARCHAR character limit, trimmed in one pass (optional).
+            byte_limits (dict): Column name to UTF-8 byte limit, used with column_limits (optional).
         """
         self.load_csv()
         
@@ -356,6 +468,10 @@ class CSVDataRowsSanitizer:
         if trim_column and max_length:
             self.trim_column_values(trim_column, max_length)
         
+        # Trim every constrained column if column_limits is provided
+        if column_limits:
+            self.trim_columns_to_limits(column_limits, byte_limits)
+        
         # Add random column if random_column, min_value, and max_value are provided
         if random_column and min_value is not None and max_value is not None:
             self.add_random_column(random_column, min_value, max_value, random_is_integer)
@@ -1,5 +1,6 @@
 import csv, os, datetime
 import random
+from utils.PerformanceMonitor import PerformanceMonitor
 
 class CSVWriter:
     def __init__(self, file_path=None, default_data=None):
@@ -50,9 +51,10 @@ class CSVWriter:
         data_header = data_set[0].keys()
         
         # Get time for logging
-        action_time = datetime.datetime.now().strftime("%Y-%M-%d %H:%M:%S")
+        action_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
         try:
+            size_before = PerformanceMonitor.file_bytes(self.file_path) if mode == 'a' else 0
             with open(self.file_path, mode, newline="", encoding="utf-8") as f:
                 writer = csv.DictWriter(f, fieldnames=data_header)
                 
@@ -65,6 +67,7 @@ class CSVWriter:
                 # Write or append rows
                 writer.writerows(data_set)
             
+            PerformanceMonitor.count(rows_out=len(data_set), bytes_written=PerformanceMonitor.file_bytes(self.file_path) - size_before)
             action = "written" if mode == 'w' else "appended"
             print(f"CSV file '{self.file_path}' {action} successfully at {action_time}{' '+print_remarks if print_remarks is not None else ''}.")
             return True
@@ -0,0 +1,128 @@
+import time
+import numpy as np
+from utils.DatasetStore import DatasetStore
+
+class CatalogStore:
+
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+
+    def __init__(self, registry, sources, store=None):
+        """
+        Read-only, in-memory copy of the generated dataset with a hash index on every foreign key
+        column, so "rows of table T whose column C is V" costs a dict lookup plus the size of the
+        page returned, instead of a scan of the whole table.
+
+        Rows are identified like the database will number them: AUTO_INCREMENT ids are assigned
+        1..n in CSV order to the rows SQLWriter loads (all-null rows are skipped, see
+        TableSchema.emitted_rows), so row id is the position among those rows + 1. Every index maps
+        a key to a slice of row positions in ascending order, which makes the cursor of a page the
+        last id it returned.
+
+        Args:
+            registry (SchemaRegistry): Table definitions; only their columns are kept and only their
+                foreign key columns are indexed.
+            sources (dict): Table name to the CSV file its rows are loaded from.
+            store (DatasetStore, optional): Load the tables through this store instead of a private
+                one that is dropped once the catalog is built.
+        """
+        started_at = time.perf_counter()
+        self.registry = registry
+        self.sources = sources
+        store = store if store is not None else DatasetStore(paths=sources, registry=registry)
+        self.__columns = {}
+        self.__sizes = {}
+        self.__indexes = {}
+        for name, path in sources.items():
+            df = store.get(path, copy=False)
+            table = registry[name]
+            emitted = table.emitted_rows(df)
+            if not emitted.all():
+                df = df[emitted].reset_index(drop=True)
+            self.__sizes[name] = len(df)
+            self.__columns[name] = {
+                column.name: CatalogStore._column_array(df[column.name])
+                for column in table.columns if column.name in df.columns
+            }
+            for fk in table.foreign_keys:
+                if fk.column in df.columns:
+                    self.__indexes[(name, fk.column)] = CatalogStore._build_index(df[fk.column])
+        print(f"Catalog of {len(self.__sizes)} table(s), {sum(self.__sizes.values())} row(s) and {len(self.__indexes)} index(es) built in {time.perf_counter() - started_at:.2f}s.")
+
+    @staticmethod
+    def _column_array(values):
+        # numpy arrays make a page a fancy-indexing gather; nulls become None so they serialize as null
+        if values.isna().any():
+            return values.astype(object).where(values.notna(), None).to_numpy()
+        return values.to_numpy()
+
+    @staticmethod
+    def _build_index(values):
+        """
+        Return (positions, ranges): the row positions grouped by key, ascending within a key, and
+        each key's (start, end) slice of them.
+        """
+        present = values.notna().to_numpy()
+        positions = np.flatnonzero(present)
+        keys = values[present].to_numpy(dtype='int64')
+        # A stable sort keeps every key's positions in row order
+        order = np.argsort(keys, kind='stable')
+        positions = positions[order]
+        unique_keys, starts = np.unique(keys[order], return_index=True)
+        ends = np.append(starts[1:], len(positions))
+        return positions, dict(zip(unique_keys.tolist(), zip(starts.tolist(), ends.tolist())))
+
+    def tables(self):
+        return list(self.__sizes.keys())
+
+    def indexed_columns(self):
+        return list(self.__indexes.keys())
+
+    def size(self, table):
+        return self.__sizes[table]
+
+    def exists(self, table, row_id):
+        """True if the table has a row with this id."""
+        return 1 <= row_id <= self.__sizes[table]
+
+    def rows(self, table, positions):
+        """Return the rows at these positions as dicts, with their id first."""
+        columns = self.__columns[table]
+        primary_key = self.registry[table].primary_key
+        names = list(columns.keys())
+        values = [columns[name][positions].tolist() for name in names]
+        if primary_key is not None and primary_key not in columns:
+            names.insert(0, primary_key)
+            values.insert(0, (np.asarray(positions) + 1).tolist())
+        return [dict(zip(names, row)) for row in zip(*values)]
+
+    def lookup(self, table, column, value, cursor=None, limit=None):
+        """
+        Return one page of the rows of a table whose indexed column equals a value.
+
+        Args:
+            table (str): Table name, e.g. 'user_liked_song'.
+            column (str): Foreign key column, e.g. 'user_id'.
+            value (int): Key to look up.
+            cursor (int, optional): Return the rows after this id (the next_cursor of the previous page).
+            limit (int, optional): Page size (DEFAULT_PAGE_SIZE by default, at most MAX_PAGE_SIZE).
+
+        Returns:
+            dict: items (the rows, in id order) and next_cursor (None on the last page).
+        """
+        if (table, column) not in self.__indexes:
+            raise KeyError(f"Column '{column}' of table '{table}' is not indexed.")
+        limit = CatalogStore.DEFAULT_PAGE_SIZE if limit is None else limit
+        if limit < 1:
+            raise ValueError("limit must be at least 1.")
+        limit = min(limit, CatalogStore.MAX_PAGE_SIZE)
+        positions, ranges = self.__indexes[(table, column)]
+        start, end = ranges.get(value, (0, 0))
+        if cursor is not None:
+            # id > cursor is position >= cursor; positions ascend within the key
+            start += int(np.searchsorted(positions[start:end], cursor, side='left'))
+        page = positions[start:min(start + limit, end)]
+        return {
+            "items": self.rows(table, page),
+            "next_cursor": int(page[-1]) + 1 if start + limit < end else None
+        }
@@ -0,0 +1,148 @@
+import queue, re, sqlite3, threading
+from contextlib import contextmanager
+
+class DatabaseSink:
+
+    BACKENDS = ('mysql', 'sqlite')
+
+    def __init__(
+        self,
+        backend = 'mysql',
+        pool_size = 4,
+        batch_size = 1000,
+        commit_every = 10000,
+        **connect_kwargs
+    ):
+        """
+        Pooled database connections that SQLWriter streams rows into.
+
+        Args:
+            backend (str): 'mysql' (through pymysql) or 'sqlite' (for local tests and benchmarks).
+            pool_size (int): Maximum number of open connections.
+            batch_size (int): Rows per executemany call.
+            commit_every (int, optional): Commit after this many rows; None commits once per table.
+            **connect_kwargs: Passed to pymysql.connect (host, user, password, database, ...) or
+                sqlite3.connect (database). An in-memory SQLite database only lives on one connection,
+                so the pool is limited to a single connection in that case.
+        """
+        if backend not in DatabaseSink.BACKENDS:
+            raise ValueError(f"backend must be one of {DatabaseSink.BACKENDS}.")
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            raise ValueError("batch_size must be a positive integer.")
+
+        self.backend = backend
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.connect_kwargs = connect_kwargs
+        if backend == 'sqlite' and connect_kwargs.get('database', ':memory:') == ':memory:':
+            pool_size = 1
+        self.pool_size = pool_size
+        self.__idle = queue.LifoQueue()
+        self.__opened = 0
+        self.__lock = threading.Lock()
+
+    @property
+    def placeholder(self):
+        return '%s' if self.backend == 'mysql' else '?'
+
+    def _connect(self):
+        if self.backend == 'mysql':
+            import pymysql
+            options = {'charset': 'utf8mb4', 'autocommit': False}
+            options.update(self.connect_kwargs)
+            return pymysql.connect(**options)
+        options = {'database': ':memory:', 'check_same_thread': False}
+        options.update(self.connect_kwargs)
+        return sqlite3.connect(**options)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection from the pool, opening one if the pool is not full yet."""
+        conn = None
+        try:
+            conn = self.__idle.get_nowait()
+        except queue.Empty:
+            with self.__lock:
+                can_open = self.__opened < self.pool_size
+                if can_open:
+                    self.__opened += 1
+            if can_open:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self.__lock:
+                        self.__opened -= 1
+                    raise
+            else:
+                conn = self.__idle.get()
+        try:
+            yield conn
+        finally:
+            self.__idle.put(conn)
+
+    def close(self):
+        """Close every idle connection in the pool."""
+        while True:
+            try:
+                conn = self.__idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self.__lock:
+                self.__opened -= 1
+
+    def translate_ddl(self, statement):
+        """Rewrite the MySQL-only parts of a CREATE TABLE statement for the SQLite backend."""
+        if self.backend != 'sqlite':
+            return statement
+        statement = re.sub(r'\bINT\s+PRIMARY\s+KEY\s+AUTO_INCREMENT\b', 'INTEGER PRIMARY KEY AUTOINCREMENT', statement, flags=re.IGNORECASE)
+        statement = re.sub(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b', '', statement, flags=re.IGNORECASE)
+        statement = re.sub(r'\bDEFAULT\s+NOW\(\)', 'DEFAULT CURRENT_TIMESTAMP', statement, flags=re.IGNORECASE)
+        statement = re.sub(r'\)\s*CHARACTER\s+SET\s+\w+(\s+COLLATE\s+\w+)?', ')', statement, flags=re.IGNORECASE)
+        return statement
+
+    def execute(self, statement):
+        """Run a single DDL/DML statement (e.g. CREATE TABLE) and commit it."""
+        statement = self.translate_ddl(statement).strip().rstrip(';')
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(statement)
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def insert_rows(self, table_name, column_groups):
+        """
+        Insert rows with parameterized executemany batches.
+
+        Args:
+            table_name (str): Target table.
+            column_groups (iterable): (columns, rows) pairs in load order, where rows is a list of
+                value tuples for those columns.
+
+        Returns:
+            int: Number of rows inserted.
+        """
+        inserted = 0
+        uncommitted = 0
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for columns, rows in column_groups:
+                    statement = f"INSERT INTO {table_name} ({', '.join(columns)}) VALUES ({', '.join([self.placeholder] * len(columns))})"
+                    for start in range(0, len(rows), self.batch_size):
+                        batch = rows[start:start + self.batch_size]
+                        cursor.executemany(statement, batch)
+                        inserted += len(batch)
+                        uncommitted += len(batch)
+                        if self.commit_every is not None and uncommitted >= self.commit_every:
+                            conn.commit()
+                            uncommitted = 0
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return inserted
@@ -0,0 +1,138 @@
+import os, time, threading
+from utils.PerformanceMonitor import PerformanceMonitor
+from utils.ParsedCSVCache import ParsedCSVCache
+
+class DatasetStore:
+
+    def __init__(self, paths=None, registry=None, compact_dtypes=True):
+        """
+        In-process home of the pipeline's tables, so stages hand DataFrames to each other instead of
+        writing a CSV that the next stage parses again.
+
+        A dataset is loaded from its CSV on first use and kept in memory; stages replace it with
+        put() and nothing reaches the disk until checkpoint() writes the changed datasets back.
+
+        Args:
+            paths (dict, optional): Dataset name to the CSV file it is loaded from and persisted to.
+            registry (SchemaRegistry, optional): Datasets named like one of its tables are loaded with
+                the table's dtypes (string text columns, integer columns).
+            compact_dtypes (bool): Load integer columns in the smallest fitting dtype (unsigned for ids)
+                rather than Int64.
+        """
+        self.registry = registry
+        self.compact_dtypes = compact_dtypes
+        self.__paths = {}
+        self.__frames = {}
+        self.__dirty = set()
+        self.__lock = threading.RLock()
+        for name, path in (paths if paths is not None else {}).items():
+            self.register(name, path)
+
+    def register(self, name, path):
+        with self.__lock:
+            self.__paths[name] = path
+
+    def resolve(self, key):
+        """Return the dataset name of a name or CSV path."""
+        if key in self.__paths:
+            return key
+        normalized = os.path.normpath(key)
+        for name, path in self.__paths.items():
+            if os.path.normpath(path) == normalized:
+                return name
+        raise KeyError(f"Unknown dataset '{key}'.")
+
+    def __contains__(self, key):
+        try:
+            self.resolve(key)
+            return True
+        except KeyError:
+            return False
+
+    def names(self):
+        return list(self.__paths.keys())
+
+    def path(self, key):
+        return self.__paths[self.resolve(key)]
+
+    def is_loaded(self, key):
+        return self.resolve(key) in self.__frames
+
+    def dirty(self):
+        """Names of the datasets changed since they were loaded or last persisted."""
+        return [name for name in self.__paths if name in self.__dirty]
+
+    def _read(self, name):
+        path = self.__paths[name]
+        cache = ParsedCSVCache.shared()
+        if self.registry is not None and name in self.registry:
+            table = self.registry[name]
+            return table.cast_frame(cache.read_csv(path, dtype=table.csv_dtypes()), compact=self.compact_dtypes)
+        return cache.read_csv(path)
+
+    def get(self, key, copy=True):
+        """
+        Return a dataset, parsing its CSV only the first time.
+
+        Args:
+            key (str): Dataset name or CSV path.
+            copy (bool): Return a copy the caller may modify; with False the stored frame itself is
+                returned and must be treated as read-only.
+        """
+        name = self.resolve(key)
+        with self.__lock:
+            if name not in self.__frames:
+                try:
+                    self.__frames[name] = self._read(name)
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"CSV file not found at: {self.__paths[name]}")
+                PerformanceMonitor.count(rows_in=len(self.__frames[name]), bytes_read=PerformanceMonitor.file_bytes(self.__paths[name]))
+            else:
+                PerformanceMonitor.count(cache_hits=1)
+            df = self.__frames[name]
+        return df.copy() if copy else df
+
+    def put(self, key, df):
+        """Replace a dataset; the store takes ownership of the frame."""
+        name = self.resolve(key)
+        with self.__lock:
+            self.__frames[name] = df
+            self.__dirty.add(name)
+
+    def discard(self, key):
+        """Forget the in-memory copy (and any unsaved change) of a dataset."""
+        name = self.resolve(key)
+        with self.__lock:
+            self.__frames.pop(name, None)
+            self.__dirty.discard(name)
+
+    def checkpoint(self, keys=None):
+        """
+        Write the changed datasets back to their CSV files.
+
+        Args:
+            keys (list, optional): Only persist these datasets (all changed ones by default).
+
+        Returns:
+            list: Paths of the files written.
+        """
+        started_at = time.perf_counter()
+        names = self.dirty() if keys is None else [self.resolve(key) for key in keys]
+        written = []
+        with self.__lock:
+            for name in names:
+                if name not in self.__dirty:
+                    continue
+                path = self.__paths[name]
+                output_dir = os.path.dirname(path)
+                if output_dir:
+                    os.makedirs(output_dir, exist_ok=True)
+                # Written next to the target and renamed, so an interrupted checkpoint never leaves half a CSV
+                temporary_file = f"{path}.tmp"
+                self.__frames[name].to_csv(temporary_file, index=False)
+                os.replace(temporary_file, path)
+                PerformanceMonitor.count(rows_out=len(self.__frames[name]), bytes_written=PerformanceMonitor.file_bytes(path))
+                self.__dirty.discard(name)
+                written.append(path)
+        print(f"Checkpoint wrote {len(written)} dataset(s) in {time.perf_counter() - started_at:.2f}s{': ' + ', '.join(written) if written else ''}.")
+        return written
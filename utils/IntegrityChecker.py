@@ -0,0 +1,145 @@
+import time
+import pandas as pd
+
+class IntegrityChecker:
+
+    def __init__(self, registry, sources, store=None):
+        """
+        Check the FOREIGN KEY and UNIQUE constraints of a schema registry against the CSV inputs
+        before any SQL is generated.
+
+        Args:
+            registry (SchemaRegistry): Table definitions holding the constraints.
+            sources (dict): Table name to the CSV file its rows are loaded from. Tables without a
+                source are skipped, as are foreign keys pointing at them.
+            store (DatasetStore, optional): Sources held by this store are checked in memory, as the
+                SQL writers reading from the same store will see them.
+        """
+        unknown = [name for name in sources if name not in registry]
+        if unknown:
+            raise ValueError(f"Sources given for unknown table(s) {unknown}.")
+        self.registry = registry
+        self.sources = sources
+        self.store = store
+
+    def _key_columns(self, table):
+        columns = [fk.column for fk in table.foreign_keys]
+        for unique_key in table.unique_keys:
+            columns += unique_key.columns
+        return list(dict.fromkeys(columns))
+
+    def load_keys(self, name):
+        """Read only the FK and UNIQUE columns of a table (plus its row count) from its CSV."""
+        table = self.registry[name]
+        columns = self._key_columns(table)
+        if self.store is not None and self.sources[name] in self.store:
+            df = self.store.get(self.sources[name], copy=False)
+            missing = [column for column in columns if column not in df.columns]
+            if missing:
+                raise ValueError(f"Dataset '{self.sources[name]}' of table '{name}' lacks column(s) {missing}.")
+            return table.cast_frame(df[columns if columns else df.columns[:1]].copy())
+        header = pd.read_csv(self.sources[name], nrows=0).columns.tolist()
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"CSV '{self.sources[name]}' of table '{name}' lacks column(s) {missing}.")
+        # An unused first column still gives the row count when the table has no key columns
+        usecols = columns if columns else header[:1]
+        return table.cast_frame(pd.read_csv(self.sources[name], usecols=usecols, dtype=table.csv_dtypes(columns=usecols)))
+
+    def load_row_count(self, name):
+        """
+        Number of rows the SQL writer loads into a table, i.e. its highest AUTO_INCREMENT id: all-null
+        rows are skipped, so this reads every column of the table, not only the keys.
+        """
+        table = self.registry[name]
+        if self.store is not None and self.sources[name] in self.store:
+            df = self.store.get(self.sources[name], copy=False)
+        else:
+            header = pd.read_csv(self.sources[name], nrows=0).columns.tolist()
+            usecols = [column.name for column in table.data_columns() if column.name in header]
+            df = pd.read_csv(self.sources[name], usecols=usecols, dtype=table.csv_dtypes(columns=usecols))
+        return int(table.emitted_rows(df).sum())
+
+    def _normalize(self, values, column):
+        # utf8mb4_unicode_ci compares case-insensitively and ignores trailing spaces
+        if column.is_text:
+            return values.astype('string').str.casefold().str.rstrip(' ')
+        return values
+
+    def check_foreign_keys(self, name, frames, row_counts=None):
+        """
+        Args:
+            row_counts (dict, optional): Rows loaded per referenced table (see load_row_count); the
+                length of its frame is used for tables missing from it.
+        """
+        row_counts = row_counts if row_counts is not None else {}
+        violations = []
+        df = frames[name]
+        for fk in self.registry[name].foreign_keys:
+            if fk.references_table not in frames:
+                continue
+            values = df[fk.column]
+            nulls = values.isna()
+            if nulls.any() and not self.registry[name].column(fk.column).nullable:
+                violations.append({
+                    "table": name, "constraint": f"FOREIGN KEY({fk.column})", "rows": int(nulls.sum()),
+                    "detail": "null value(s) in a NOT NULL column", "sample": df.index[nulls][:5].tolist()
+                })
+            referenced = self.registry[fk.references_table].column(fk.references_column)
+            present = values[~nulls]
+            if referenced.auto_increment:
+                # AUTO_INCREMENT ids are assigned 1..n in load order, so membership is a range check
+                dangling = (present < 1) | (present > row_counts.get(fk.references_table, len(frames[fk.references_table])))
+            else:
+                dangling = ~present.isin(frames[fk.references_table][fk.references_column].dropna())
+            dangling = dangling.to_numpy(dtype=bool)
+            if dangling.any():
+                violations.append({
+                    "table": name, "constraint": f"FOREIGN KEY({fk.column})", "rows": int(dangling.sum()),
+                    "detail": f"value(s) not found in {fk.references_table}({fk.references_column})",
+                    "sample": present[dangling].head(5).tolist()
+                })
+        return violations
+
+    def check_unique_keys(self, name, frames):
+        violations = []
+        df = frames[name]
+        table = self.registry[name]
+        for unique_key in table.unique_keys:
+            keys = pd.DataFrame({column: self._normalize(df[column], table.column(column)) for column in unique_key.columns})
+            # MySQL does not treat NULLs as equal in a UNIQUE index
+            duplicated = keys.duplicated(keep='first') & keys.notna().all(axis=1)
+            if duplicated.any():
+                violations.append({
+                    "table": name, "constraint": f"UNIQUE {unique_key.name}({', '.join(unique_key.columns)})",
+                    "rows": int(duplicated.sum()), "detail": "duplicate key(s)",
+                    "sample": [list(row) for row in zip(*[df.loc[duplicated, column].head(5).tolist() for column in unique_key.columns])]
+                })
+        return violations
+
+    def check(self):
+        """
+        Check every table with a source.
+
+        Returns:
+            list: One dict per violated constraint (table, constraint, rows, detail, sample); empty if the data is consistent.
+        """
+        started_at = time.perf_counter()
+        frames = {name: self.load_keys(name) for name in self.registry.names() if name in self.sources}
+        referenced = {
+            fk.references_table for name in frames for fk in self.registry[name].foreign_keys
+            if fk.references_table in frames and self.registry[fk.references_table].column(fk.references_column).auto_increment
+        }
+        row_counts = {name: self.load_row_count(name) for name in referenced}
+        violations = []
+        for name in frames:
+            violations += self.check_foreign_keys(name, frames, row_counts)
+            violations += self.check_unique_keys(name, frames)
+        elapsed = time.perf_counter() - started_at
+        total_rows = sum(len(df) for df in frames.values())
+        print(f"Checked {len(frames)} tables ({total_rows} rows) in {elapsed:.2f}s: {len(violations)} violated constraint(s).")
+        return violations
+
+    def report(self, violations):
+        for violation in violations:
+            print(f"  {violation['table']}: {violation['constraint']} - {violation['rows']} row(s) with {violation['detail']}, e.g. {violation['sample']}")
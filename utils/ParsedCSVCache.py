@@ -0,0 +1,281 @@
+import os, json, hashlib, threading
+import numpy as np
+import pandas as pd
+from utils.PerformanceMonitor import PerformanceMonitor
+
+class ParsedCSVCache:
+
+    FORMATS = ('feather', 'parquet', 'numpy')
+    SUFFIXES = {'feather': '.feather', 'parquet': '.parquet', 'numpy': '.npz'}
+    # Separates the values of a text column in the numpy format; columns holding it are not cached
+    TEXT_SEPARATOR = '\x00'
+    # read_csv options that do not return one complete frame are never cached
+    UNCACHEABLE_OPTIONS = ('chunksize', 'iterator', 'nrows', 'skiprows', 'skipfooter')
+    __shared = None
+    __shared_lock = threading.Lock()
+
+    def __init__(self, format=None, enabled=True):
+        """
+        Transparent cache of parsed CSV files: the DataFrame returned by pd.read_csv is stored in a
+        binary file next to the CSV (`<csv_file>.<options>.parsed.npz`, like the `.rowidx.npz` row
+        index of RandomMachine) and loaded instead of parsing the CSV again while it is unchanged.
+
+        Entries are keyed on the path, the read_csv options and the pandas version, and are valid
+        while the CSV's size and mtime match the recorded ones. When they do not, the content hash
+        decides: a file rewritten with the same content (e.g. by a pipeline stage) keeps its entry.
+        The bookkeeping lives in `<csv_file>.parsed.json`.
+
+        Args:
+            format (str, optional): 'feather', 'parquet' or 'numpy'; defaults to feather when
+                pyarrow is installed and to numpy otherwise. The numpy format is an .npz of one array
+                per column (text columns as one joined string plus a null mask), read with
+                allow_pickle=False, so like the Arrow formats a cache file never runs code when it
+                is loaded. Frames a format cannot hold exactly (a non-default index, categoricals,
+                mixed object columns, ...) are not cached.
+            enabled (bool): With False, read_csv() only delegates to pd.read_csv.
+        """
+        if format is None:
+            try:
+                import pyarrow
+                format = 'feather'
+            except ImportError:
+                format = 'numpy'
+        if format not in ParsedCSVCache.FORMATS:
+            raise ValueError(f"format must be one of {ParsedCSVCache.FORMATS}.")
+        self.format = format
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """
+        The process-wide cache used by the CSV loaders (CSVDataRowsSanitizer, SQLWriter,
+        DatasetStore). Set PARSED_CSV_CACHE=0 to turn it off.
+        """
+        with cls.__shared_lock:
+            if cls.__shared is None:
+                cls.__shared = cls(enabled=os.environ.get("PARSED_CSV_CACHE", '1').lower() not in ('0', 'false', 'no', 'off'))
+            return cls.__shared
+
+    @staticmethod
+    def content_hash(path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def options_key(options):
+        """Short digest of the read_csv options (e.g. dtype), so differently parsed frames get their own entry."""
+        normalized = json.dumps(options, sort_keys=True, default=str)
+        return hashlib.blake2b(f"{pd.__version__}:{normalized}".encode(), digest_size=6).hexdigest()
+
+    @staticmethod
+    def is_cacheable(options):
+        return not any(option in options for option in ParsedCSVCache.UNCACHEABLE_OPTIONS) and not any(callable(value) for value in options.values())
+
+    def _index_file(self, path):
+        return f"{path}.parsed.json"
+
+    def _load_index(self, path):
+        try:
+            with open(self._index_file(path), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable CSV cache index '{self._index_file(path)}': {str(e)}")
+            return None
+
+    def _save_index(self, path, index):
+        temporary_file = f"{self._index_file(path)}.{os.getpid()}.tmp"
+        with open(temporary_file, 'w', encoding="utf-8") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(temporary_file, self._index_file(path))
+
+    def _remove_entries(self, path, entries):
+        for entry in entries.values():
+            try:
+                os.remove(os.path.join(os.path.dirname(path), entry["file"]))
+            except FileNotFoundError:
+                pass
+
+    def _is_current(self, path, stat, index):
+        """Return (is current, content hash if it had to be computed)."""
+        if index is None:
+            return False, None
+        if index.get("size") == stat.st_size and index.get("mtime_ns") == stat.st_mtime_ns:
+            return True, None
+        digest = ParsedCSVCache.content_hash(path)
+        return digest == index.get("hash"), digest
+
+    @staticmethod
+    def _column_arrays(values):
+        """Return (kind, arrays) storing a column in the numpy format, or None if it cannot be stored exactly."""
+        dtype = values.dtype
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+            return 'numpy', {"values": values.to_numpy()}
+        if isinstance(dtype, pd.StringDtype) or dtype == object:
+            mask = values.isna().to_numpy()
+            present = values[~mask]
+            if not all(isinstance(value, str) for value in present) or present.str.contains(ParsedCSVCache.TEXT_SEPARATOR, regex=False).any():
+                return None
+            return 'text', {"values": np.array(ParsedCSVCache.TEXT_SEPARATOR.join(present.tolist())), "mask": mask}
+        if isinstance(values.array, pd.arrays.IntegerArray | pd.arrays.FloatingArray | pd.arrays.BooleanArray):
+            return 'masked', {"values": values.array._data, "mask": values.array._mask}
+        return None
+
+    @staticmethod
+    def _column_from_arrays(kind, dtype, arrays):
+        if kind == 'numpy':
+            return arrays["values"]
+        if kind == 'masked':
+            return dtype.construct_array_type()(arrays["values"], arrays["mask"])
+        mask = arrays["mask"]
+        values = np.empty(len(mask), dtype=object)
+        text = arrays["values"].item()
+        if not mask.all():
+            values[~mask] = text.split(ParsedCSVCache.TEXT_SEPARATOR)
+        values[mask] = None
+        return pd.array(values, dtype=dtype)
+
+    @staticmethod
+    def _frame_arrays(df):
+        """Return the arrays of the numpy format of a frame, or None if it cannot hold the frame exactly."""
+        arrays = {}
+        columns = []
+        for position, column in enumerate(df.columns):
+            stored = ParsedCSVCache._column_arrays(df[column])
+            if stored is None:
+                return None
+            kind, column_arrays = stored
+            columns.append({"name": column, "dtype": str(df[column].dtype), "kind": kind})
+            for part, array in column_arrays.items():
+                arrays[f"{position}_{part}"] = array
+        arrays["columns"] = np.array(json.dumps(columns))
+        arrays["rows"] = np.array(len(df))
+        return arrays
+
+    def _write_frame(self, df, cache_file, format):
+        temporary_file = f"{cache_file}.{os.getpid()}.tmp"
+        if format == 'feather':
+            df.to_feather(temporary_file)
+        elif format == 'parquet':
+            df.to_parquet(temporary_file)
+        else:
+            # Written through a file object so numpy does not append its own suffix
+            with open(temporary_file, 'wb') as f:
+                np.savez(f, **ParsedCSVCache._frame_arrays(df))
+        os.replace(temporary_file, cache_file)
+
+    def _read_frame(self, cache_file, format):
+        if format == 'feather':
+            return pd.read_feather(cache_file)
+        if format == 'parquet':
+            return pd.read_parquet(cache_file)
+        if format != 'numpy':
+            # e.g. a pickle written by an older version, which is never loaded
+            raise ValueError(f"unsupported cache format '{format}'")
+        with np.load(cache_file, allow_pickle=False) as stored:
+            columns = json.loads(stored["columns"].item())
+            data = {}
+            for position, column in enumerate(columns):
+                dtype = pd.api.types.pandas_dtype(column["dtype"])
+                arrays = {part: stored[f"{position}_{part}"] for part in ('values', 'mask') if f"{position}_{part}" in stored}
+                data[column["name"]] = pd.Series(ParsedCSVCache._column_from_arrays(column["kind"], dtype, arrays), dtype=dtype, copy=False)
+            return pd.DataFrame(data, index=pd.RangeIndex(int(stored["rows"])))
+
+    def _entry_format(self, df):
+        """Return the format to cache a frame in, or None if it is not cached."""
+        # None of the formats stores a custom index or non-string column labels
+        if not (isinstance(df.index, pd.RangeIndex) and df.index.start == 0 and df.index.step == 1 and all(isinstance(column, str) for column in df.columns) and df.columns.is_unique):
+            return None
+        if self.format == 'numpy' and ParsedCSVCache._frame_arrays(df) is None:
+            return None
+        return self.format
+
+    def read_csv(self, path, **options):
+        """
+        Return pd.read_csv(path, **options), from the cache while the CSV is unchanged.
+
+        Options that make read_csv return chunks or part of the file (chunksize, nrows, skiprows,
+        callables, ...) bypass the cache.
+        """
+        if not self.enabled or not ParsedCSVCache.is_cacheable(options):
+            return pd.read_csv(path, **options)
+
+        # Raises FileNotFoundError for a missing CSV, like read_csv itself
+        stat = os.stat(path)
+        key = ParsedCSVCache.options_key(options)
+        with self.__lock:
+            index = self._load_index(path)
+            is_current, digest = self._is_current(path, stat, index)
+            entry = index["entries"].get(key) if is_current else None
+            if is_current and digest is not None:
+                # Same content under a new mtime: keep the entries and remember the new stat
+                index.update({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+                self._try_save_index(path, index)
+
+        if entry is not None:
+            try:
+                df = self._read_frame(os.path.join(os.path.dirname(path), entry["file"]), entry["format"])
+                self.hits += 1
+                PerformanceMonitor.count(cache_hits=1)
+                return df
+            except Exception as e:
+                print(f"Ignoring unreadable CSV cache entry '{entry['file']}': {str(e)}")
+
+        df = pd.read_csv(path, **options)
+        self.misses += 1
+        self._store(path, stat, key, df, index if is_current else None, digest)
+        return df
+
+    def _try_save_index(self, path, index):
+        try:
+            self._save_index(path, index)
+        except OSError as e:
+            print(f"Could not update CSV cache index '{self._index_file(path)}': {str(e)}")
+
+    def _store(self, path, stat, key, df, index, digest):
+        format = self._entry_format(df)
+        if format is None:
+            return
+        cache_file = f"{path}.{key}.parsed{ParsedCSVCache.SUFFIXES[format]}"
+        with self.__lock:
+            try:
+                if index is None:
+                    stale = self._load_index(path)
+                    if stale is not None:
+                        self._remove_entries(path, stale.get("entries", {}))
+                    index = {
+                        "size": stat.st_size,
+                        "mtime_ns": stat.st_mtime_ns,
+                        "hash": digest if digest is not None else ParsedCSVCache.content_hash(path),
+                        "entries": {}
+                    }
+                if os.stat(path).st_mtime_ns != stat.st_mtime_ns:
+                    # The CSV was rewritten while it was parsed; the frame may not match either version
+                    return
+                self._write_frame(df, cache_file, format)
+                replaced = index["entries"].get(key)
+                if replaced is not None and replaced["file"] != os.path.basename(cache_file):
+                    self._remove_entries(path, {key: replaced})
+                index["entries"][key] = {"file": os.path.basename(cache_file), "format": format}
+                self._save_index(path, index)
+            except Exception as e:
+                print(f"Could not cache parsed CSV '{path}': {str(e)}")
+
+    def invalidate(self, path):
+        """Remove every cache entry of a CSV file."""
+        with self.__lock:
+            index = self._load_index(path)
+            if index is None:
+                return
+            self._remove_entries(path, index.get("entries", {}))
+            try:
+                os.remove(self._index_file(path))
+            except FileNotFoundError:
+                pass
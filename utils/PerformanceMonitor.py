@@ -0,0 +1,171 @@
+import os, json, time, threading, datetime, uuid
+from contextlib import contextmanager
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; CPU time of child processes and peak RSS are then not reported
+    resource = None
+
+class PerformanceMonitor:
+
+    COUNTERS = ('rows_in', 'rows_out', 'bytes_read', 'bytes_written', 'api_calls', 'cache_hits')
+    __local = threading.local()
+
+    def __init__(self, run_id=None):
+        """
+        Record per-stage performance metrics: wall and CPU time, peak RSS and the counters in
+        COUNTERS (rows, bytes, API calls, cache hits).
+
+        Stages are measured with `with monitor.stage(name):`. Code running inside a stage reports its
+        counters with PerformanceMonitor.count(...), which finds the stage of the calling thread and
+        does nothing when no stage is being measured, so components need no reference to a monitor.
+        Worker processes measure their own stage and return its counters(), which the parent adds to
+        its stage with count(**counters).
+
+        Args:
+            run_id (str, optional): Identifier written with every record (a random one by default).
+        """
+        self.run_id = run_id if run_id is not None else uuid.uuid4().hex[:12]
+        self.records = []
+        self.__lock = threading.Lock()
+
+    @classmethod
+    def count(cls, **counters):
+        """Add to the counters of the innermost stage measured on this thread, e.g. count(rows_out=100)."""
+        stack = getattr(cls.__local, 'stack', None)
+        if not stack:
+            return
+        record = stack[-1]
+        for name, value in counters.items():
+            if name not in cls.COUNTERS:
+                raise ValueError(f"Unknown counter '{name}', expected one of {list(cls.COUNTERS)}.")
+            record[name] += value
+
+    @staticmethod
+    def counters(record):
+        """The counters of a stage record, e.g. to send them from a worker process to its parent."""
+        return {counter: record[counter] for counter in PerformanceMonitor.COUNTERS}
+
+    @staticmethod
+    def file_bytes(*paths):
+        """Total size of the given files, skipping the ones that do not exist."""
+        total = 0
+        for path in paths:
+            if path is not None and os.path.isfile(path):
+                total += os.path.getsize(path)
+        return total
+
+    @staticmethod
+    def _children_cpu_seconds():
+        if resource is None:
+            return 0.0
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return usage.ru_utime + usage.ru_stime
+
+    @staticmethod
+    def _peak_rss_bytes():
+        if resource is None:
+            return None
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+    @contextmanager
+    def stage(self, name, **labels):
+        """
+        Measure the enclosed block as one stage.
+
+        CPU time is the calling thread's CPU time plus that of child processes reaped meanwhile
+        (process pools), so stages running concurrently on other threads are not counted. Peak RSS
+        is the process's high-water mark when the stage ends.
+
+        Args:
+            name (str): Stage name.
+            **labels: Extra values stored with the record (e.g. group='sql').
+
+        Yields:
+            dict: The stage record; counters may also be added to it directly.
+        """
+        record = {"run_id": self.run_id, "stage": name, **labels, "status": 'ok'}
+        record.update({counter: 0 for counter in PerformanceMonitor.COUNTERS})
+        stack = getattr(PerformanceMonitor.__local, 'stack', None)
+        if stack is None:
+            stack = PerformanceMonitor.__local.stack = []
+        stack.append(record)
+        record["started_at"] = datetime.datetime.now().isoformat(timespec='seconds')
+        started_at = time.perf_counter()
+        cpu_started_at = time.thread_time()
+        children_started_at = PerformanceMonitor._children_cpu_seconds()
+        try:
+            yield record
+        except BaseException:
+            record["status"] = 'failed'
+            raise
+        finally:
+            stack.pop()
+            record["wall_seconds"] = round(time.perf_counter() - started_at, 6)
+            record["cpu_seconds"] = round(time.thread_time() - cpu_started_at + PerformanceMonitor._children_cpu_seconds() - children_started_at, 6)
+            rows = record["rows_out"] or record["rows_in"]
+            record["rows_per_second"] = round(rows / record["wall_seconds"], 1) if record["wall_seconds"] > 0 else 0.0
+            record["peak_rss_bytes"] = PerformanceMonitor._peak_rss_bytes()
+            with self.__lock:
+                self.records.append(record)
+            if stack and record["status"] == 'ok':
+                # Work of a nested stage also belongs to the enclosing one
+                for counter in PerformanceMonitor.COUNTERS:
+                    stack[-1][counter] += record[counter]
+
+    def summary(self):
+        for record in self.records:
+            print(
+                f"  {record['stage']:<30} {record['wall_seconds']:8.2f}s wall {record['cpu_seconds']:8.2f}s cpu "
+                f"{record['rows_out'] or record['rows_in']:>10} rows {record['rows_per_second']:>12.0f} rows/s"
+            )
+
+    def write_json_lines(self, path):
+        """Append one JSON object per stage record, so successive runs accumulate in one file."""
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(path, 'a', encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record, sort_keys=True) + '\n')
+        print(f"Performance metrics of {len(self.records)} stage(s) appended to '{path}'.")
+
+    def to_prometheus(self, prefix='spotify_pipeline'):
+        """Return the records in the Prometheus text exposition format, one series per stage."""
+        metrics = [
+            ('wall_seconds', 'gauge', "Wall clock time of the stage."),
+            ('cpu_seconds', 'gauge', "CPU time of the stage, child processes included."),
+            ('rows_per_second', 'gauge', "Rows written (or read) per second of wall time."),
+            ('peak_rss_bytes', 'gauge', "Peak resident set size of the process at the end of the stage."),
+        ] + [(counter, 'counter', f"{counter.replace('_', ' ').capitalize()} during the stage.") for counter in PerformanceMonitor.COUNTERS]
+        lines = []
+        for metric, metric_type, description in metrics:
+            name = f"{prefix}_stage_{metric}" if metric_type == 'gauge' else f"{prefix}_stage_{metric}_total"
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for record in self.records:
+                if record.get(metric) is None:
+                    continue
+                stage = record["stage"].replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{name}{{run_id="{record["run_id"]}",stage="{stage}",status="{record["status"]}"}} {record[metric]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path, prefix='spotify_pipeline'):
+        """Write the Prometheus text file (e.g. for node_exporter's textfile collector), replacing it atomically."""
+        output_dir = os.path.dirname(path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        temporary_file = f"{path}.tmp"
+        with open(temporary_file, 'w', encoding="utf-8") as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(temporary_file, path)
+        print(f"Performance metrics of {len(self.records)} stage(s) written to '{path}'.")
+
+    def export(self, path):
+        """Write the records as Prometheus text if the path ends in .prom, as JSON lines otherwise."""
+        if path.endswith('.prom'):
+            self.write_prometheus(path)
+        else:
+            self.write_json_lines(path)
@@ -0,0 +1,255 @@
+import os, json, time, hashlib, threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from graphlib import TopologicalSorter, CycleError
+
+class Stage:
+
+    def __init__(self, name, action, inputs=None, outputs=None, params=None, group=None, exclusive=None):
+        """
+        One step of the pipeline.
+
+        Args:
+            name (str): Unique stage name.
+            action (callable): Called as action(**params).
+            inputs (list, optional): Files the stage reads.
+            outputs (list, optional): Files the stage writes (may repeat inputs for in-place stages).
+            params (dict, optional): Keyword arguments of the action; changing them triggers a rebuild.
+            group (str, optional): Group name ('scrape', 'sanitize', 'csv', 'sql', ...) usable as a target.
+            exclusive (str, optional): Shared resource name; stages naming the same resource never run
+                at the same time (e.g. stages using one stateful API client).
+        """
+        self.name = name
+        self.action = action
+        self.inputs = list(inputs) if inputs is not None else []
+        self.outputs = list(outputs) if outputs is not None else []
+        self.params = params if params is not None else {}
+        self.group = group
+        self.exclusive = exclusive
+
+    @property
+    def sources(self):
+        """Inputs the stage does not write itself."""
+        return [path for path in self.inputs if path not in self.outputs]
+
+
+class PipelineRunner:
+
+    def __init__(self, stages, state_file='.pipeline_state.json', max_workers=4, monitor=None):
+        """
+        Make-style runner: a stage is skipped while its outputs exist, its parameters are the same and
+        the content hashes of its inputs match the ones recorded after its last run. As with make,
+        editing an output by hand does not trigger a rebuild (in-place stages, like the relation
+        randomizers, would otherwise rerun on their own results).
+
+        Dependencies come from the artifacts: a stage depends on the stages producing its inputs.
+        Independent stages run concurrently on a thread pool (threads share the module state, like the
+        seeded RandomMachine, that the stage actions rely on).
+
+        Args:
+            stages (list): Stage definitions.
+            state_file (str): JSON file recording parameters and hashes of every successful run.
+            max_workers (int): Stages run at the same time.
+            monitor (PerformanceMonitor, optional): Records the metrics of every stage that runs.
+        """
+        self.stages = {}
+        producers = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Stage '{stage.name}' is defined twice.")
+            for path in stage.outputs:
+                if path in producers:
+                    raise ValueError(f"'{path}' is written by both '{producers[path]}' and '{stage.name}'.")
+                producers[path] = stage.name
+            self.stages[stage.name] = stage
+        self.producers = producers
+        self.state_file = state_file
+        self.max_workers = max_workers
+        self.monitor = monitor
+        self.__state = None
+        self.__lock = threading.Lock()
+        self.__resource_locks = {stage.exclusive: threading.Lock() for stage in stages if stage.exclusive is not None}
+
+    def dependencies(self, name):
+        stage = self.stages[name]
+        return sorted({self.producers[path] for path in stage.sources if path in self.producers})
+
+    def _graph(self):
+        return {name: self.dependencies(name) for name in self.stages}
+
+    def order(self):
+        try:
+            return list(TopologicalSorter(self._graph()).static_order())
+        except CycleError as e:
+            raise ValueError(f"Stage dependencies contain a cycle: {e.args[1]}")
+
+    def resolve(self, targets):
+        """Expand target stage/group names to those stages plus everything upstream of them."""
+        selected = set()
+        for target in targets:
+            matches = [name for name, stage in self.stages.items() if name == target or stage.group == target]
+            if not matches:
+                raise ValueError(f"Unknown stage or group '{target}'.")
+            selected.update(matches)
+        pending = list(selected)
+        while pending:
+            for dependency in self.dependencies(pending.pop()):
+                if dependency not in selected:
+                    selected.add(dependency)
+                    pending.append(dependency)
+        return [name for name in self.order() if name in selected]
+
+    def _load_state(self):
+        if self.__state is None:
+            try:
+                with open(self.state_file, encoding="utf-8") as f:
+                    self.__state = json.load(f)
+            except FileNotFoundError:
+                self.__state = {"stages": {}, "files": {}}
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable pipeline state '{self.state_file}': {str(e)}")
+                self.__state = {"stages": {}, "files": {}}
+        return self.__state
+
+    def _save_state(self):
+        temporary_file = f"{self.state_file}.tmp"
+        with open(temporary_file, 'w', encoding="utf-8") as f:
+            json.dump(self.__state, f, indent=2, sort_keys=True)
+        os.replace(temporary_file, self.state_file)
+
+    def file_hash(self, path):
+        """Content hash of a file, reused from the state while its size and mtime are unchanged."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        files = self._load_state()["files"]
+        with self.__lock:
+            cached = files.get(path)
+        if cached is not None and cached["size"] == stat.st_size and cached["mtime_ns"] == stat.st_mtime_ns:
+            return cached["hash"]
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        with self.__lock:
+            files[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest.hexdigest()}
+        return digest.hexdigest()
+
+    def _params_key(self, stage):
+        return json.dumps(stage.params, sort_keys=True, default=str)
+
+    def _snapshot(self, stage):
+        return {
+            "params": self._params_key(stage),
+            "inputs": {path: self.file_hash(path) for path in stage.sources}
+        }
+
+    def is_up_to_date(self, name):
+        """Return (up to date, reason)."""
+        stage = self.stages[name]
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if missing:
+            return False, f"missing {missing}"
+        recorded = self._load_state()["stages"].get(name)
+        if recorded is None:
+            if stage.outputs and all(path not in self.producers and not os.path.exists(path) for path in stage.sources):
+                # Like make, an existing target without (available) prerequisites is up to date; adopt it as the baseline
+                with self.__lock:
+                    self._load_state()["stages"][name] = self._snapshot(stage)
+                return True, "outputs exist"
+            return False, "never run"
+        current = self._snapshot(stage)
+        if current["params"] != recorded["params"]:
+            return False, "parameters changed"
+        changed = [path for path, digest in current["inputs"].items() if recorded["inputs"].get(path) != digest]
+        if changed:
+            return False, f"inputs changed {changed}"
+        return True, "up to date"
+
+    def _run_stage(self, name):
+        stage = self.stages[name]
+        started_at = time.perf_counter()
+        measure = self.monitor.stage(name, group=stage.group) if self.monitor is not None else nullcontext()
+        with measure:
+            if stage.exclusive is not None:
+                with self.__resource_locks[stage.exclusive]:
+                    stage.action(**stage.params)
+            else:
+                stage.action(**stage.params)
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if missing:
+            raise RuntimeError(f"Stage '{name}' did not write {missing}.")
+        snapshot = self._snapshot(stage)
+        with self.__lock:
+            self._load_state()["stages"][name] = snapshot
+        return time.perf_counter() - started_at
+
+    def plan(self, targets, force=None):
+        """Return [(stage name, will run, reason)] in dependency order without running anything."""
+        force = set(force or [])
+        plan = []
+        rerun = set()
+        for name in self.resolve(targets):
+            if name in force or self.stages[name].group in force:
+                plan.append((name, True, "forced"))
+            elif any(dependency in rerun for dependency in self.dependencies(name)):
+                plan.append((name, True, "upstream stage runs"))
+            else:
+                up_to_date, reason = self.is_up_to_date(name)
+                plan.append((name, not up_to_date, reason))
+            if plan[-1][1]:
+                rerun.add(name)
+        return plan
+
+    def run(self, targets, force=None, dry_run=False):
+        """
+        Bring the targets up to date, running independent stages concurrently.
+
+        Returns:
+            dict: Stage name to 'ran', 'skipped' or 'failed'.
+        """
+        started_at = time.perf_counter()
+        plan = self.plan(targets, force)
+        for name, will_run, reason in plan:
+            print(f"{'RUN ' if will_run else 'SKIP'} {name} ({reason})")
+        results = {name: 'skipped' for name, will_run, _ in plan if not will_run}
+        if dry_run:
+            return results
+
+        to_run = {name for name, will_run, _ in plan if will_run}
+        graph = {name: [dependency for dependency in self.dependencies(name) if dependency in to_run] for name in to_run}
+        sorter = TopologicalSorter(graph)
+        sorter.prepare()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                running = {}
+                while sorter.is_active():
+                    for name in sorter.get_ready():
+                        if any(results.get(dependency) == 'failed' for dependency in graph[name]):
+                            print(f"Skipping stage '{name}': an upstream stage failed.")
+                            results[name] = 'failed'
+                            sorter.done(name)
+                            continue
+                        running[executor.submit(self._run_stage, name)] = name
+                    if not running:
+                        continue
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        name = running.pop(future)
+                        try:
+                            elapsed = future.result()
+                            results[name] = 'ran'
+                            print(f"Stage '{name}' finished in {elapsed:.2f}s.")
+                        except (Exception, SystemExit) as e:
+                            # SQLWriter and the sanitizer report their own errors and exit
+                            results[name] = 'failed'
+                            print(f"Stage '{name}' failed: {e!r}")
+                        sorter.done(name)
+        finally:
+            self._load_state()
+            self._save_state()
+
+        failed = [name for name, result in results.items() if result == 'failed']
+        print(f"Pipeline finished in {time.perf_counter() - started_at:.2f}s: {len(to_run) - len(failed)} ran, {len(results) - len(to_run)} skipped, {len(failed)} failed.")
+        return results
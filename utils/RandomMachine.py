@@ -1,21 +1,60 @@
-import random, csv
+import random, csv, zlib, os, io, mmap
+import numpy as np
 import pandas as pd
 from datetime import time
 
 class RandomMachine:
 
-    def __init__(self, ph_email_domains=None, gender_dict=None):
+    __time_strings = None  # Lookup table of every "HH:MM:SS", built on first use
+
+    def __init__(self, ph_email_domains=None, gender_dict=None, seed=None):
+        """
+        Initialize the random machine with an optional seed.
+
+        Args:
+            ph_email_domains (list, optional): Extra placeholder e-mail domains.
+            gender_dict (dict, optional): Gender to portrait folder mapping.
+            seed (int | numpy.random.SeedSequence, optional): Seed for the numpy Generator and the
+                derived random.Random. A fresh entropy seed is drawn when None; it is kept in `self.seed`
+                so the run can be reproduced.
+        """
         default_ph_email_domains = ["gmail.com", "instagram.com", "spotify.com"]
         default_gender_dict = { 'Female': 'women', 'Male': 'men' }
         self.__ph_email_domains = default_ph_email_domains + ph_email_domains if ph_email_domains is not None else default_ph_email_domains
         self.__gender_dict = gender_dict if gender_dict is not None else default_gender_dict
+        self.__seed_sequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.seed = self.__seed_sequence.entropy
+        self.rng = np.random.default_rng(self.__seed_sequence)
+        self.random = random.Random(int(self.rng.integers(0, 2**63)))
+
+    def spawn(self, stage):
+        """
+        Create an independent RandomMachine for a pipeline stage.
+
+        The child stream is keyed by the stage name rather than by spawn order, so stages
+        produce the same values whether they run serially or in parallel.
+
+        Args:
+            stage (str): Name of the pipeline stage.
+
+        Returns:
+            RandomMachine: A machine with its own Generator and random.Random.
+        """
+        stage_key = zlib.crc32(str(stage).encode("utf-8"))
+        child_sequence = np.random.SeedSequence(
+            entropy=self.__seed_sequence.entropy,
+            spawn_key=self.__seed_sequence.spawn_key + (stage_key,)
+        )
+        child = RandomMachine(gender_dict=self.__gender_dict, seed=child_sequence)
+        child.__ph_email_domains = self.__ph_email_domains
+        return child
 
     def get_random_nums(self, offset=0, pool_size=100, len=1, sorted=True, no_repeat=False):
         
         if no_repeat is True and len > pool_size:
             raise ValueError("Length cannot be greater than pool_size to ensure uniqueness")
         
-        random_numbers = [random.randint(0+offset, pool_size-1+offset) for _ in range(len)] if no_repeat is False else random.sample(range(offset, pool_size + offset), len)
+        random_numbers = [self.random.randint(0+offset, pool_size-1+offset) for _ in range(len)] if no_repeat is False else self.random.sample(range(offset, pool_size + offset), len)
         # print(random_numbers)
         if sorted is True:
             random_numbers.sort()
@@ -23,9 +62,9 @@ class RandomMachine:
     
     def get_random_time(self):
         # Generate random hours, minutes, seconds
-        hours = random.randint(0, 23)
-        minutes = random.randint(0, 59)
-        seconds = random.randint(0, 59)
+        hours = self.random.randint(0, 23)
+        minutes = self.random.randint(0, 59)
+        seconds = self.random.randint(0, 59)
 
         # Create a time object
         random_time = time(hours, minutes, seconds)
@@ -42,11 +81,90 @@ class RandomMachine:
         result = f"{name.lower().replace(' ', '_')}@{random_email_domain}"
         return result
     
-    def extract_csv_rows_pandas(self, csv_file, indices):
-        """Extract specific rows from a CSV file using pandas based on indices."""
+    def random_emails(self, names, unique=False):
+        """
+        Create one random e-mail address per name in a single vectorized pass.
+
+        Args:
+            names (list | pd.Series): Names used for the local part of the addresses.
+            unique (bool): If True, repeated addresses get a numeric suffix ("jane_doe_2@...").
+
+        Returns:
+            pd.Series: E-mail addresses aligned with `names`.
+        """
+        local_parts = pd.Series(names, dtype=object).reset_index(drop=True).astype(str).str.lower().str.replace(' ', '_', regex=False)
+        domains = np.asarray(self.__ph_email_domains, dtype=object)
+        domain_parts = pd.Series(domains[self.rng.integers(0, len(domains), size=len(local_parts))])
+        emails = local_parts + '@' + domain_parts
+
+        if unique:
+            # A suffixed address can clash with a natural one, so repeat until nothing is left over
+            while True:
+                occurrence = emails.groupby(emails, sort=False).cumcount()
+                repeated = occurrence > 0
+                if not repeated.any():
+                    break
+                local_parts[repeated] = local_parts[repeated] + '_' + (occurrence[repeated] + 1).astype(str)
+                emails[repeated] = local_parts[repeated] + '@' + domain_parts[repeated]
+        return emails
+
+    def random_times(self, n):
+        """Return n random "HH:MM:SS" strings as a numpy array."""
+        if RandomMachine.__time_strings is None:
+            seconds = np.arange(24 * 60 * 60)
+            RandomMachine.__time_strings = np.array(
+                [f"{s // 3600:02d}:{s // 60 % 60:02d}:{s % 60:02d}" for s in seconds],
+                dtype=object
+            )
+        return RandomMachine.__time_strings[self.rng.integers(0, 24 * 60 * 60, size=n)]
+
+    def portrait_urls(self, genders, pool_size=150):
+        """
+        Return one random randomuser.me portrait URL per gender.
+
+        Genders missing from the gender dictionary get a null URL.
+        """
+        folders = pd.Series(genders, dtype=object).reset_index(drop=True).map(self.__gender_dict)
+        numbers = pd.Series(self.rng.integers(0, pool_size, size=len(folders))).astype(str)
+        urls = "https://randomuser.me/api/portraits/" + folders + "/" + numbers + ".jpg"
+        return urls.where(folders.notna(), None)
+
+    def synthesize_users(self, names, genders, size=None, unique_emails=False, portrait_pool_size=150):
+        """
+        Build a users table (name, email, profile_pic) with whole-column operations.
+
+        Args:
+            names (list | pd.Series): Names of the users, or the pool to draw from when `size` is set.
+            genders (list | pd.Series): Genders aligned with `names`.
+            size (int, optional): Number of users to draw (with replacement) from the name/gender pool.
+            unique_emails (bool): Guarantee that no two users share an e-mail address.
+            portrait_pool_size (int): Number of portraits available per gender.
+
+        Returns:
+            pd.DataFrame: The synthesized users.
+        """
+        names = pd.Series(names, dtype=object).reset_index(drop=True)
+        genders = pd.Series(genders, dtype=object).reset_index(drop=True)
+        if len(names) != len(genders):
+            raise ValueError("names and genders must have the same length")
+
+        if size is not None:
+            picks = self.rng.integers(0, len(names), size=size)
+            names = names.iloc[picks].reset_index(drop=True)
+            genders = genders.iloc[picks].reset_index(drop=True)
+
+        return pd.DataFrame({
+            "name": names,
+            "email": self.random_emails(names, unique=unique_emails),
+            "profile_pic": self.portrait_urls(genders, pool_size=portrait_pool_size)
+        })
+
+    def extract_csv_rows_pandas(self, csv_file, indices, dtype=None):
+        """Extract specific rows from a CSV file using pandas based on indices (dtype is passed to read_csv)."""
         try:
             # Read only the specified rows using pandas
-            df = pd.read_csv(csv_file, skiprows=lambda x: x not in indices and x != 0, nrows=len(indices))
+            indices_set = set(indices)  # For O(1) lookup
+            df = pd.read_csv(csv_file, skiprows=lambda x: x not in indices_set and x != 0, nrows=len(indices), dtype=dtype)
             # print('df',df)
             # print('df.index',df.index)
             # Reindex to match the provided indices (may need adjustment based on CSV structure)
@@ -73,4 +191,80 @@ class RandomMachine:
         except FileNotFoundError:
             raise FileNotFoundError(f"CSV file {csv_file} not found")
         except Exception as e:
-            raise Exception(f"Error processing CSV: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error processing CSV: {str(e)}")
+
+    def build_csv_row_index(self, csv_file, chunk_size=64 * 1024 * 1024):
+        """
+        Return the byte offset of every line of a CSV file (line 0 is the header).
+
+        The offsets are cached next to the CSV as `<csv_file>.rowidx.npz` together with the file's
+        size and mtime, and rebuilt only when the CSV changes. The index assumes one record per line,
+        i.e. no quoted fields spanning several lines.
+        """
+        index_file = f"{csv_file}.rowidx.npz"
+        try:
+            stat = os.stat(csv_file)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"CSV file {csv_file} not found")
+
+        if os.path.exists(index_file):
+            try:
+                with np.load(index_file) as cached:
+                    if int(cached["size"]) == stat.st_size and int(cached["mtime_ns"]) == stat.st_mtime_ns:
+                        return cached["offsets"]
+            except Exception as e:
+                print(f"Ignoring unreadable row index '{index_file}': {str(e)}")
+
+        line_starts = [np.zeros(1, dtype=np.int64)]
+        if stat.st_size > 0:
+            data = np.memmap(csv_file, dtype=np.uint8, mode='r')
+            # Scan in chunks so the newline mask never holds the whole file in memory
+            for start in range(0, stat.st_size, chunk_size):
+                newlines = np.flatnonzero(data[start:start + chunk_size] == ord('\n'))
+                line_starts.append(newlines.astype(np.int64) + start + 1)
+            del data
+        offsets = np.concatenate(line_starts)
+        # A trailing newline does not start another line
+        offsets = offsets[offsets < stat.st_size] if stat.st_size > 0 else offsets
+
+        try:
+            np.savez(index_file, offsets=offsets, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        except OSError as e:
+            print(f"Could not cache row index at '{index_file}': {str(e)}")
+        return offsets
+
+    def extract_csv_rows_indexed(self, csv_file, indices, dtype=None, schema=None, categorical_ratio=0.5):
+        """
+        Extract specific rows from a CSV file by seeking straight to them through the row index.
+
+        Takes the same line numbers as extract_csv_rows_pandas (0 is the header) and returns the
+        rows in file order, so sampling k rows costs O(k) once the index is built. dtype is passed to
+        read_csv. With a schema (TableSchema) only its columns are read, INT columns in the smallest
+        fitting dtype and text columns whose distinct values are at most categorical_ratio of the
+        rows (e.g. a handful of genders) as categoricals.
+        Raises ValueError for an empty file, which has no header to read the rows with.
+        """
+        # mmap cannot map an empty file, and without a header there are no columns to return
+        if os.path.exists(csv_file) and os.path.getsize(csv_file) == 0:
+            raise ValueError(f"CSV file {csv_file} is empty; it needs at least a header row.")
+        try:
+            offsets = self.build_csv_row_index(csv_file)
+            line_ends = np.append(offsets[1:], os.path.getsize(csv_file))
+            line_numbers = np.unique(np.asarray(indices, dtype=np.int64))
+            line_numbers = line_numbers[(line_numbers > 0) & (line_numbers < len(offsets))]
+
+            with open(csv_file, 'rb') as file:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    lines = [mapped[offsets[0]:line_ends[0]].rstrip(b'\r\n')]
+                    lines.extend(mapped[offsets[i]:line_ends[i]].rstrip(b'\r\n') for i in line_numbers)
+
+            rows = io.BytesIO(b'\n'.join(lines) + b'\n')
+            if schema is None:
+                return pd.read_csv(rows, dtype=dtype)
+            columns = [column.name for column in schema.data_columns()]
+            df = schema.cast_frame(pd.read_csv(rows, usecols=columns, dtype=schema.csv_dtypes(columns=columns)), compact=True)
+            return schema.categorize_frame(df, categorical_ratio) if categorical_ratio is not None else df
+        except FileNotFoundError:
+            raise FileNotFoundError(f"CSV file {csv_file} not found")
+        except Exception as e:
+            raise Exception(f"Error processing CSV: {str(e)}")
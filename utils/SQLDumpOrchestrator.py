@@ -0,0 +1,137 @@
+import os, gzip, json, shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from graphlib import TopologicalSorter, CycleError
+
+class SQLDumpOrchestrator:
+
+    SESSION_PROLOGUE = (
+        "SET NAMES utf8mb4;\n"
+        "SET @OLD_FOREIGN_KEY_CHECKS=@@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS=0;\n"
+        "SET @OLD_UNIQUE_CHECKS=@@UNIQUE_CHECKS, UNIQUE_CHECKS=0;\n"
+    )
+    SESSION_EPILOGUE = (
+        "SET UNIQUE_CHECKS=@OLD_UNIQUE_CHECKS;\n"
+        "SET FOREIGN_KEY_CHECKS=@OLD_FOREIGN_KEY_CHECKS;\n"
+    )
+
+    def __init__(self, tables, max_workers=None):
+        """
+        Generate every table's SQL in parallel and assemble it in foreign key order.
+
+        Args:
+            tables (dict): Table name to {"writer": callable, "output": path, "depends_on": [table names]}.
+                The writer must be a picklable top-level function that writes `output`; `output` is
+                either a .sql file (optionally .gz) or the .manifest.json of a sharded SQLWriter.
+            max_workers (int, optional): Size of the process pool (defaults to the CPU count).
+        """
+        for name, table in tables.items():
+            unknown = [dependency for dependency in table.get("depends_on", []) if dependency not in tables]
+            if unknown:
+                raise ValueError(f"Table '{name}' depends on unknown table(s) {unknown}.")
+        self.tables = tables
+        self.max_workers = max_workers
+
+    def _sorter(self):
+        return TopologicalSorter({name: table.get("depends_on", []) for name, table in self.tables.items()})
+
+    def load_order(self):
+        """Return the table names so that every table comes after the tables it references."""
+        try:
+            return list(self._sorter().static_order())
+        except CycleError as e:
+            raise ValueError(f"Foreign key dependencies contain a cycle: {e.args[1]}")
+
+    def load_stages(self):
+        """Group the tables into stages whose members only depend on earlier stages and can load concurrently."""
+        sorter = self._sorter()
+        sorter.prepare()
+        stages = []
+        while sorter.is_active():
+            ready = sorted(sorter.get_ready())
+            stages.append(ready)
+            sorter.done(*ready)
+        return stages
+
+    def generate(self, tables=None):
+        """
+        Run the writers of the given tables (all by default) in a process pool.
+
+        Generation has no ordering constraints; only loading the result has to follow foreign keys.
+        """
+        names = tables if tables is not None else list(self.tables.keys())
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.tables[name]["writer"]): name for name in names}
+            failed = []
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except (Exception, SystemExit) as e:
+                    # SQLWriter reports its own errors and exits; surface which table it was
+                    failed.append(name)
+                    print(f"Generating SQL for table '{name}' failed: {e!r}")
+        if failed:
+            raise RuntimeError(f"SQL generation failed for table(s) {failed}.")
+        print(f"Generated SQL for {len(names)} tables.")
+
+    def _table_files(self, name):
+        """Return the files holding a table's SQL, in load order."""
+        output = self.tables[name]["output"]
+        if not output.endswith('.manifest.json'):
+            return [output]
+        with open(output, encoding="utf-8") as f:
+            manifest = json.load(f)
+        directory = os.path.dirname(output)
+        files = [manifest["schema"]] + [shard["file"] for shard in manifest["shards"]]
+        if manifest.get("indexes") is not None:
+            # Deferred UNIQUE/FOREIGN KEY constraints go after the last shard
+            files.append(manifest["indexes"])
+        return [os.path.join(directory, file) for file in files]
+
+    def _open_text(self, path, mode):
+        if path.endswith('.gz'):
+            return gzip.open(path, f'{mode}t', encoding="utf-8")
+        if path.endswith('.zst'):
+            import zstandard
+            return zstandard.open(path, f'{mode}t', encoding="utf-8")
+        return open(path, mode, encoding="utf-8")
+
+    def write_dump(self, dump_file):
+        """Concatenate every table's SQL in load order, with FK and unique checks disabled around it."""
+        output_dir = os.path.dirname(dump_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with self._open_text(dump_file, 'w') as dump:
+            dump.write(SQLDumpOrchestrator.SESSION_PROLOGUE)
+            for name in self.load_order():
+                dump.write(f"\n-- Table: {name}\n")
+                for path in self._table_files(name):
+                    with self._open_text(path, 'r') as f:
+                        shutil.copyfileobj(f, dump, 1024 * 1024)
+            dump.write("\n")
+            dump.write(SQLDumpOrchestrator.SESSION_EPILOGUE)
+        print(f"SQL dump '{dump_file}' generated successfully.")
+
+    def write_manifest(self, manifest_file):
+        """Write a loader manifest: session settings plus stages of tables that may load concurrently."""
+        manifest_dir = os.path.dirname(manifest_file)
+        stages = [[{
+            "table": name,
+            "files": [os.path.relpath(path, manifest_dir or '.') for path in self._table_files(name)],
+            "depends_on": self.tables[name].get("depends_on", [])
+        } for name in stage] for stage in self.load_stages()]
+        with open(manifest_file, 'w', encoding="utf-8") as f:
+            json.dump({
+                "prologue": SQLDumpOrchestrator.SESSION_PROLOGUE,
+                "epilogue": SQLDumpOrchestrator.SESSION_EPILOGUE,
+                "stages": stages
+            }, f, indent=2)
+        print(f"Loader manifest '{manifest_file}' generated successfully.")
+
+    def build(self, dump_file=None, manifest_file=None):
+        """Generate every table in parallel, then write the combined dump and/or loader manifest."""
+        self.generate()
+        if dump_file is not None:
+            self.write_dump(dump_file)
+        if manifest_file is not None:
+            self.write_manifest(manifest_file)
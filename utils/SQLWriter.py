@@ -1,9 +1,18 @@
 import pandas as pd
 import numpy as np
-import os, pymysql
+import os, re, time, gzip, json
+from utils.CSVDataRowsSanitizer import CSVDataRowsSanitizer
+from utils.PerformanceMonitor import PerformanceMonitor
+from utils.ParsedCSVCache import ParsedCSVCache
+from utils.SchemaRegistry import TableSchema
 
 class SQLWriter:
 
+    OUTPUT_FORMATS = ('insert', 'load_data')
+    COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+    # LOAD DATA escapes (FIELDS ESCAPED BY '\\'), NULL itself is written as \N
+    __tsv_escape_table = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
     def __init__(
         self,
         table_name = 'my_table',
@@ -11,21 +20,123 @@ class SQLWriter:
         input_csv_file = 'data.csv',
         output_sql_file = 'output.sql',
         drop_columns = None,
-        data_transformer = None
-    ):  
+        data_transformer = None,
+        trim_to_schema = False,
+        byte_limits = None,
+        extended_insert = False,
+        batch_rows = 1000,
+        max_batch_bytes = 1024 * 1024,
+        output_format = 'insert',
+        data_file = None,
+        chunksize = None,
+        compression = None,
+        commit_every = None,
+        shard_rows = None,
+        schema = None,
+        deferred_indexes = False,
+        hash_manifest = None,
+        delta = False,
+        key_column = None,
+        store = None,
+        compact_dtypes = True,
+        categorical_ratio = None,
+        csv_engine = None
+    ):
         self.csv_file = input_csv_file  # Read CSV file
         self.sql_file = output_sql_file # Define output SQL file
+        # A TableSchema supplies the table name, CREATE TABLE, VARCHAR limits and CSV dtypes, and
+        # every input frame is validated against it. With deferred_indexes the table is created
+        # without its UNIQUE and FOREIGN KEY constraints, which are added in one ALTER TABLE after
+        # the rows are loaded instead of being maintained row by row.
+        self.schema = schema
+        self.deferred_indexes = deferred_indexes
+        if deferred_indexes and schema is None:
+            raise ValueError("deferred_indexes requires a schema.")
+        if schema is not None:
+            table_name = schema.name
+            create_table_statement = schema.create_table_sql(deferred_indexes=deferred_indexes)
         self.table_name = table_name
         self.create_table_statement = create_table_statement
         self.drop_columns = drop_columns
         self.data_transformer = data_transformer
+        self.trim_to_schema = trim_to_schema # Trim values to the VARCHAR limits of create_table_statement
+        # UTF-8 byte limits applied with trim_to_schema; with a utf8mb3 schema, 4-byte characters are replaced too
+        self.byte_limits = byte_limits
+        self.max_char_bytes = schema.max_char_bytes() if schema is not None else None
+        # Extended-insert mode groups rows into multi-row INSERT statements. A batch is closed at
+        # batch_rows rows or before it grows past max_batch_bytes, which must stay below the server's
+        # max_allowed_packet.
+        self.extended_insert = extended_insert
+        self.batch_rows = batch_rows
+        self.max_batch_bytes = max_batch_bytes
+        # 'insert' writes INSERT statements; 'load_data' writes a TSV data file plus a .sql file
+        # holding CREATE TABLE and a LOAD DATA LOCAL INFILE statement for it
+        if output_format not in SQLWriter.OUTPUT_FORMATS:
+            raise ValueError(f"output_format must be one of {SQLWriter.OUTPUT_FORMATS}.")
+        self.output_format = output_format
+        self.data_file = data_file if data_file is not None else f"{os.path.splitext(output_sql_file)[0]}.tsv"
+        # Streaming mode reads and writes chunksize rows at a time; compression ('gzip', 'zstd' or
+        # 'infer' from the file suffix) is applied to the .sql output on the fly
+        self.chunksize = chunksize
+        if compression == 'infer':
+            compression = next((name for name, suffix in SQLWriter.COMPRESSION_SUFFIXES.items() if output_sql_file.endswith(suffix)), None)
+        if compression is not None and compression not in SQLWriter.COMPRESSION_SUFFIXES:
+            raise ValueError(f"compression must be one of {list(SQLWriter.COMPRESSION_SUFFIXES)}, 'infer' or None.")
+        self.compression = compression
+        if compression is not None and not self.sql_file.endswith(SQLWriter.COMPRESSION_SUFFIXES[compression]):
+            self.sql_file = f"{self.sql_file}{SQLWriter.COMPRESSION_SUFFIXES[compression]}"
+        # INSERT output can commit every commit_every rows and be split into numbered shard files of
+        # shard_rows rows, listed in <name>.manifest.json next to a <name>.schema.sql holding CREATE TABLE
+        if output_format == 'load_data' and (commit_every is not None or shard_rows is not None):
+            raise ValueError("commit_every and shard_rows only apply to output_format='insert'.")
+        self.commit_every = commit_every
+        self.shard_rows = shard_rows
+        # hash_manifest (.npz) records a content hash per row key after every write_sql run. With
+        # delta=True and a manifest from a previous run, only the difference is written to
+        # <name>.delta.sql: DELETE for keys that are gone and INSERT ... ON DUPLICATE KEY UPDATE for
+        # new or changed rows. The key is key_column when given, otherwise the positional
+        # AUTO_INCREMENT id the full load assigned (1 for the first kept row, 2 for the next, ...).
+        # Positional keys only follow rows that were edited or appended: once a row is removed, every
+        # later row would be rewritten under the id of its predecessor and rows of other tables
+        # referencing those ids would silently point at different rows, so no delta is written then.
+        if delta and hash_manifest is None:
+            raise ValueError("delta requires a hash_manifest.")
+        if hash_manifest is not None and (output_format != 'insert' or shard_rows is not None):
+            raise ValueError("hash_manifest only applies to unsharded output_format='insert'.")
+        self.hash_manifest = hash_manifest
+        self.delta = delta
+        self.key_column = key_column
+        # A DatasetStore holding input_csv_file supplies the rows from memory, so a frame an earlier
+        # stage produced is not written out and parsed again
+        self.store = store if store is not None and input_csv_file in store else None
+        # With a schema, INT columns are loaded in the smallest fitting (unsigned for ids) integer dtype
+        # and, with categorical_ratio, text columns repeating that much are held as categoricals.
+        # csv_engine ('pyarrow', 'c' or 'auto') picks the parser of unchunked reads.
+        self.compact_dtypes = compact_dtypes
+        self.categorical_ratio = categorical_ratio
+        self.csv_engine = csv_engine
     
     def _quote_escape(self, value):
         return str(value).replace("'", "''")
     
+    @staticmethod
+    def _string_escaper():
+        # pymysql is loaded on the first escaped value rather than when SQLWriter is imported
+        from pymysql.converters import escape_string
+        return escape_string
+
     def escape_value(self, value):
-        return pymysql.converters.escape_string(value)
+        return SQLWriter._string_escaper()(value)
     
+    def get_column_limits(self):
+        """Return {column: n} for every VARCHAR(n)/CHAR(n) column declared in the schema or create_table_statement."""
+        if self.schema is not None:
+            return self.schema.varchar_limits()
+        if self.create_table_statement is None:
+            return {}
+        matches = re.findall(r'^\s*(\w+)\s+(?:VAR)?CHAR\((\d+)\)', self.create_table_statement, flags=re.IGNORECASE | re.MULTILINE)
+        return {column: int(length) for column, length in matches}
+
     def data_transform(self, df):
         try:
             df = self.data_transformer(df)
@@ -36,24 +147,109 @@ class SQLWriter:
             print(f"Error during data transformation: {str(e)}")
             exit(1)
 
+    def _prepare_input(self, df):
+        if self.schema is not None:
+            df = self.schema.cast_frame(df, compact=self.compact_dtypes)
+
+        # Drop columns if necessary
+        if self.drop_columns is not None:
+            for col in self.drop_columns:
+                df = df.drop(col, axis=1)
+
+        if self.data_transformer is not None:
+            df = self.data_transform(df)
+
+        if self.trim_to_schema:
+            trimmed_columns = CSVDataRowsSanitizer.trim_frame_to_limits(df, self.get_column_limits(), self.byte_limits, self.max_char_bytes)
+            if trimmed_columns:
+                print(f"Trimmed column(s) {trimmed_columns} to the limits of table '{self.table_name}'.")
+
+        if self.schema is not None and self.categorical_ratio is not None:
+            # After the transformer and trimming, which may assign values that are not categories yet
+            df = self.schema.categorize_frame(df, self.categorical_ratio)
+
+        if self.schema is not None:
+            problems = self.schema.validate(df)
+            if problems:
+                raise ValueError(f"Input does not match table '{self.table_name}': {' '.join(problems)}")
+
+        return df
+
+    def _csv_dtypes(self):
+        return self.schema.csv_dtypes() if self.schema is not None else None
+
+    def _csv_read_options(self):
+        if self.schema is not None:
+            return self.schema.csv_read_options(engine=self.csv_engine)
+        engine = TableSchema.resolve_csv_engine(self.csv_engine)
+        return {"engine": engine} if engine is not None else {}
+
+    def index_statements(self, backend='mysql'):
+        """
+        Return the statements that add the constraints left out by deferred_indexes.
+
+        SQLite cannot add constraints to an existing table, so it gets CREATE UNIQUE INDEX
+        statements and no foreign keys.
+        """
+        if not self.deferred_indexes:
+            return []
+        if backend == 'sqlite':
+            return self.schema.unique_index_sql()
+        statement = self.schema.secondary_index_sql()
+        return [statement] if statement is not None else []
+
     def get_input(self):
 
         try:
-            df = pd.read_csv(self.csv_file)
+            if self.store is not None:
+                df = self.store.get(self.csv_file)
+            else:
+                df = ParsedCSVCache.shared().read_csv(self.csv_file, **self._csv_read_options())
+                PerformanceMonitor.count(rows_in=len(df), bytes_read=PerformanceMonitor.file_bytes(self.csv_file))
             
             if df.empty:
                 raise ValueError("The CSV file is empty.")
 
-            # Drop columns if necessary
-            if self.drop_columns is not None:
-                for col in self.drop_columns:
-                    df = df.drop(col, axis=1)
+            return self._prepare_input(df)
+        
+        except FileNotFoundError:
+            print(f"Error: The file '{self.csv_file}' was not found.")
+            exit(1)
+        except pd.errors.ParserError:
+            print(f"Error: The file '{self.csv_file}' is not a valid CSV or is corrupted.")
+            exit(1)
+        except Exception as e:
+            print(f"Error reading CSV file: {str(e)}")
+            exit(1)
 
-            if self.data_transformer is not None:
-                df = self.data_transform(df)
+    def iter_input(self):
+        """
+        Yield the input as prepared DataFrames of at most chunksize rows (one frame if chunksize is None).
+
+        drop_columns, data_transformer and trimming are applied to each chunk, so a transformer used in
+        streaming mode must only look at the rows it is given.
+        """
+        if self.chunksize is None:
+            yield self.get_input()
+            return
+
+        if self.store is not None:
+            yield from self._iter_stored_input()
+            return
+
+        try:
+            empty = True
+            PerformanceMonitor.count(bytes_read=PerformanceMonitor.file_bytes(self.csv_file))
+            with pd.read_csv(self.csv_file, chunksize=self.chunksize, dtype=self._csv_dtypes()) as reader:
+                for chunk in reader:
+                    PerformanceMonitor.count(rows_in=len(chunk))
+                    if chunk.empty:
+                        continue
+                    empty = False
+                    yield self._prepare_input(chunk)
+            if empty:
+                raise ValueError("The CSV file is empty.")
 
-            return df
-        
         except FileNotFoundError:
             print(f"Error: The file '{self.csv_file}' was not found.")
             exit(1)
@@ -64,6 +260,161 @@ class SQLWriter:
             print(f"Error reading CSV file: {str(e)}")
             exit(1)
 
+    def _iter_stored_input(self):
+        df = self.store.get(self.csv_file, copy=False)
+        PerformanceMonitor.count(rows_in=len(df))
+        if df.empty:
+            print("Error reading CSV file: The CSV file is empty.")
+            exit(1)
+        # Every slice is copied before it is prepared, which leaves the stored frame untouched
+        for start in range(0, len(df), self.chunksize):
+            yield self._prepare_input(df.iloc[start:start + self.chunksize].copy())
+
+    def _open_output(self, path):
+        """Open a text file for writing, compressing on the fly when compression is set."""
+        if self.compression == 'gzip':
+            return gzip.open(path, 'wt', encoding="utf-8", compresslevel=6)
+        if self.compression == 'zstd':
+            try:
+                import zstandard
+            except ImportError:
+                raise ImportError("zstd compression requires the 'zstandard' package.")
+            return zstandard.open(path, 'wt', encoding="utf-8", cctx=zstandard.ZstdCompressor(level=3))
+        return open(path, 'w', encoding="utf-8")
+
+    def escape_tsv_value(self, value):
+        if isinstance(value, str):
+            return value.translate(SQLWriter.__tsv_escape_table)
+        if isinstance(value, (bool, np.bool_)):
+            return '1' if value else '0'
+        return str(value)
+
+    def _format_tsv_rows(self, df):
+        """
+        Format every row as one LOAD DATA line, column by column.
+
+        Returns:
+            tuple: (lines, columns_with_nulls). Rows whose values are all null are dropped, as in INSERT mode.
+        """
+        values = df.to_numpy()
+        present = ~pd.isna(values)
+        lines = None
+        for j in range(values.shape[1]):
+            column_values = np.full(len(df), '\\N', dtype=object)
+            formatted_items = np.empty(int(present[:, j].sum()), dtype=object)
+            formatted_items[:] = list(map(self.escape_tsv_value, values[present[:, j], j].tolist()))
+            column_values[present[:, j]] = formatted_items
+            lines = column_values if lines is None else lines + '\t' + column_values
+
+        kept_rows = present.any(axis=1)
+        for index in df.index[~kept_rows]:
+            print(f"Skipping row {index}: All values are null")
+        columns_with_nulls = [column for column, column_present in zip(df.columns, present[kept_rows].all(axis=0)) if not column_present]
+        return lines[kept_rows] if lines is not None else np.empty(0, dtype=object), columns_with_nulls
+
+    def _load_data_statement(self, columns, columns_with_nulls):
+        """
+        Build the LOAD DATA statement for the TSV file.
+
+        Null fields of a column go through a user variable and fall back to the column default,
+        which is what omitting the column from an INSERT did.
+        """
+        column_list = ', '.join([f"@{column}" if column in columns_with_nulls else column for column in columns])
+        statement = (
+            f"LOAD DATA LOCAL INFILE '{self.escape_value(self.data_file)}'\n"
+            f"INTO TABLE {self.table_name}\n"
+            "CHARACTER SET utf8mb4\n"
+            "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'\n"
+            "LINES TERMINATED BY '\\n'\n"
+            f"({column_list})"
+        )
+        if columns_with_nulls:
+            assignments = ',\n    '.join([f"{column} = COALESCE(@{column}, DEFAULT({column}))" for column in columns_with_nulls])
+            statement += f"\nSET {assignments}"
+        return statement + ';\n'
+
+    def _write_load_data(self, block_rows=10000):
+        data_dir = os.path.dirname(self.data_file)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+
+        columns = None
+        columns_with_nulls = set()
+        row_count = 0
+        # LOAD DATA cannot read compressed files, so the TSV is always written as plain text
+        with open(self.data_file, 'w', encoding="utf-8", newline='') as f:
+            for df in self.iter_input():
+                lines, chunk_columns_with_nulls = self._format_tsv_rows(df)
+                columns = df.columns.tolist() if columns is None else columns
+                columns_with_nulls.update(chunk_columns_with_nulls)
+                for start in range(0, len(lines), block_rows):
+                    f.write(''.join(lines[start:start + block_rows] + '\n'))
+                row_count += len(lines)
+
+        with self._open_output(self.sql_file) as f:
+            f.write('START TRANSACTION;\n')
+            if self.create_table_statement is not None:
+                f.write(self.create_table_statement)
+                f.write('\n')
+            f.write(self._load_data_statement(columns, [column for column in columns if column in columns_with_nulls]))
+            f.write('COMMIT;\n')
+            for statement in self.index_statements():
+                f.write(statement)
+        return row_count
+
+    def _iter_column_groups(self, df):
+        """
+        Yield (non-null columns, value tuples) for consecutive rows sharing the same non-null columns.
+
+        Values are plain Python objects so database drivers can bind them directly.
+        """
+        present = df.notna().to_numpy()
+        column_values = [df[column].tolist() for column in df.columns]
+        _, row_patterns = np.unique(present, axis=0, return_inverse=True)
+        row_patterns = row_patterns.reshape(-1)
+        run_starts = np.flatnonzero(np.diff(row_patterns, prepend=-1) != 0)
+        run_ends = np.append(run_starts[1:], len(df))
+
+        for run_start, run_end in zip(run_starts, run_ends):
+            column_positions = np.flatnonzero(present[run_start])
+            if len(column_positions) == 0:
+                for index in df.index[run_start:run_end]:
+                    print(f"Skipping row {index}: All values are null")
+                continue
+            columns = [df.columns[position] for position in column_positions]
+            rows = list(zip(*[column_values[position][run_start:run_end] for position in column_positions]))
+            yield columns, rows
+
+    def write_to_database(self, sink):
+        """
+        Load the table straight into a database instead of writing a .sql file.
+
+        Args:
+            sink (DatabaseSink): Pooled connection sink to stream the rows into.
+
+        Returns:
+            int: Number of rows inserted.
+        """
+        try:
+            started_at = time.perf_counter()
+
+            if self.create_table_statement is not None:
+                sink.execute(self.create_table_statement)
+            row_count = 0
+            for df in self.iter_input():
+                row_count += sink.insert_rows(self.table_name, self._iter_column_groups(df))
+            for statement in self.index_statements(sink.backend):
+                sink.execute(statement)
+
+            elapsed = time.perf_counter() - started_at
+            PerformanceMonitor.count(rows_out=row_count)
+            print(f"Table '{self.table_name}' loaded successfully ({row_count} rows, {row_count / elapsed if elapsed > 0 else 0:.0f} rows/s).")
+            return row_count
+
+        except Exception as e:
+            print(f"Error loading table '{self.table_name}' into the database: {str(e)}")
+            exit(1)
+
     def _ensure_output_destination_existance(self):
         output_dir = os.path.dirname(self.sql_file)
         if output_dir:  # Check if there's a directory path (not empty)
@@ -76,51 +427,457 @@ class SQLWriter:
                 print(f"Error creating directory '{output_dir}': {str(e)}")
                 exit(1)
     
+    def _format_rows(self, df):
+        """
+        Format every row's non-null values as SQL with whole-column operations.
+
+        The output matches the former per-row iterrows formatter byte for byte: values come from
+        df.to_numpy() (the same row upcasting iterrows applied), strings are escaped and quoted,
+        everything else goes through str().
+
+        Returns:
+            tuple: (row_values, row_patterns, pattern_columns) where row_values holds the
+            "v1, v2, ..." text of each kept row, row_patterns the index of its non-null column set
+            in pattern_columns. Rows whose values are all null are dropped.
+        """
+        values = df.to_numpy()
+        present = ~pd.isna(values)
+        formatted = np.empty(values.shape, dtype=object)
+        escape = self._string_escaper()
+
+        for j in range(values.shape[1]):
+            column_present = present[:, j]
+            items = values[column_present, j].tolist()
+            if values.dtype.kind != 'O':
+                formatted_items = list(map(str, items))
+            elif pd.api.types.infer_dtype(items, skipna=False) == 'string':
+                # Escape and quote the whole column at once
+                formatted_items = np.array(list(map(escape, items)), dtype=object)
+                formatted_items = ("'" + formatted_items + "'") if len(items) else formatted_items
+            else:
+                formatted_items = [f"'{escape(value)}'" if isinstance(value, str) else str(value) for value in items]
+            column_values = np.empty(len(items), dtype=object)
+            column_values[:] = formatted_items
+            formatted[column_present, j] = column_values
+
+        # Rows sharing a non-null column set are joined together
+        patterns, row_patterns = np.unique(present, axis=0, return_inverse=True)
+        row_patterns = row_patterns.reshape(-1)
+        row_values = np.empty(len(df), dtype=object)
+        pattern_columns = []
+        for pattern_index, pattern in enumerate(patterns):
+            rows = np.flatnonzero(row_patterns == pattern_index)
+            column_positions = np.flatnonzero(pattern)
+            pattern_columns.append(tuple(df.columns[column_positions].tolist()))
+            if len(column_positions) == 0:
+                for index in df.index[rows]:
+                    print(f"Skipping row {index}: All values are null")
+                continue
+            joined = formatted[rows, column_positions[0]]
+            for position in column_positions[1:]:
+                joined = joined + ', ' + formatted[rows, position]
+            row_values[rows] = joined
+
+        kept_rows = present.any(axis=1)
+        return row_values[kept_rows], row_patterns[kept_rows], pattern_columns
+
+    def _insert_prefix(self, columns):
+        return f"INSERT INTO {self.table_name} ({', '.join(columns)}) VALUES "
+
+    def _insert_statements(self, row_values, row_patterns, pattern_columns, block_rows=10000, suffixes=None):
+        """
+        Yield (statements, rows per statement) blocks with one INSERT statement per row.
+
+        suffixes optionally holds per-pattern text to put before the closing ';' (e.g. ON DUPLICATE KEY UPDATE).
+        """
+        prefixes = np.array([self._insert_prefix(columns) + '(' for columns in pattern_columns], dtype=object)
+        endings = np.array([f"){suffix};\n" for suffix in suffixes] if suffixes is not None else [');\n'] * len(pattern_columns), dtype=object)
+        for start in range(0, len(row_values), block_rows):
+            end = start + block_rows
+            statements = prefixes[row_patterns[start:end]] + row_values[start:end] + endings[row_patterns[start:end]]
+            yield statements, np.ones(len(statements), dtype=np.int64)
+
+    def _extended_insert_statements(self, row_values, row_patterns, pattern_columns, suffixes=None):
+        """
+        Yield (statements, rows per statement) blocks of multi-row INSERT statements.
+
+        Only consecutive rows sharing the same non-null columns are batched together, so rows keep
+        their order and AUTO_INCREMENT ids stay the same as with one statement per row.
+        """
+        if len(row_values) == 0:
+            return
+        row_tuples = '(' + row_values + ')'
+        # Encoded size of each tuple plus its separating comma
+        row_bytes = pd.Series(row_tuples).str.encode('utf-8').str.len().to_numpy() + 1
+        cumulative_bytes = np.concatenate([[0], np.cumsum(row_bytes)])
+        run_starts = np.flatnonzero(np.diff(row_patterns, prepend=-1) != 0)
+        run_ends = np.append(run_starts[1:], len(row_values))
+
+        for run_start, run_end in zip(run_starts, run_ends):
+            prefix = self._insert_prefix(pattern_columns[row_patterns[run_start]])
+            ending = (suffixes[row_patterns[run_start]] if suffixes is not None else '') + ';\n'
+            prefix_bytes = len((prefix + ending).encode('utf-8'))
+            statements = []
+            row_counts = []
+            start = run_start
+            while start < run_end:
+                end = min(start + self.batch_rows, run_end)
+                if self.max_batch_bytes is not None:
+                    budget = cumulative_bytes[start] + self.max_batch_bytes - prefix_bytes
+                    # Largest end whose batch fits the budget, but always at least one row
+                    end = min(end, max(start + 1, int(np.searchsorted(cumulative_bytes, budget, side='right')) - 1))
+                statements.append(prefix + ','.join(row_tuples[start:end]) + ending)
+                row_counts.append(end - start)
+                start = end
+            yield np.array(statements, dtype=object), np.array(row_counts, dtype=np.int64)
+
+    def _primary_key(self):
+        return self.schema.primary_key if self.schema is not None and self.schema.primary_key is not None else 'id'
+
+    def _row_keys(self, df, position):
+        """
+        Return (kept rows mask, keys of the kept rows) for a prepared frame.
+
+        Positional keys continue from `position`, the number of rows kept in earlier chunks.
+        """
+        kept_rows = df.notna().to_numpy().any(axis=1)
+        if self.key_column is not None:
+            keys = df[self.key_column].to_numpy()[kept_rows]
+            if pd.isna(keys).any():
+                raise ValueError(f"Key column '{self.key_column}' has null values.")
+            return kept_rows, keys.astype(np.int64)
+        return kept_rows, np.arange(position + 1, position + int(kept_rows.sum()) + 1, dtype=np.int64)
+
+    def _row_hashes(self, df, kept_rows):
+        return pd.util.hash_pandas_object(df[kept_rows], index=False).to_numpy(dtype=np.uint64)
+
+    def load_hash_manifest(self):
+        """Return (keys, hashes, columns) of the previous run, or None if there is no usable manifest."""
+        if self.hash_manifest is None or not os.path.exists(self.hash_manifest):
+            return None
+        try:
+            with np.load(self.hash_manifest, allow_pickle=False) as manifest:
+                return manifest["keys"], manifest["hashes"], manifest["columns"].tolist()
+        except Exception as e:
+            print(f"Ignoring unreadable hash manifest '{self.hash_manifest}': {str(e)}")
+            return None
+
+    def save_hash_manifest(self, keys, hashes, columns):
+        manifest_dir = os.path.dirname(self.hash_manifest)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+        order = np.argsort(keys, kind='stable')
+        temporary_file = f"{self.hash_manifest}.tmp"
+        # Written through a file object so numpy does not append its own suffix
+        with open(temporary_file, 'wb') as f:
+            np.savez(f, keys=keys[order], hashes=hashes[order], columns=np.array(columns, dtype=str))
+        os.replace(temporary_file, self.hash_manifest)
+
+    def _upsert_suffix(self, columns, table_columns):
+        # Columns left out of the row (null values) go back to their default, as an INSERT would
+        key = self.key_column if self.key_column is not None else self._primary_key()
+        assignments = [f"{column} = VALUES({column})" for column in columns if column != key]
+        assignments += [f"{column} = DEFAULT({column})" for column in table_columns if column not in columns and column != key]
+        return f" ON DUPLICATE KEY UPDATE {', '.join(assignments)}" if assignments else f" ON DUPLICATE KEY UPDATE {key} = {key}"
+
+    def _delete_statements(self, keys):
+        """Yield (statements, rows per statement) deleting the given keys, batch_rows keys per statement."""
+        key = self.key_column if self.key_column is not None else self._primary_key()
+        statements = []
+        row_counts = []
+        for start in range(0, len(keys), self.batch_rows):
+            batch = keys[start:start + self.batch_rows]
+            statements.append(f"DELETE FROM {self.table_name} WHERE {key} IN ({', '.join(map(str, batch.tolist()))});\n")
+            row_counts.append(len(batch))
+        if statements:
+            yield np.array(statements, dtype=object), np.array(row_counts, dtype=np.int64)
+
+    def _write_delta(self, previous):
+        """Write the changes since the run recorded in `previous` to <name>.delta.sql."""
+        previous_keys, previous_hashes, previous_columns = previous
+        delta_file = self._output_path('delta')
+        key = self.key_column if self.key_column is not None else self._primary_key()
+        all_keys = []
+        all_hashes = []
+        columns = None
+        changed_count = 0
+        try:
+            with _StatementOutput(self, path=delta_file, add_indexes=False) as output:
+                position = 0
+                for df in self.iter_input():
+                    columns = df.columns.tolist() if columns is None else columns
+                    kept_rows, keys = self._row_keys(df, position)
+                    hashes = self._row_hashes(df, kept_rows)
+                    position += len(keys)
+                    all_keys.append(keys)
+                    all_hashes.append(hashes)
+
+                    # Keys are sorted in the manifest, so each lookup is a binary search
+                    slots = np.minimum(np.searchsorted(previous_keys, keys), max(len(previous_keys) - 1, 0))
+                    unchanged = (
+                        (previous_keys[slots] == keys) & (previous_hashes[slots] == hashes)
+                        if len(previous_keys) and columns == previous_columns else
+                        np.zeros(len(keys), dtype=bool)
+                    )
+                    if unchanged.all():
+                        continue
+                    if self.key_column is None and columns == previous_columns and np.isin(hashes[~unchanged], previous_hashes).any():
+                        raise ValueError("Rows moved to other positions since the last run (a row was removed or reordered); positional ids would be reassigned. Write the full table or set key_column.")
+                    changed = df[kept_rows][~unchanged]
+                    if self.key_column is None:
+                        changed.insert(0, key, keys[~unchanged])
+                    changed_count += len(changed)
+
+                    row_values, row_patterns, pattern_columns = self._format_rows(changed)
+                    suffixes = [self._upsert_suffix(pattern, columns) for pattern in pattern_columns]
+                    statement_blocks = (
+                        self._extended_insert_statements(row_values, row_patterns, pattern_columns, suffixes)
+                        if self.extended_insert else
+                        self._insert_statements(row_values, row_patterns, pattern_columns, suffixes=suffixes)
+                    )
+                    for statements, row_counts in statement_blocks:
+                        output.write(statements, row_counts)
+
+                keys = np.concatenate(all_keys) if all_keys else np.empty(0, dtype=np.int64)
+                deleted_keys = np.setdiff1d(previous_keys, keys)
+                if self.key_column is None and len(deleted_keys):
+                    raise ValueError(f"{len(deleted_keys)} row(s) were removed since the last run; with positional ids a removal cannot be told apart from rows moving to other ids. Write the full table or set key_column.")
+                for statements, row_counts in self._delete_statements(deleted_keys):
+                    output.write(statements, row_counts)
+        except Exception:
+            # A refused or failed delta must not be mistaken for a complete one
+            if os.path.exists(delta_file):
+                os.remove(delta_file)
+            raise
+
+        self.save_hash_manifest(keys, np.concatenate(all_hashes) if all_hashes else np.empty(0, dtype=np.uint64), columns)
+        return delta_file, changed_count, len(deleted_keys)
+
+    def _output_base(self):
+        path = self.sql_file
+        if self.compression is not None:
+            path = path[:-len(SQLWriter.COMPRESSION_SUFFIXES[self.compression])]
+        return path[:-len('.sql')] if path.endswith('.sql') else path
+
+    def _output_path(self, part):
+        suffix = SQLWriter.COMPRESSION_SUFFIXES[self.compression] if self.compression is not None else ''
+        return f"{self._output_base()}.{part}.sql{suffix}"
+
     def write_sql(self):
 
         try:
-            df = self.get_input()
+            started_at = time.perf_counter()
 
             self._ensure_output_destination_existance()
-            # Open file to write SQL statements
-            with open(self.sql_file, 'w', encoding="utf-8") as f:
+            if self.output_format == 'load_data':
+                row_count = self._write_load_data()
+                PerformanceMonitor.count(rows_out=row_count, bytes_written=PerformanceMonitor.file_bytes(self.sql_file, self.data_file))
+                elapsed = time.perf_counter() - started_at
+                print(f"SQL file '{self.sql_file}' and data file '{self.data_file}' generated successfully ({row_count} rows, {row_count / elapsed if elapsed > 0 else 0:.0f} rows/s).")
+                return
 
-                f.write('START TRANSACTION;\n')
-                if self.create_table_statement is not None:
-                    # Example: Create a table (modify schema as needed)
-                    f.write(self.create_table_statement)
-                    f.write('\n')
+            previous = self.load_hash_manifest() if self.delta else None
+            if self.delta and previous is None:
+                print(f"No hash manifest '{self.hash_manifest}' from a previous run, writing the full table.")
+            if previous is not None:
+                delta_file, changed_count, deleted_count = self._write_delta(previous)
+                PerformanceMonitor.count(rows_out=changed_count + deleted_count, bytes_written=PerformanceMonitor.file_bytes(delta_file))
+                elapsed = time.perf_counter() - started_at
+                print(f"Delta SQL file '{delta_file}' generated successfully ({changed_count} changed rows, {deleted_count} deleted rows, {elapsed:.2f}s).")
+                return
+
+            all_keys = []
+            all_hashes = []
+            columns = None
+            position = 0
+            # Open file(s) to write SQL statements
+            with _StatementOutput(self) as output:
 
                 # Write INSERT statements
-                for index, row in df.iterrows():
-                    try:
-                        # Identify non-null columns and values
-                        non_null_mask = ~row.isna()  # Creates a boolean mask where True indicates non-null values
-                        non_null_columns = df.columns[non_null_mask].tolist()
-                        non_null_values = row[non_null_mask].tolist()
-
-                        if not non_null_columns:
-                            print(f"Skipping row {index}: All values are null")
-                            continue
-
-                        # Format values for SQL (quote strings, convert others to string)
-                        formatted_values = ', '.join(
-                            [f"'{self.escape_value(value)}'" if isinstance(value, str) else str(value) 
-                            for value in non_null_values]
-                        )
-                        # Write the INSERT statement with non-null columns and values
-                        f.write(f"INSERT INTO {self.table_name} ({', '.join(non_null_columns)}) VALUES ({formatted_values});\n")
-                    except Exception as e:
-                        print(f"Error processing row {index}: {str(e)}")
-                        continue  # Skip problematic rows and continue
-                
-                f.write('COMMIT;\n')
+                for df in self.iter_input():
+                    if self.hash_manifest is not None:
+                        columns = df.columns.tolist() if columns is None else columns
+                        kept_rows, keys = self._row_keys(df, position)
+                        position += len(keys)
+                        all_keys.append(keys)
+                        all_hashes.append(self._row_hashes(df, kept_rows))
+                    row_values, row_patterns, pattern_columns = self._format_rows(df)
+                    statement_blocks = (
+                        self._extended_insert_statements(row_values, row_patterns, pattern_columns)
+                        if self.extended_insert else
+                        self._insert_statements(row_values, row_patterns, pattern_columns)
+                    )
+                    for statements, row_counts in statement_blocks:
+                        output.write(statements, row_counts)
+                row_count = output.row_count
 
-            print(f"SQL file '{self.sql_file}' generated successfully.")
+            if self.hash_manifest is not None and columns is not None:
+                self.save_hash_manifest(np.concatenate(all_keys), np.concatenate(all_hashes), columns)
+
+            output_files = [self.sql_file] if self.shard_rows is None else (
+                [output.schema_file, output.manifest_file, self._output_path('indexes')] + [os.path.join(os.path.dirname(output.manifest_file), shard["file"]) for shard in output.shards]
+            )
+            PerformanceMonitor.count(rows_out=row_count, bytes_written=PerformanceMonitor.file_bytes(*output_files))
+            elapsed = time.perf_counter() - started_at
+            if self.shard_rows is not None:
+                print(f"SQL shards for '{self.table_name}' generated successfully, see '{output.manifest_file}' ({row_count} rows, {row_count / elapsed if elapsed > 0 else 0:.0f} rows/s).")
+            else:
+                print(f"SQL file '{self.sql_file}' generated successfully ({row_count} rows, {row_count / elapsed if elapsed > 0 else 0:.0f} rows/s).")
             
         except PermissionError:
             print(f"Error: Permission denied when writing to '{self.sql_file}'.")
             exit(1)
         except Exception as e:
             print(f"Error writing to SQL file: {str(e)}")
-            exit(1)
\ No newline at end of file
+            exit(1)
+
+
+class _StatementOutput:
+    """
+    Write INSERT statements for a SQLWriter into transaction-bounded, optionally sharded files.
+
+    Without commit_every/shard_rows the result is the classic single file: START TRANSACTION,
+    CREATE TABLE, the statements and one COMMIT. With commit_every, a COMMIT/START TRANSACTION pair
+    closes every transaction after at most commit_every rows; multi-row statements are never split,
+    so in extended-insert mode transactions and shards may close a little early. With shard_rows,
+    CREATE TABLE goes to <name>.schema.sql and the rows to <name>.0001.sql, <name>.0002.sql, ...
+    Shards can be loaded over several connections once the schema is in place. Parallel loading
+    assigns AUTO_INCREMENT ids in load order, so only shard tables whose ids are not referenced by
+    foreign keys (the relation tables).
+    """
+
+    def __init__(self, writer, path=None, add_indexes=True):
+        self.writer = writer
+        self.path = path if path is not None else writer.sql_file
+        self.add_indexes = add_indexes
+        self.sharded = writer.shard_rows is not None
+        self.file = None
+        self.in_transaction = False
+        self.rows_in_transaction = 0
+        self.rows_in_shard = 0
+        self.row_count = 0
+        self.shards = []
+        self.schema_file = writer._output_path('schema') if self.sharded else None
+        self.manifest_file = f"{writer._output_base()}.manifest.json" if self.sharded else None
+
+    def __enter__(self):
+        if self.sharded:
+            with self.writer._open_output(self.schema_file) as f:
+                f.write('START TRANSACTION;\n')
+                if self.writer.create_table_statement is not None:
+                    f.write(self.writer.create_table_statement)
+                    f.write('\n')
+                f.write('COMMIT;\n')
+        else:
+            self.file = self.writer._open_output(self.path)
+            self.file.write('START TRANSACTION;\n')
+            self.in_transaction = True
+            if self.writer.create_table_statement is not None:
+                # Example: Create a table (modify schema as needed)
+                self.file.write(self.writer.create_table_statement)
+                self.file.write('\n')
+        return self
+
+    def _open_shard(self):
+        path = self.writer._output_path(f"{len(self.shards) + 1:04d}")
+        self.file = self.writer._open_output(path)
+        self.shards.append({"file": os.path.basename(path), "rows": 0})
+        self.rows_in_shard = 0
+
+    def _close_file_transaction(self):
+        if self.in_transaction:
+            self.file.write('COMMIT;\n')
+            self.in_transaction = False
+
+    def _close_file(self):
+        if self.file is None:
+            return
+        self._close_file_transaction()
+        self.file.close()
+        self.file = None
+
+    def _room(self):
+        """Rows that still fit in the current transaction and shard."""
+        limits = []
+        if self.writer.commit_every is not None:
+            limits.append(self.writer.commit_every - self.rows_in_transaction)
+        if self.sharded:
+            limits.append(self.writer.shard_rows - self.rows_in_shard)
+        return min(limits) if limits else None
+
+    def write(self, statements, row_counts):
+        start = 0
+        cumulative_rows = np.cumsum(row_counts)
+        while start < len(statements):
+            if self.sharded and self.file is None:
+                self._open_shard()
+            if not self.in_transaction:
+                self.file.write('START TRANSACTION;\n')
+                self.in_transaction = True
+                self.rows_in_transaction = 0
+
+            room = self._room()
+            if room is None:
+                end = len(statements)
+            else:
+                rows_before = cumulative_rows[start - 1] if start > 0 else 0
+                end = int(np.searchsorted(cumulative_rows, rows_before + room, side='right'))
+                if end == start:
+                    # The next statement does not fit: close the full shard or transaction first,
+                    # and only let a single oversized statement into an empty one
+                    if self.sharded and self.rows_in_shard > 0 and self.writer.shard_rows - self.rows_in_shard == room:
+                        self._close_file()
+                        continue
+                    if self.rows_in_transaction > 0:
+                        self.file.write('COMMIT;\n')
+                        self.in_transaction = False
+                        continue
+                    end = start + 1
+            rows = int(cumulative_rows[end - 1] - (cumulative_rows[start - 1] if start > 0 else 0))
+            self.file.write(''.join(statements[start:end]))
+
+            self.row_count += rows
+            self.rows_in_transaction += rows
+            if self.sharded:
+                self.rows_in_shard += rows
+                self.shards[-1]["rows"] += rows
+                if self.rows_in_shard >= self.writer.shard_rows:
+                    self._close_file()
+                    start = end
+                    continue
+            if self.writer.commit_every is not None and self.rows_in_transaction >= self.writer.commit_every:
+                self.file.write('COMMIT;\n')
+                self.in_transaction = False
+            start = end
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.sharded and self.file is None and not self.shards and exc_type is None:
+            # Keep at least one (empty) shard so loaders always find a data file
+            self._open_shard()
+            self.file.write('START TRANSACTION;\n')
+            self.in_transaction = True
+        index_statements = self.writer.index_statements() if exc_type is None and self.add_indexes else []
+        if index_statements and not self.sharded:
+            # Constraints are added once every row is committed
+            self._close_file_transaction()
+            for statement in index_statements:
+                self.file.write(statement)
+        self._close_file()
+        if self.sharded and exc_type is None:
+            manifest = {
+                "table": self.writer.table_name,
+                "schema": os.path.basename(self.schema_file),
+                "shards": self.shards,
+                "rows": self.row_count,
+                "commit_every": self.writer.commit_every
+            }
+            if index_statements:
+                # Run after every shard has been loaded
+                indexes_file = self.writer._output_path('indexes')
+                with self.writer._open_output(indexes_file) as f:
+                    for statement in index_statements:
+                        f.write(statement)
+                manifest["indexes"] = os.path.basename(indexes_file)
+            with open(self.manifest_file, 'w', encoding="utf-8") as f:
+                json.dump(manifest, f, indent=2)
+        return False
@@ -0,0 +1,266 @@
+import argparse, os, time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from schema import schema_registry
+from utils.RandomMachine import RandomMachine
+from utils.SQLWriter import SQLWriter
+from utils.SQLDumpOrchestrator import SQLDumpOrchestrator
+from utils.CSVDataRowsSanitizer import CSVDataRowsSanitizer
+from utils.IntegrityChecker import IntegrityChecker
+
+class ScaleFactorGenerator:
+
+    # Rows of the entity tables at scale factor 1, as in the scraped dataset
+    BASE_ROWS = {'artist': 20, 'user': 50, 'album': 102, 'song': 526, 'playlist': 148}
+    # Rows drawn for the relation tables at scale factor 1, before duplicate pairs are dropped
+    BASE_DRAWS = {
+        'playlist_entry': 1300,
+        'user_follower': 1820,
+        'artist_follower': 856,
+        'user_added_playlist': 3920,
+        'user_added_album': 3130,
+        'user_liked_song': 18900
+    }
+    # Scraped tables the text values (names, titles, pictures, ...) are sampled from
+    VOCABULARY_FILES = {
+        'artist': 'spotify_artists_complete.csv',
+        'user': 'dataset_users.csv',
+        'album': 'spotify_albums_rename.csv',
+        'song': 'spotify_songs.csv',
+        'playlist': 'spotify_playlists_reprocess.csv'
+    }
+
+    def __init__(
+        self,
+        scale_factor = 1,
+        output_dir = None,
+        seed = None,
+        max_workers = None,
+        vocabulary_dir = None,
+        chunksize = 500000,
+        compression = None,
+        deferred_indexes = False
+    ):
+        """
+        TPC-style generator: every table's row count and foreign key range derive from one scale factor.
+
+        AUTO_INCREMENT ids are 1..n in load order, so a foreign key only needs the row count of the
+        table it references. Every table can therefore be generated on its own, in parallel, from its
+        own random stream.
+
+        Args:
+            scale_factor (float): Multiplier of the scale factor 1 row counts.
+            output_dir (str, optional): Receives csv/, sql/ and dump.sql (defaults to generated/sf<scale_factor>).
+            seed (int, optional): Seed for reproducible output; drawn from entropy when None.
+            max_workers (int, optional): Size of the process pools (defaults to the CPU count).
+            vocabulary_dir (str, optional): Directory of the scraped CSV files (defaults to the repo's data/).
+            chunksize (int): Rows SQLWriter reads and formats at a time.
+            compression (str, optional): 'gzip' or 'zstd' for the .sql outputs and dump.
+            deferred_indexes (bool): Add UNIQUE/FOREIGN KEY constraints after each table is loaded.
+        """
+        if scale_factor <= 0:
+            raise ValueError("scale_factor must be positive.")
+        self.scale_factor = scale_factor
+        self.output_dir = output_dir if output_dir is not None else os.path.join('generated', f"sf{scale_factor:g}")
+        self.seed = RandomMachine(seed=seed).seed
+        self.max_workers = max_workers
+        self.vocabulary_dir = vocabulary_dir if vocabulary_dir is not None else str(Path(__file__).parent.parent.resolve() / 'data')
+        self.chunksize = chunksize
+        self.compression = compression
+        self.deferred_indexes = deferred_indexes
+        self.registry = schema_registry
+
+    def row_counts(self):
+        """Rows of every entity table and draws of every relation table at this scale factor."""
+        counts = {name: max(1, round(rows * self.scale_factor)) for name, rows in ScaleFactorGenerator.BASE_ROWS.items()}
+        counts.update({name: max(1, round(rows * self.scale_factor)) for name, rows in ScaleFactorGenerator.BASE_DRAWS.items()})
+        return counts
+
+    def csv_path(self, name):
+        return os.path.join(self.output_dir, 'csv', f"{name}.csv")
+
+    def sql_path(self, name):
+        return os.path.join(self.output_dir, 'sql', f"{name}.sql")
+
+    def _vocabulary(self, name):
+        return pd.read_csv(os.path.join(self.vocabulary_dir, ScaleFactorGenerator.VOCABULARY_FILES[name]))
+
+    def _sample_rows(self, rng, vocabulary, n):
+        return vocabulary.iloc[rng.integers(0, len(vocabulary), size=n)].reset_index(drop=True)
+
+    def _distinct(self, values, max_length, groups=None):
+        """
+        Append " #k" to repeated values (case-insensitively, within groups) so they stay distinct,
+        shortening the value where needed to keep it within max_length.
+        """
+        values = pd.Series(values, dtype=object).reset_index(drop=True).astype(str)
+        keys = [values.str.casefold()] if groups is None else [pd.Series(groups).reset_index(drop=True), values.str.casefold()]
+        occurrence = values.groupby(keys, sort=False).cumcount()
+        repeated = occurrence > 0
+        suffixes = ' #' + (occurrence[repeated] + 1).astype(str)
+        values[repeated] = [value[:max_length - len(suffix)] + suffix for value, suffix in zip(values[repeated], suffixes)]
+        return values
+
+    def _random_datetimes(self, rm, n, start='2000-01-01', days=9000):
+        dates = (np.datetime64(start) + rm.rng.integers(0, days, size=n)).astype(str).astype(object)
+        return dates + ' ' + rm.random_times(n)
+
+    def _foreign_key_values(self, rm, counts, table_name, size):
+        return {
+            fk.column: rm.rng.integers(1, counts[fk.references_table] + 1, size=size)
+            for fk in self.registry[table_name].foreign_keys
+        }
+
+    def build_table(self, name, counts):
+        """Return the DataFrame of one table, drawn from the table's own random stream."""
+        rm = RandomMachine(seed=self.seed).spawn(f"scale_factor:{name}")
+        n = counts[name]
+
+        if name == 'artist':
+            rows = self._sample_rows(rm.rng, self._vocabulary('artist'), n)
+            names = self._distinct(rows['name'], self.registry['artist'].column('name').length)
+            df = pd.DataFrame({
+                'name': names,
+                'bio': rows['bio'],
+                'email': rm.random_emails(names, unique=True),
+                'profile_pic': rows['profile_pic']
+            })
+        elif name == 'user':
+            vocabulary = self._vocabulary('user')
+            # The portrait folder tells the gender of the scraped users
+            genders = np.where(vocabulary['profile_pic'].astype(str).str.contains('/women/', regex=False), 'Female', 'Male')
+            df = rm.synthesize_users(names=vocabulary['name'], genders=genders, size=n, unique_emails=True)
+        elif name == 'album':
+            rows = self._sample_rows(rm.rng, self._vocabulary('album'), n)
+            df = pd.DataFrame({
+                'artist_id': rm.rng.integers(1, counts['artist'] + 1, size=n),
+                'title': rows['title'],
+                'cover_pic': rows['cover_pic'],
+                'created_at': self._random_datetimes(rm, n)
+            })
+        elif name == 'song':
+            rows = self._sample_rows(rm.rng, self._vocabulary('song'), n)
+            album_ids = pd.Series(rm.rng.integers(1, counts['album'] + 1, size=n))
+            df = pd.DataFrame({
+                'album_id': album_ids,
+                # Both (album_id, name) and (album_id, track_number) are UNIQUE
+                'name': self._distinct(rows['name'], self.registry['song'].column('name').length, groups=album_ids),
+                'track_number': album_ids.groupby(album_ids, sort=False).cumcount() + 1,
+                'monthly_plays': rm.rng.integers(300, 1000000000, size=n, endpoint=True)
+            })
+        elif name == 'playlist':
+            rows = self._sample_rows(rm.rng, self._vocabulary('playlist'), n)
+            df = pd.DataFrame({
+                'user_id': rm.rng.integers(1, counts['user'] + 1, size=n),
+                'name': rows['name'],
+                'info': rows['info'],
+                'cover_pic': rows['cover_pic']
+            })
+        elif name == 'playlist_entry':
+            df = pd.DataFrame(self._foreign_key_values(rm, counts, name, n))
+            df['order_number'] = df.groupby('playlist_id', sort=False).cumcount() + 1
+        else:
+            df = pd.DataFrame(self._foreign_key_values(rm, counts, name, n))
+            columns = df.columns.tolist()
+            if name == 'user_follower':
+                # Nobody follows themselves
+                df = df[df[columns[0]] != df[columns[1]]]
+            df = df.drop_duplicates(subset=columns).reset_index(drop=True)
+
+        CSVDataRowsSanitizer.trim_frame_to_limits(df, self.registry[name].varchar_limits())
+        return df
+
+    def generate_table_csv(self, name, counts):
+        started_at = time.perf_counter()
+        df = self.build_table(name, counts)
+        df.to_csv(self.csv_path(name), index=False)
+        print(f"Generated table '{name}' ({len(df)} rows, {time.perf_counter() - started_at:.2f}s).")
+        return len(df)
+
+    def write_table_sql(self, name):
+        sql_writer = SQLWriter(
+            schema=self.registry[name],
+            deferred_indexes=self.deferred_indexes,
+            input_csv_file=self.csv_path(name),
+            output_sql_file=self.sql_path(name),
+            extended_insert=True,
+            chunksize=self.chunksize,
+            compression=self.compression,
+            # Generated text is drawn from small vocabularies, so most of it repeats
+            categorical_ratio=0.5
+        )
+        sql_writer.write_sql()
+
+    def generate_csv(self):
+        """Generate every table's CSV in a process pool and return the row counts."""
+        os.makedirs(os.path.dirname(self.csv_path('artist')), exist_ok=True)
+        counts = self.row_counts()
+        rows = {}
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self.generate_table_csv, name, counts): name for name in self.registry.names()}
+            for future in as_completed(futures):
+                rows[futures[future]] = future.result()
+        return rows
+
+    def check_integrity(self):
+        checker = IntegrityChecker(registry=self.registry, sources={name: self.csv_path(name) for name in self.registry.names()})
+        violations = checker.check()
+        checker.report(violations)
+        return violations
+
+    def generate_sql(self):
+        """Write every table's .sql file in a process pool and combine them into one FK-ordered dump."""
+        suffix = SQLWriter.COMPRESSION_SUFFIXES[self.compression] if self.compression is not None else ''
+        orchestrator = SQLDumpOrchestrator(tables={
+            name: {
+                "writer": partial(self.write_table_sql, name),
+                "output": f"{self.sql_path(name)}{suffix}",
+                "depends_on": self.registry[name].depends_on()
+            }
+            for name in self.registry.names()
+        }, max_workers=self.max_workers)
+        dump_file = os.path.join(self.output_dir, f"dump.sql{suffix}")
+        orchestrator.build(dump_file=dump_file)
+        return dump_file
+
+    def run(self, write_sql=True):
+        started_at = time.perf_counter()
+        print(f"Generating scale factor {self.scale_factor:g} into '{self.output_dir}' (seed {self.seed}).")
+        rows = self.generate_csv()
+        if self.check_integrity():
+            raise RuntimeError("The generated tables violate the schema's constraints.")
+        if write_sql:
+            self.generate_sql()
+        print(f"Generated {sum(rows.values())} rows in {time.perf_counter() - started_at:.2f}s.")
+        return rows
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic Spotify database at a given scale factor.")
+    parser.add_argument('--scale-factor', '-s', type=float, default=1, help="Multiplier of the base row counts (1 = the scraped dataset size).")
+    parser.add_argument('--output-dir', '-o', default=None, help="Output directory (default: generated/sf<scale-factor>).")
+    parser.add_argument('--seed', type=int, default=None, help="Seed for reproducible output.")
+    parser.add_argument('--workers', type=int, default=None, help="Processes to use (default: CPU count).")
+    parser.add_argument('--chunksize', type=int, default=500000, help="Rows per SQL generation chunk.")
+    parser.add_argument('--compression', choices=sorted(SQLWriter.COMPRESSION_SUFFIXES), default=None, help="Compress the SQL output.")
+    parser.add_argument('--deferred-indexes', action='store_true', help="Add UNIQUE/FOREIGN KEY constraints after loading each table.")
+    parser.add_argument('--csv-only', action='store_true', help="Only generate the CSV files.")
+    options = parser.parse_args(args)
+
+    generator = ScaleFactorGenerator(
+        scale_factor=options.scale_factor,
+        output_dir=options.output_dir,
+        seed=options.seed,
+        max_workers=options.workers,
+        chunksize=options.chunksize,
+        compression=options.compression,
+        deferred_indexes=options.deferred_indexes
+    )
+    generator.run(write_sql=not options.csv_only)
+
+
+if __name__ == "__main__":
+    main()
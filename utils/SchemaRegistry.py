@@ -0,0 +1,341 @@
+class Column:
+
+    def __init__(self, name, sql_type, length=None, nullable=True, default=None, on_update=None, primary_key=False, auto_increment=False):
+        """
+        A table column.
+
+        Args:
+            name (str): Column name.
+            sql_type (str): MySQL type without length, e.g. 'INT', 'VARCHAR' or 'DATETIME'.
+            length (int, optional): Length for VARCHAR/CHAR columns.
+            nullable (bool): False adds NOT NULL.
+            default (str, optional): Raw DEFAULT expression, e.g. '0' or 'NOW()'.
+            on_update (str, optional): Raw ON UPDATE expression, e.g. 'CURRENT_TIMESTAMP'.
+            primary_key (bool): Column is the primary key.
+            auto_increment (bool): Column is AUTO_INCREMENT (never loaded from CSV).
+        """
+        self.name = name
+        self.sql_type = sql_type.upper()
+        self.length = length
+        self.nullable = nullable
+        self.default = default
+        self.on_update = on_update
+        self.primary_key = primary_key
+        self.auto_increment = auto_increment
+
+    @property
+    def is_text(self):
+        return self.sql_type in ('VARCHAR', 'CHAR', 'TEXT')
+
+    @property
+    def is_integer(self):
+        return self.sql_type in ('TINYINT', 'SMALLINT', 'MEDIUMINT', 'INT', 'BIGINT')
+
+    @property
+    def required(self):
+        """True if a row must provide a value (NOT NULL without a default)."""
+        return not self.nullable and self.default is None and not self.auto_increment
+
+    def definition(self):
+        parts = [self.name, f"{self.sql_type}({self.length})" if self.length is not None else self.sql_type]
+        if self.primary_key:
+            parts.append('PRIMARY KEY')
+        if self.auto_increment:
+            parts.append('AUTO_INCREMENT')
+        if not self.nullable and not self.primary_key:
+            parts.append('NOT NULL')
+        if self.default is not None:
+            parts.append(f"DEFAULT {self.default}")
+        if self.on_update is not None:
+            parts.append(f"ON UPDATE {self.on_update}")
+        return ' '.join(parts)
+
+
+class ForeignKey:
+
+    def __init__(self, column, references_table, references_column='id', on_delete='CASCADE', on_update='CASCADE'):
+        self.column = column
+        self.references_table = references_table
+        self.references_column = references_column
+        self.on_delete = on_delete
+        self.on_update = on_update
+
+    def definition(self, indent='    '):
+        return (
+            f"FOREIGN KEY({self.column})\n"
+            f"{indent}    REFERENCES {self.references_table}({self.references_column})\n"
+            f"{indent}    ON DELETE {self.on_delete}\n"
+            f"{indent}    ON UPDATE {self.on_update}"
+        )
+
+
+class UniqueKey:
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = list(columns)
+
+    def definition(self):
+        return f"CONSTRAINT {self.name} UNIQUE({', '.join(self.columns)})"
+
+
+class TableSchema:
+
+    # (numpy, nullable) integer dtypes from the smallest up, tried by compact_integers()
+    __unsigned_dtypes = (('uint8', 'UInt8'), ('uint16', 'UInt16'), ('uint32', 'UInt32'))
+    __signed_dtypes = (('int8', 'Int8'), ('int16', 'Int16'), ('int32', 'Int32'))
+    # Widest character, in bytes, of the character sets that store text as UTF-8
+    __charset_max_bytes = {'utf8mb4': 4, 'utf8mb3': 3, 'utf8': 3}
+
+    def __init__(self, name, columns, foreign_keys=None, unique_keys=None, charset='utf8mb4', collate='utf8mb4_unicode_ci'):
+        """
+        Declarative description of a table, used for CSV loading, validation and DDL generation.
+
+        Args:
+            name (str): Table name.
+            columns (list): Column definitions, in table order.
+            foreign_keys (list, optional): ForeignKey definitions.
+            unique_keys (list, optional): UniqueKey definitions.
+            charset (str): Table character set.
+            collate (str): Table collation.
+        """
+        self.name = name
+        self.columns = list(columns)
+        self.foreign_keys = list(foreign_keys) if foreign_keys is not None else []
+        self.unique_keys = list(unique_keys) if unique_keys is not None else []
+        self.charset = charset
+        self.collate = collate
+
+    def column(self, name):
+        for column in self.columns:
+            if column.name == name:
+                return column
+        raise KeyError(f"Table '{self.name}' has no column '{name}'.")
+
+    @property
+    def primary_key(self):
+        return next((column.name for column in self.columns if column.primary_key), None)
+
+    def data_columns(self):
+        """Columns that are loaded from the CSV (everything but AUTO_INCREMENT keys)."""
+        return [column for column in self.columns if not column.auto_increment]
+
+    def emitted_rows(self, df):
+        """
+        Mask of the rows a SQLWriter loads: rows with a value in at least one of the table's columns.
+        All-null rows are skipped and get no AUTO_INCREMENT id, so the n-th emitted row has id n.
+        """
+        columns = [column.name for column in self.data_columns() if column.name in df.columns]
+        return df[columns].notna().to_numpy().any(axis=1)
+
+    def depends_on(self):
+        """Names of the other tables referenced by foreign keys."""
+        return list(dict.fromkeys(fk.references_table for fk in self.foreign_keys if fk.references_table != self.name))
+
+    def varchar_limits(self):
+        return {column.name: column.length for column in self.columns if column.is_text and column.length is not None}
+
+    def max_char_bytes(self):
+        """
+        Widest character, in UTF-8 bytes, the table's charset can store: 3 for utf8mb3, which rejects
+        characters outside the Basic Multilingual Plane (emoji, ...). None when any character fits
+        (utf8mb4) or the charset does not store text as UTF-8.
+        """
+        max_bytes = TableSchema.__charset_max_bytes.get(self.charset.lower())
+        return max_bytes if max_bytes is not None and max_bytes < 4 else None
+
+    def csv_dtypes(self, columns=None):
+        """
+        Return read_csv dtypes for the text and date columns (the string dtype, so nulls stay NA
+        instead of becoming 'nan').
+
+        Integer columns are left to the parser, which is several times faster than parsing straight
+        into Int64; cast_frame() converts them afterwards.
+
+        Args:
+            columns (list, optional): Restrict the mapping to these CSV columns.
+        """
+        return {
+            column.name: 'string' for column in self.data_columns()
+            if not column.is_integer and (columns is None or column.name in columns)
+        }
+
+    def csv_read_options(self, columns=None, engine=None):
+        """
+        Return the read_csv keyword arguments for this table: csv_dtypes() plus the parser engine.
+
+        Args:
+            columns (list, optional): Restrict the dtypes to these CSV columns.
+            engine (str, optional): 'pyarrow', 'c', or 'auto' for pyarrow when it is installed;
+                None leaves the choice to pandas (the C parser).
+        """
+        options = {"dtype": self.csv_dtypes(columns=columns)}
+        engine = TableSchema.resolve_csv_engine(engine)
+        if engine is not None:
+            options["engine"] = engine
+        return options
+
+    @staticmethod
+    def resolve_csv_engine(engine):
+        """Return the read_csv engine to use for 'auto' (pyarrow if installed, else None); other values as given."""
+        if engine != 'auto':
+            return engine
+        try:
+            import pyarrow
+            return 'pyarrow'
+        except ImportError:
+            return None
+
+    @staticmethod
+    def compact_integers(values):
+        """
+        Return an integer column in the smallest dtype holding its values.
+
+        Non-negative columns (ids, foreign keys) get unsigned types. Columns without nulls get a numpy
+        dtype, columns with nulls the nullable one (UInt16, Int32, ...), so gaps never turn them into
+        floats. 64-bit unsigned is never used: mixed with signed columns it upcasts rows to float.
+        """
+        import numpy as np
+        values = values if values.dtype == 'Int64' else values.astype('Int64')
+        present = values.dropna()
+        if present.empty:
+            return values
+        low, high = int(present.min()), int(present.max())
+        candidates = TableSchema.__unsigned_dtypes if low >= 0 else TableSchema.__signed_dtypes
+        for numpy_dtype, nullable_dtype in candidates:
+            limits = np.iinfo(numpy_dtype)
+            if limits.min <= low and high <= limits.max:
+                break
+        else:
+            numpy_dtype, nullable_dtype = 'int64', 'Int64'
+        return values.astype(nullable_dtype if len(present) < len(values) else numpy_dtype)
+
+    def cast_frame(self, df, compact=False):
+        """
+        Convert the INT columns of a freshly read frame to integers that keep gaps as nulls instead of
+        turning them into floats ("12.0").
+
+        Args:
+            df (pd.DataFrame): Frame to convert in place.
+            compact (bool): Use the smallest fitting dtype (see compact_integers) instead of Int64;
+                link tables then take a quarter to an eighth of the memory.
+        """
+        for column in self.data_columns():
+            if not column.is_integer or column.name not in df.columns:
+                continue
+            if compact:
+                df[column.name] = TableSchema.compact_integers(df[column.name])
+            elif df[column.name].dtype != 'Int64':
+                df[column.name] = df[column.name].astype('Int64')
+        return df
+
+    def categorize_frame(self, df, max_ratio=0.5):
+        """
+        Store the text columns whose values repeat a lot as categoricals, in place.
+
+        A column is converted when its distinct values are at most max_ratio of its non-null values.
+        Only frames that are not edited afterwards should be categorized: assigning a value that is
+        not yet a category fails.
+        """
+        for column in self.data_columns():
+            if not column.is_text or column.name not in df.columns:
+                continue
+            values = df[column.name]
+            present = int(values.notna().sum())
+            if present > 0 and values.nunique(dropna=True) <= max_ratio * present:
+                df[column.name] = values.astype('category')
+        return df
+
+    def validate(self, df):
+        """
+        Check a DataFrame against the schema.
+
+        Returns:
+            list: Human readable problems; empty if the frame is valid.
+        """
+        from pandas.api.types import is_numeric_dtype
+        problems = []
+        known = {column.name for column in self.columns}
+        unknown = [name for name in df.columns if name not in known]
+        if unknown:
+            problems.append(f"Unknown column(s) {unknown} for table '{self.name}'.")
+
+        for column in self.data_columns():
+            if column.name not in df.columns:
+                if column.required:
+                    problems.append(f"Required column '{column.name}' is missing.")
+                continue
+            values = df[column.name]
+            if column.required and values.isna().any():
+                problems.append(f"Column '{column.name}' is NOT NULL but has {int(values.isna().sum())} null value(s).")
+            if column.is_integer and not is_numeric_dtype(values):
+                problems.append(f"Column '{column.name}' should hold integers but has dtype {values.dtype}.")
+            if column.is_text and column.length is not None:
+                too_long = values.dropna().astype(str).str.len() > column.length
+                if too_long.any():
+                    problems.append(f"Column '{column.name}' has {int(too_long.sum())} value(s) longer than {column.length} characters.")
+        return problems
+
+    def create_table_sql(self, deferred_indexes=False):
+        """
+        Return the CREATE TABLE statement.
+
+        Args:
+            deferred_indexes (bool): Leave out FOREIGN KEY and UNIQUE constraints so they can be added
+                after the bulk load with secondary_index_sql().
+        """
+        definitions = [column.definition() for column in self.columns]
+        if not deferred_indexes:
+            definitions += [fk.definition() for fk in self.foreign_keys]
+            definitions += [unique_key.definition() for unique_key in self.unique_keys]
+        body = ',\n'.join([f"    {definition}" for definition in definitions])
+        return (
+            f"\nCREATE TABLE IF NOT EXISTS {self.name} (\n"
+            f"{body}\n"
+            f") CHARACTER SET {self.charset} COLLATE {self.collate};\n    "
+        )
+
+    def secondary_index_sql(self):
+        """Return one ALTER TABLE adding every UNIQUE and FOREIGN KEY constraint, or None if there are none."""
+        clauses = [f"ADD {unique_key.definition()}" for unique_key in self.unique_keys]
+        clauses += [f"ADD {fk.definition(indent='    ')}" for fk in self.foreign_keys]
+        if not clauses:
+            return None
+        return f"ALTER TABLE {self.name}\n    " + ',\n    '.join(clauses) + ";\n"
+
+    def unique_index_sql(self):
+        """Return one CREATE UNIQUE INDEX per UNIQUE key, for backends without ALTER TABLE ADD CONSTRAINT (SQLite)."""
+        return [f"CREATE UNIQUE INDEX {unique_key.name} ON {self.name} ({', '.join(unique_key.columns)});\n" for unique_key in self.unique_keys]
+
+
+class SchemaRegistry:
+
+    def __init__(self, tables=None):
+        self.__tables = {}
+        for table in tables if tables is not None else []:
+            self.register(table)
+
+    def register(self, table):
+        if table.name in self.__tables:
+            raise ValueError(f"Table '{table.name}' is already registered.")
+        for fk in table.foreign_keys:
+            if fk.references_table != table.name and fk.references_table not in self.__tables:
+                raise ValueError(f"Table '{table.name}' references unregistered table '{fk.references_table}'.")
+        self.__tables[table.name] = table
+        return table
+
+    def __getitem__(self, name):
+        return self.__tables[name]
+
+    def __contains__(self, name):
+        return name in self.__tables
+
+    def __iter__(self):
+        return iter(self.__tables.values())
+
+    def names(self):
+        return list(self.__tables.keys())
+
+    def dependency_graph(self):
+        """Table name to the names of the tables it references."""
+        return {name: table.depends_on() for name, table in self.__tables.items()}
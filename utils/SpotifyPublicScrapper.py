@@ -1,7 +1,6 @@
-import spotipy, math, datetime
-import pandas as pd
-from spotipy.oauth2 import SpotifyClientCredentials
+import math, datetime
 from utils.CSVWriter import CSVWriter
+from utils.PerformanceMonitor import PerformanceMonitor
 
 class SpotifyPublicScrapper:
 
@@ -14,16 +13,25 @@ class SpotifyPublicScrapper:
         client_secret: str,
         default_max_each = 10,
         write_to=None,
-        random_machine=None
+        random_machine=None,
+        client=None
     ):
-        try:
-            sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-                client_id=client_id,
-                client_secret=client_secret
-            ))
-            self._sp = sp
-        except Exception as e:
-            print(f'Spotify API Authentication Failed : {e}')
+        # An injected client (anything with spotipy's search()) replaces the real API, e.g. the fake
+        # client of the benchmarks; no credentials are exchanged then
+        if client is not None:
+            self._sp = client
+        else:
+            # spotipy (and requests) are only loaded once a scrapper is actually created
+            import spotipy
+            from spotipy.oauth2 import SpotifyClientCredentials
+            try:
+                sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
+                    client_id=client_id,
+                    client_secret=client_secret
+                ))
+                self._sp = sp
+            except Exception as e:
+                print(f'Spotify API Authentication Failed : {e}')
         
         self.default_max_each = default_max_each
         self.switch_collect_mode(write_to)
@@ -77,9 +85,18 @@ class SpotifyPublicScrapper:
         condition=None,
         enforce_write_mode_to=None,
         data_transformer=None,
-        to_count_on_transform=[]
+        to_count_on_transform=[],
+        random_machine=None,
+        raise_errors=False
     ):
+        # random_machine (e.g. RandomMachine.spawn(stage)) replaces the scrapper's own machine for
+        # this call, so data_transformer draws from the stream of the calling stage. Errors are
+        # printed, and raised again with raise_errors (e.g. for a pipeline stage that must fail)
+        import pandas as pd
         counter_mode = False
+        default_random_machine = self.random_machine
+        if random_machine is not None:
+            self.random_machine = random_machine
         try:
             if query_type is None or self.__get_res_data_key(query_type) is None:
                 raise Exception("Please state an allowed type of query that you want!\narguement with issue: query_type")
@@ -108,6 +125,7 @@ class SpotifyPublicScrapper:
                     type=query_type,
                     market=query_market
                 )
+                PerformanceMonitor.count(api_calls=1)
                 
                 items = results[data_key]['items']
                 items = [item for item in items if item is not None]
@@ -134,7 +152,7 @@ class SpotifyPublicScrapper:
                     )
 
                 if final_df is not None:
-                    action_time = datetime.datetime.now().strftime("%Y-%M-%d %H:%M:%S")
+                    action_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     batch_df = pd.DataFrame(data_set)
                     final_df = pd.concat([final_df, batch_df], ignore_index=True)
                     print(f"Successfully collected response data for a query of {query_type} at {action_time} ({i+1}/{cycle_len})!")
@@ -147,6 +165,10 @@ class SpotifyPublicScrapper:
         
         except Exception as e:
             print(f"Spotify {limit} {query_type} scrapping failed... {e}")
+            if raise_errors:
+                raise
+        finally:
+            self.random_machine = default_random_machine
 
     # def get_genre(self):
     #     genres = self._sp.recommendation_genre_seeds()
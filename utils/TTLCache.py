@@ -0,0 +1,125 @@
+import time, json, hashlib, threading
+from collections import OrderedDict
+from utils.PerformanceMonitor import PerformanceMonitor
+
+class TTLCache:
+
+    def __init__(self, ttl=60.0, max_entries=256, serializer=None, clock=time.monotonic):
+        """
+        In-process cache whose entries expire ttl seconds after they were loaded.
+
+        Concurrent get() calls for a key that is missing or expired are coalesced: the first caller
+        runs the loader and the others wait for its result, so a burst of identical requests costs
+        one upstream call. A loader error is raised in every waiting caller and nothing is cached.
+
+        Every entry keeps the serialized value and an ETag of it, so HTTP handlers can answer
+        If-None-Match with 304 and send the stored bytes without serializing again.
+
+        Args:
+            ttl (float): Default lifetime of an entry in seconds.
+            max_entries (int): Least recently used entries are dropped beyond this number.
+            serializer (callable, optional): Turns a value into the bytes the ETag is computed from
+                (sorted-key JSON by default).
+            clock (callable): Monotonic time source in seconds.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.serializer = serializer if serializer is not None else (lambda value: json.dumps(value, sort_keys=True, default=str).encode('utf-8'))
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.__entries = OrderedDict()
+        self.__pending = {}
+        # Bumped by invalidate(), so a load that started before it does not store a stale value
+        self.__generation = 0
+        self.__lock = threading.Lock()
+
+    def _entry(self, value, ttl):
+        body = self.serializer(value)
+        loaded_at = self.clock()
+        return {
+            "value": value,
+            "body": body,
+            "etag": hashlib.blake2b(body, digest_size=16).hexdigest(),
+            "loaded_at": loaded_at,
+            "expires_at": loaded_at + (ttl if ttl is not None else self.ttl)
+        }
+
+    def get(self, key, loader, ttl=None):
+        """
+        Return the entry of a key, calling loader() when it is missing or expired.
+
+        Args:
+            key (hashable): Cache key.
+            loader (callable): Produces the value; called by at most one thread per key at a time.
+            ttl (float, optional): Lifetime of a newly loaded entry (the cache's ttl by default).
+
+        Returns:
+            dict: The entry: value, body (serialized value), etag, loaded_at and expires_at.
+        """
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry["expires_at"] > self.clock():
+                self.__entries.move_to_end(key)
+                self.hits += 1
+                PerformanceMonitor.count(cache_hits=1)
+                return entry
+            pending = self.__pending.get(key)
+            is_loader = pending is None
+            if is_loader:
+                pending = self.__pending[key] = {"done": threading.Event(), "entry": None, "error": None, "generation": self.__generation}
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not is_loader:
+            pending["done"].wait()
+            if pending["error"] is not None:
+                raise pending["error"]
+            PerformanceMonitor.count(cache_hits=1)
+            return pending["entry"]
+
+        try:
+            entry = self._entry(loader(), ttl)
+            with self.__lock:
+                if pending["generation"] == self.__generation:
+                    self.__entries[key] = entry
+                    self.__entries.move_to_end(key)
+                    while len(self.__entries) > self.max_entries:
+                        self.__entries.popitem(last=False)
+            pending["entry"] = entry
+            return entry
+        except BaseException as e:
+            pending["error"] = e
+            raise
+        finally:
+            with self.__lock:
+                # invalidate() may have replaced this load with a newer one already
+                if self.__pending.get(key) is pending:
+                    del self.__pending[key]
+            pending["done"].set()
+
+    def remaining(self, entry):
+        """Seconds until an entry expires (0 once it has)."""
+        return max(0.0, entry["expires_at"] - self.clock())
+
+    def invalidate(self, key=None):
+        """
+        Drop one entry, or every entry when no key is given.
+
+        Loads in flight are detached as well: their callers still get the value, but a get() made
+        after invalidate() starts a new load instead of waiting for one that started before it.
+        """
+        with self.__lock:
+            self.__generation += 1
+            if key is None:
+                self.__entries.clear()
+                self.__pending.clear()
+            else:
+                self.__entries.pop(key, None)
+                self.__pending.pop(key, None)
+
+    def stats(self):
+        with self.__lock:
+            return {"entries": len(self.__entries), "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced}